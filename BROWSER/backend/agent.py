@@ -1,15 +1,22 @@
 import asyncio
-import base64
+import hashlib
 import traceback
 from playwright.async_api import async_playwright
 
+# Seconds between live-view frames, captured in the background while commands run
+SCREENSHOT_INTERVAL = 0.5
+
 class AsyncBrowserAgent:
-    def __init__(self, browser, output_callback=None, screenshot_callback=None):
+    def __init__(self, browser, output_callback=None, screenshot_callback=None, context=None):
         self.browser = browser # Global browser instance
         self.output_callback = output_callback
         self.screenshot_callback = screenshot_callback
-        self.context = None
+        # A context handed in (e.g. from a pool) belongs to the caller and is left open on close
+        self.context = context
+        self._owns_context = context is None
         self.page = None
+        self._screenshot_task = None
+        self._last_frame_digest = None
 
     async def log(self, message):
         print(f"[Agent] {message}")
@@ -21,27 +28,48 @@ class AsyncBrowserAgent:
             try:
                 if self.page.is_closed():
                     return
-                # Capture as base64 for easy transport over WS
-                screenshot_bytes = await self.page.screenshot(format="jpeg", quality=50)
-                b64_img = base64.b64encode(screenshot_bytes).decode('utf-8')
-                await self.screenshot_callback(b64_img)
+                # Raw JPEG bytes; sent as a binary WS frame, no base64/JSON wrapping
+                screenshot_bytes = await self.page.screenshot(type="jpeg", quality=50)
+                # An unchanged page encodes to the same bytes; don't resend it
+                digest = hashlib.blake2b(screenshot_bytes, digest_size=8).digest()
+                if digest == self._last_frame_digest:
+                    return
+                self._last_frame_digest = digest
+                await self.screenshot_callback(screenshot_bytes)
             except Exception as e:
                 pass
 
+    async def _screenshot_loop(self):
+        """Stream frames on a fixed interval, independent of the commands being executed."""
+        while True:
+            await asyncio.sleep(SCREENSHOT_INTERVAL)
+            await self.capture_screen()
+
     async def start_session(self):
         """Initialize the persistent browser context/page."""
         try:
             await self.log("Starting New Browser Session...")
-            self.context = await self.browser.new_context(viewport={'width': 1280, 'height': 800})
-            self.page = await self.context.new_page()
+            if self.context is None:
+                self.context = await self.browser.new_context(viewport={'width': 1280, 'height': 800})
+            # Reuse a page the caller's context already has open
+            self.page = self.context.pages[0] if self.context.pages else await self.context.new_page()
+            self._screenshot_task = asyncio.create_task(self._screenshot_loop())
             await self.log("Session Ready.")
         except Exception as e:
             await self.log(f"Failed to start session: {e}")
 
     async def close(self):
         """Cleanup the session."""
+        if self._screenshot_task:
+            self._screenshot_task.cancel()
+            try:
+                await self._screenshot_task
+            except asyncio.CancelledError:
+                pass
+            self._screenshot_task = None
         if self.context:
-            await self.context.close()
+            if self._owns_context:
+                await self.context.close()
             await self.log("Session Closed.")
 
     async def navigate(self, url):
@@ -53,7 +81,6 @@ class AsyncBrowserAgent:
         try:
             await self.log(f"Navigating to: {url}")
             await self.page.goto(url)
-            await self.capture_screen()
         except Exception as e:
             await self.log(f"Navigation failed: {e}")
 
@@ -66,67 +93,102 @@ class AsyncBrowserAgent:
         await self.log("Executing Commands...")
         
         try:
-            steps = self._parse_instructions(instructions_text)
-            
-            for step in steps:
-                cmd = step["command"]
-                arg = step["args"]
-                
-                try:
-                    if cmd == "OPEN":
-                        await self.log(f"Opening: {arg}")
-                        await self.page.goto(arg)
-                    
-                    elif cmd == "CLICK":
-                        await self.log(f"Clicking: {arg}")
-                        await self.page.click(arg)
-                    
-                    elif cmd == "TYPE":
-                        if "|" in arg:
-                            selector, text = arg.split("|", 1)
-                            await self.log(f"Typing '{text.strip()}' into {selector.strip()}")
-                            await self.page.fill(selector.strip(), text.strip())
-                        else:
-                            await self.log(f"Invalid TYPE format: {arg}")
-
-                    elif cmd == "SCROLL":
-                        await self.log(f"Scrolling down {arg} pixels")
-                        await self.page.mouse.wheel(0, int(arg))
-                    
-                    elif cmd == "WAIT":
-                        await self.log(f"Waiting {arg} seconds")
-                        wait_time = int(arg)
-                        # Capture frames frequently
-                        for _ in range(wait_time * 2): 
-                            await asyncio.sleep(0.5)
-                            await self.capture_screen()
-                        continue
-                    
-                    elif cmd == "EXECUTE_JS":
-                        await self.log(f"Executing JS: {arg}")
-                        await self.page.evaluate(arg)
-
-                    elif cmd == "STOP":
-                        await self.log("Stop condition met.")
-                        break
-                    
-                    else:
-                        await self.log(f"Unknown command: {cmd}")
-
-                    await self.capture_screen()
-                    await asyncio.sleep(0.5)
-
-                except Exception as e:
-                    await self.log(f"Error executing {cmd}: {e}")
-            
+            # Steps are parsed lazily, so the first command runs before the rest is parsed
+            await self._run_steps(self._iter_instructions(instructions_text))
             await self.log("Command Batch Finished.")
             
         except Exception as e:
             tb = traceback.format_exc()
             await self.log(f"CRITICAL AGENT ERROR:\n{tb}")
     
-    def _parse_instructions(self, text):
-        steps = []
+    async def _run_steps(self, steps):
+        """Run steps (any iterable) in order. Returns False if a STOP ended the batch."""
+        for step in steps:
+            cmd = step["command"]
+
+            if cmd == "_LOOP":
+                # Loop bodies are stored once and replayed, not copied count times
+                for _ in range(step["count"]):
+                    if not await self._run_steps(step["body"]):
+                        return False
+                continue
+
+            if cmd == "STOP":
+                await self.log("Stop condition met.")
+                return False
+            
+            try:
+                handler = step["handler"]
+                if handler:
+                    await handler(step["args"])
+                else:
+                    await self.log(f"Unknown command: {cmd}")
+
+                # Frames keep streaming from the background task during WAIT, so it needs no extra pause
+                if cmd != "WAIT":
+                    await asyncio.sleep(0.5)
+
+            except Exception as e:
+                await self.log(f"Error executing {cmd}: {e}")
+
+        return True
+
+    async def _open(self, url):
+        await self.log(f"Opening: {url}")
+        await self.page.goto(url)
+
+    async def _click(self, selector):
+        await self.log(f"Clicking: {selector}")
+        await self.page.click(selector)
+
+    async def _type(self, arg):
+        if isinstance(arg, tuple):
+            selector, text = arg
+            await self.log(f"Typing '{text}' into {selector}")
+            await self.page.fill(selector, text)
+        else:
+            await self.log(f"Invalid TYPE format: {arg}")
+
+    async def _scroll(self, pixels):
+        await self.log(f"Scrolling down {pixels} pixels")
+        await self.page.mouse.wheel(0, int(pixels))
+
+    async def _wait(self, seconds):
+        await self.log(f"Waiting {seconds} seconds")
+        await asyncio.sleep(int(seconds))
+
+    async def _execute_js(self, script):
+        await self.log(f"Executing JS: {script}")
+        await self.page.evaluate(script)
+
+    def _handlers(self):
+        """Dispatch table: command name -> coroutine method taking the step's prepared args."""
+        return {
+            "OPEN": self._open,
+            "CLICK": self._click,
+            "TYPE": self._type,
+            "SCROLL": self._scroll,
+            "WAIT": self._wait,
+            "EXECUTE_JS": self._execute_js,
+        }
+
+    @staticmethod
+    def _prepare_args(command, args):
+        """Do per-step argument parsing once, at parse time."""
+        if command == "TYPE" and args and "|" in args:
+            selector, text = args.split("|", 1)
+            return (selector.strip(), text.strip())
+        if command in ("SCROLL", "WAIT"):
+            try:
+                return int(args)
+            except (TypeError, ValueError):
+                # Left as-is so the handler reports the bad value when the step runs
+                return args
+        return args
+
+    def _iter_instructions(self, text):
+        """Parse instructions line by line, yielding each top-level step as soon as it is complete."""
+        handlers = self._handlers()
         lines = text.splitlines()
         loop_buffer = []
         in_loop = False
@@ -148,17 +210,18 @@ class AsyncBrowserAgent:
             
             elif command == "LOOP_END":
                 if in_loop:
-                    for _ in range(loop_count):
-                        steps.extend(loop_buffer)
+                    yield {"command": "_LOOP", "body": loop_buffer, "count": loop_count}
                     in_loop = False
                     loop_buffer = []
                 continue
 
-            step = {"command": command, "args": args}
+            step = {
+                "command": command,
+                "args": self._prepare_args(command, args),
+                "handler": handlers.get(command)
+            }
             
             if in_loop:
                 loop_buffer.append(step)
             else:
-                steps.append(step)
-        
-        return steps
+                yield step
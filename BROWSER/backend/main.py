@@ -13,6 +13,38 @@ from .agent import AsyncBrowserAgent
 # Global state
 app_state = {}
 
+# Fresh browser contexts kept warm for new WebSocket sessions. A context is never
+# reused: storage (cookies, localStorage, IndexedDB, cache) would leak between users
+CONTEXT_POOL_SIZE = 4
+CONTEXT_OPTIONS = {"viewport": {'width': 1280, 'height': 800}}
+
+async def acquire_context(browser):
+    """Take a warm, never-used context from the pool, or create one if the pool is empty."""
+    try:
+        return app_state["context_pool"].get_nowait()
+    except asyncio.QueueEmpty:
+        return await browser.new_context(**CONTEXT_OPTIONS)
+
+async def release_context(browser, context):
+    """Close a context after its session and top the pool back up with a fresh one."""
+    try:
+        await context.close()
+    except Exception:
+        pass
+    pool = app_state["context_pool"]
+    if pool.full():
+        return
+    try:
+        fresh = await browser.new_context(**CONTEXT_OPTIONS)
+    except Exception as e:
+        print(f"Could not refill context pool: {e}")
+        return
+    try:
+        pool.put_nowait(fresh)
+    except asyncio.QueueFull:
+        # Another session refilled it meanwhile
+        await fresh.close()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Launch Playwright and Browser
@@ -23,6 +55,12 @@ async def lifespan(app: FastAPI):
     
     app_state["playwright"] = playwright
     app_state["browser"] = browser
+
+    # Prewarm contexts so connecting clients don't wait for Chromium to create one
+    pool = asyncio.Queue(maxsize=CONTEXT_POOL_SIZE)
+    for _ in range(CONTEXT_POOL_SIZE):
+        pool.put_nowait(await browser.new_context(**CONTEXT_OPTIONS))
+    app_state["context_pool"] = pool
     
     yield
     
@@ -54,9 +92,10 @@ async def websocket_endpoint(websocket: WebSocket):
         except:
             pass 
 
-    async def send_screenshot(b64_data):
+    async def send_screenshot(jpeg_bytes):
+        # Frames go out as binary messages; text messages stay JSON (logs)
         try:
-            await websocket.send_json({"type": "image", "data": b64_data})
+            await websocket.send_bytes(jpeg_bytes)
         except:
             pass
 
@@ -66,8 +105,9 @@ async def websocket_endpoint(websocket: WebSocket):
         await websocket.close()
         return
 
-    # Instantiate Agent and Start Session
-    agent = AsyncBrowserAgent(browser, output_callback=send_log, screenshot_callback=send_screenshot)
+    # Instantiate Agent and Start Session on a pooled context
+    context = await acquire_context(browser)
+    agent = AsyncBrowserAgent(browser, output_callback=send_log, screenshot_callback=send_screenshot, context=context)
     await agent.start_session()
 
     try:
@@ -90,5 +130,6 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         print(f"WebSocket Error: {e}")
     finally:
-        # Cleanup session on disconnect
+        # Cleanup session on disconnect; its context is discarded and replaced in the pool
         await agent.close()
+        await release_context(browser, context)
@@ -11,6 +11,7 @@ const statusIndicator = document.getElementById('status-indicator');
 const liveIndicator = document.querySelector('.live-indicator');
 
 let ws = null;
+let streamUrl = null;
 
 // --- WebSocket Connection ---
 function connectWebSocket() {
@@ -18,6 +19,8 @@ function connectWebSocket() {
     const wsUrl = `${protocol}//${window.location.host}/ws`;
 
     ws = new WebSocket(wsUrl);
+    // Screenshots arrive as binary JPEG frames
+    ws.binaryType = 'arraybuffer';
 
     ws.onopen = () => {
         log("System: Connected to Candy Cloud");
@@ -27,11 +30,13 @@ function connectWebSocket() {
     };
 
     ws.onmessage = (event) => {
+        if (event.data instanceof ArrayBuffer) {
+            updateStream(event.data);
+            return;
+        }
         const msg = JSON.parse(event.data);
         if (msg.type === "log") {
             log(msg.data);
-        } else if (msg.type === "image") {
-            updateStream(msg.data);
         }
     };
 
@@ -58,8 +63,12 @@ function log(message) {
     logOutput.scrollTop = logOutput.scrollHeight;
 }
 
-function updateStream(base64Data) {
-    liveStream.src = `data:image/jpeg;base64,${base64Data}`;
+function updateStream(jpegBuffer) {
+    // Swap in the new frame and release the previous one's object URL
+    const previousUrl = streamUrl;
+    streamUrl = URL.createObjectURL(new Blob([jpegBuffer], { type: 'image/jpeg' }));
+    liveStream.src = streamUrl;
+    if (previousUrl) URL.revokeObjectURL(previousUrl);
     document.querySelector('.browser-view').classList.add('active');
 
     liveIndicator.classList.add('active');
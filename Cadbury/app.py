@@ -1,17 +1,30 @@
 import streamlit as st
 import sys
-import time
 import multiprocessing
 import asyncio
+import html
+import queue
+from collections import deque
 from vanguard_simulator import run_vanguard_simulator
 
+# On-screen terminal keeps roughly the last 500 KB of output
+LOG_MAX_CHARS = 500_000
+# Poll faster while output is flowing, slower while the simulator is quiet
+LOG_POLL_ACTIVE_S = 0.5
+LOG_POLL_IDLE_S = 1.0
+# Messages buffered between the simulator and the UI before new ones are dropped
+LOG_QUEUE_MAXSIZE = 10_000
+
 # Helper to redirect stdout/stderr to a queue
 class QueueWriter:
     def __init__(self, queue):
         self.queue = queue
     def write(self, msg):
         if msg.strip():  # Only send non-empty messages to avoid clutter
-            self.queue.put(msg)
+            try:
+                self.queue.put_nowait(msg)
+            except queue.Full:
+                pass  # Drop output rather than stall the simulator if the UI falls behind
     def flush(self):
         pass
 
@@ -34,6 +47,26 @@ def safe_run_process(log_queue):
     except Exception as e:
         print(f"CRITICAL ERROR: {e}")
 
+def append_logs(msgs):
+    """
+    Escape a batch of new log messages once and add it to the session's log buffer,
+    dropping the oldest output beyond LOG_MAX_CHARS.
+    """
+    chunk = html.escape("".join(msgs))
+    st.session_state.logs.append(chunk)
+    st.session_state.log_chars += len(chunk)
+    while st.session_state.log_chars > LOG_MAX_CHARS and len(st.session_state.logs) > 1:
+        st.session_state.log_chars -= len(st.session_state.logs.popleft())
+
+def drain_queue(log_queue):
+    """Return every message currently waiting in the log queue."""
+    msgs = []
+    while True:
+        try:
+            msgs.append(log_queue.get_nowait())
+        except queue.Empty:
+            return msgs
+
 def main():
     st.set_page_config(
         page_title="Cadbury Automation",
@@ -45,8 +78,10 @@ def main():
     st.markdown("Click below to start the **Vanguard Simulator**.")
 
     # Session state for logs and running status
+    # Logs are stored already HTML-escaped, one chunk per poll
     if "logs" not in st.session_state:
-        st.session_state.logs = []
+        st.session_state.logs = deque()
+        st.session_state.log_chars = 0
     if "running" not in st.session_state:
         st.session_state.running = False
 
@@ -55,7 +90,8 @@ def main():
     # Button
     if st.button("Start Process", type="primary", use_container_width=True, disabled=st.session_state.running):
         st.session_state.running = True
-        st.session_state.logs = []  # Clear previous logs
+        st.session_state.logs = deque()  # Clear previous logs
+        st.session_state.log_chars = 0
         
         status_msg = st.empty()
         status_msg.info("🚀 Starting process...")
@@ -66,11 +102,8 @@ def main():
         log_placeholder = st.empty()
 
         def render_logs_dynamic():
-             # Build log text
-            raw_logs = "".join(st.session_state.logs) if st.session_state.logs else "Waiting for process to start..."
-            # Escape HTML to prevent rendering issues
-            import html
-            safe_logs = html.escape(raw_logs)
+             # Build log text (chunks are escaped as they arrive)
+            safe_logs = "".join(st.session_state.logs) if st.session_state.logs else "Waiting for process to start..."
             
             # Update the placeholder using HTML/CSS for a terminal look
             # This avoids Streamlit's DuplicateElementKey error for widgets in loops
@@ -93,34 +126,29 @@ def main():
                 unsafe_allow_html=True
             )
 
-        # Create Queue and Process
-        m = multiprocessing.Manager()
-        log_queue = m.Queue()
+        # Create Queue and Process (a plain pipe-backed queue; no Manager server process)
+        log_queue = multiprocessing.Queue(maxsize=LOG_QUEUE_MAXSIZE)
         
         p = multiprocessing.Process(target=safe_run_process, args=(log_queue,))
         p.start()
 
+        render_logs_dynamic()
+
         # Log polling loop
         while p.is_alive():
-            while not log_queue.empty():
-                try:
-                    msg = log_queue.get_nowait()
-                    st.session_state.logs.append(msg)
-                except:
-                    break
+            new_msgs = drain_queue(log_queue)
             
-            # Update UI dynamically
-            render_logs_dynamic()
-            time.sleep(0.5)
+            # Update UI only when there is new output
+            if new_msgs:
+                append_logs(new_msgs)
+                render_logs_dynamic()
+            # Waits like a sleep, but returns as soon as the simulator exits
+            p.join(timeout=LOG_POLL_ACTIVE_S if new_msgs else LOG_POLL_IDLE_S)
 
         # Catch remaining logs
-        while not log_queue.empty():
-            try:
-                msg = log_queue.get_nowait()
-                st.session_state.logs.append(msg)
-            except:
-                break
-        
+        new_msgs = drain_queue(log_queue)
+        if new_msgs:
+            append_logs(new_msgs)
         render_logs_dynamic()
         
         p.join()
@@ -136,9 +164,7 @@ def main():
         st.markdown("---")
         st.subheader("🖥️ Terminal Output")
         
-        import html
-        raw_logs = "".join(st.session_state.logs)
-        safe_logs = html.escape(raw_logs)
+        safe_logs = "".join(st.session_state.logs)
         
         st.markdown(
             f"""
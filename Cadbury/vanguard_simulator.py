@@ -1,4 +1,5 @@
-from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
+from playwright.async_api import async_playwright, TimeoutError as PWTimeout
+import asyncio
 import time
 import os
 import json
@@ -18,7 +19,26 @@ HEADLESS = os.getenv("HEADLESS", "true").lower() in ("1", "true", "yes")
 
 MIN_RUNTIME_S = int(os.getenv("MIN_RUNTIME_S", "300"))  # max wait per file
 MAX_PROCESS_TIMEOUT_MS = MIN_RUNTIME_S * 1000
-INTER_FILE_WAIT_MS = int(os.getenv("INTER_FILE_WAIT_MS", "2000"))
+# Files processed at once, each in its own browser context
+MAX_CONCURRENT_FILES = int(os.getenv("MAX_CONCURRENT_FILES", "4"))
+# How long each success/error wait runs before the current stage is checked
+STAGE_CHECK_MS = int(os.getenv("STAGE_CHECK_MS", "2000"))
+
+# Browser storage (cookies/localStorage) saved after the first load and reused on the
+# next run, so the app's session warm-up is skipped (empty string disables it)
+STORAGE_STATE_PATH = os.getenv("STORAGE_STATE_PATH", "vanguard_state.json")
+# Upper bound for the UI to react after a click (dropdown opening, selection applied)
+UI_WAIT_MS = int(os.getenv("UI_WAIT_MS", "5000"))
+# Grace period for the Download JSON button when it isn't there yet as the success banner shows
+DOWNLOAD_BUTTON_GRACE_MS = int(os.getenv("DOWNLOAD_BUTTON_GRACE_MS", "1000"))
+
+# Skip downloading images, fonts and media; only the app's text and controls are read
+BLOCK_HEAVY_RESOURCES = os.getenv("BLOCK_HEAVY_RESOURCES", "true").lower() in ("1", "true", "yes")
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+VIEWPORT = {"width": 1280, "height": 720}
+BROWSER_ARGS = ["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu"]
+if BLOCK_HEAVY_RESOURCES:
+    BROWSER_ARGS.append("--blink-settings=imagesEnabled=false")
 
 # Optional: enable Playwright tracing (handy for debugging flaky CI)
 ENABLE_TRACE = os.getenv("ENABLE_TRACE", "false").lower() in ("1", "true", "yes")
@@ -48,7 +68,20 @@ def ensure_dir(path: str) -> None:
 # DROPDOWN SCROLLER (FINAL)
 # ============================================================
 
-def collect_dropdown_pdfs(page):
+# Options worth processing: PDF names, minus the "PDFs for OCR" folder entry
+PDF_RE = re.compile(r"\.pdf$", re.IGNORECASE)
+SKIP_RE = re.compile(r"pdfs for ocr", re.IGNORECASE)
+
+# Returns the text of every rendered option, then scrolls the dropdown down one page
+READ_AND_SCROLL_OPTIONS_JS = """
+el => {
+    const texts = Array.from(el.querySelectorAll('[role="option"]'), o => o.innerText);
+    el.scrollBy(0, el.clientHeight);
+    return texts;
+}
+"""
+
+async def collect_dropdown_pdfs(page):
     """
     Robustly collect ALL Streamlit/BaseWeb selectbox options by scrolling
     the actual dropdown popover container until the option count stabilizes.
@@ -57,16 +90,19 @@ def collect_dropdown_pdfs(page):
     # 0) (Recommended) Refresh the document list if the button exists
     try:
         btn = page.get_by_role("button", name="Refresh Document List")
-        if btn.is_visible(timeout=500):
-            btn.click()
-            page.wait_for_timeout(1500)
+        if await btn.is_visible(timeout=500):
+            await btn.click()
+            await page.wait_for_timeout(1500)
     except Exception:
         pass
 
     # 1) Open dropdown
     selectbox = page.locator('div[data-testid="stSelectbox"]').first
-    selectbox.click()
-    page.wait_for_timeout(800)
+    await selectbox.click()
+    try:
+        await page.locator('[role="option"]').first.wait_for(state="visible", timeout=UI_WAIT_MS)
+    except PWTimeout:
+        pass  # Empty list; the collection below finds nothing and stops
 
     # 2) Find the dropdown popover + scroll container (Streamlit uses BaseWeb)
     # Try a few possible containers; whichever exists will be used.
@@ -83,7 +119,7 @@ def collect_dropdown_pdfs(page):
     scroll_container = None
     for c in scroll_container_candidates:
         try:
-            if c.count() > 0 and c.is_visible(timeout=500):
+            if await c.count() > 0 and await c.is_visible(timeout=500):
                 scroll_container = c
                 break
         except Exception:
@@ -93,6 +129,14 @@ def collect_dropdown_pdfs(page):
     # but scrolling might be limited.
     option_locator = page.locator('[role="option"]')
 
+    # Resolve the container once; the locator would otherwise be re-resolved every round
+    scroll_handle = None
+    if scroll_container is not None:
+        try:
+            scroll_handle = await scroll_container.element_handle(timeout=500)
+        except Exception:
+            scroll_handle = None
+
     seen = set()
     pdfs = []
 
@@ -102,20 +146,26 @@ def collect_dropdown_pdfs(page):
 
     for _ in range(max_rounds):
         # 3) Collect currently rendered options
-        try:
-            count = option_locator.count()
-        except Exception:
-            count = 0
+        # Preferred: read every option and scroll the container in a single round trip
+        texts = None
+        if scroll_handle is not None:
+            try:
+                texts = await scroll_handle.evaluate(READ_AND_SCROLL_OPTIONS_JS)
+            except Exception:
+                # Container was re-rendered; fall back to the locators below
+                scroll_handle = None
 
-        for i in range(count):
+        if texts is None:
+            # One round trip for every rendered option's text
             try:
-                txt = option_locator.nth(i).inner_text().strip()
+                texts = await option_locator.all_inner_texts()
             except Exception:
-                continue
+                texts = []
 
-            if not txt.lower().endswith(".pdf"):
-                continue
-            if "pdfs for ocr" in txt.lower():
+        for txt in texts:
+            txt = txt.strip()
+
+            if not PDF_RE.search(txt) or SKIP_RE.search(txt):
                 continue
 
             if txt not in seen:
@@ -136,24 +186,28 @@ def collect_dropdown_pdfs(page):
         # 5) Scroll the dropdown container (preferred)
         try:
             if scroll_container is not None:
-                # Scroll down inside the dropdown
-                scroll_container.evaluate("el => el.scrollBy(0, el.clientHeight)")
-                page.wait_for_timeout(250)
+                # Scroll down inside the dropdown (already done by the read above if it ran)
+                if scroll_handle is None:
+                    await scroll_container.evaluate("el => el.scrollBy(0, el.clientHeight)")
+                await page.wait_for_timeout(250)
 
                 # Also send End key occasionally to force lazy-load
                 if stable_rounds in (2, 4, 6):
-                    page.keyboard.press("End")
-                    page.wait_for_timeout(250)
+                    await page.keyboard.press("End")
+                    await page.wait_for_timeout(250)
             else:
                 # Fallback: try wheel scroll (less reliable)
-                page.mouse.wheel(0, 1600)
-                page.wait_for_timeout(250)
+                await page.mouse.wheel(0, 1600)
+                await page.wait_for_timeout(250)
         except Exception:
-            page.wait_for_timeout(250)
+            await page.wait_for_timeout(250)
 
     # 6) Close dropdown
-    page.keyboard.press("Escape")
-    page.wait_for_timeout(300)
+    await page.keyboard.press("Escape")
+    try:
+        await page.locator('[role="listbox"]').first.wait_for(state="hidden", timeout=UI_WAIT_MS)
+    except PWTimeout:
+        pass
 
     return pdfs
 
@@ -163,7 +217,7 @@ def collect_dropdown_pdfs(page):
 # WAIT FOR SUCCESS / ERROR (TAILORED TO YOUR UI)
 # ============================================================
 
-def wait_for_processing_result(page, timeout_ms: int):
+async def wait_for_processing_result(page, timeout_ms: int, label: str = ""):
     """
     Wait for the Streamlit success banner:
       "Document processed successfully! Saved to: <file>.json"
@@ -185,9 +239,6 @@ def wait_for_processing_result(page, timeout_ms: int):
         page.locator('text=/failed/i'),
     ]
 
-    start = time.time()
-    poll_ms = 1000
-
     # Optional: stage texts (useful for printing current stage if you want)
     stage_texts = [
         "Downloading document from blob storage",
@@ -196,13 +247,48 @@ def wait_for_processing_result(page, timeout_ms: int):
         "Saving processed data to blob storage",
     ]
 
+    # One composite locator, so Playwright waits for whichever signal shows up first
+    # instead of us polling every locator each second
+    outcome = success
+    for e in errors:
+        outcome = outcome.or_(e)
+    stage_locator = page.locator(
+        "text=/" + "|".join(re.escape(s) for s in stage_texts) + "/i"
+    )
+
+    deadline = time.time() + timeout_ms / 1000
     last_stage = None
 
-    while (time.time() - start) * 1000 < timeout_ms:
+    while True:
+        remaining_ms = (deadline - time.time()) * 1000
+        if remaining_ms <= 0:
+            break
+
+        # Wait in slices so stage transitions can still be printed along the way
+        try:
+            await outcome.first.wait_for(state="visible", timeout=min(STAGE_CHECK_MS, remaining_ms))
+        except PWTimeout:
+            # (Optional) Print stage transitions for visibility in logs;
+            # the newest stage banner is the last one rendered
+            try:
+                current = stage_locator.last
+                if await current.is_visible():
+                    txt = (await current.inner_text()).lower()
+                    s = next((s for s in stage_texts if s.lower() in txt), None)
+                    if s and last_stage != s:
+                        last_stage = s
+                        print(f"   ↳ {label + ': ' if label else ''}Stage: {s}...")
+            except Exception:
+                pass
+            continue
+        except Exception:
+            await page.wait_for_timeout(250)
+            continue
+
         # ✅ SUCCESS
         try:
-            if success.first.is_visible(timeout=200):
-                msg = success.first.inner_text().strip()
+            if await success.first.is_visible():
+                msg = (await success.first.inner_text()).strip()
                 return ("succeeded", msg)
         except Exception:
             pass
@@ -210,157 +296,232 @@ def wait_for_processing_result(page, timeout_ms: int):
         # ❌ FAILURE
         for e in errors:
             try:
-                if e.first.is_visible(timeout=200):
-                    txt = e.first.inner_text().strip()
+                if await e.first.is_visible():
+                    txt = (await e.first.inner_text()).strip()
                     return ("failed", txt or "Error detected in UI")
             except Exception:
                 pass
 
-        # (Optional) Print stage transitions for visibility in logs
-        for s in stage_texts:
+        # The signal went away before it could be read; don't spin on it
+        await page.wait_for_timeout(250)
+
+    return ("timeout", f"No success/error signal within {timeout_ms/1000:.0f}s")
+
+
+def has_storage_state() -> bool:
+    return bool(STORAGE_STATE_PATH) and os.path.exists(STORAGE_STATE_PATH)
+
+
+async def _block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def new_app_context(browser):
+    """New browser context, starting from the saved storage state if there is one."""
+    context = await browser.new_context(
+        storage_state=STORAGE_STATE_PATH if has_storage_state() else None,
+        viewport=VIEWPORT
+    )
+    if BLOCK_HEAVY_RESOURCES:
+        await context.route("**/*", _block_heavy_resources)
+    return context
+
+
+# ============================================================
+# PER-FILE WORKER
+# ============================================================
+
+async def process_file(browser, file_label: str):
+    """
+    Process one PDF in its own browser context, so several files can be
+    in flight at once. Returns the result row for the summary.
+    """
+    start = time.time()
+    status = "failed"
+    msg = ""
+
+    context = None
+    page = None
+
+    print(f"\n========== Processing {file_label} ==========")
+
+    try:
+        # Setup failures (unreadable storage state, browser errors) fail this file, not the run
+        context = await new_app_context(browser)
+        if ENABLE_TRACE:
+            await context.tracing.start(screenshots=True, snapshots=True, sources=True)
+        page = await context.new_page()
+        page.on("console", lambda m: print(f"[console:{m.type}] {file_label}: {m.text}"))
+
+        await page.goto(APP_URL, timeout=120000, wait_until="domcontentloaded")
+        selectbox = page.locator('div[data-testid="stSelectbox"]').first
+        await selectbox.wait_for(state="visible", timeout=120000)
+
+        # Type the name into the selectbox's search input: the list filters down to it, so the
+        # option is rendered without opening and scrolling the full list. Then pick the exact
+        # match (a plain substring match could hit e.g. "a.pdf" inside "data.pdf")
+        await selectbox.locator("input").fill(file_label)
+        await page.get_by_role("option", name=file_label, exact=True).first.click()
+
+        # Selection is applied once the selectbox shows it and the button is rendered
+        await selectbox.get_by_text(file_label).first.wait_for(state="visible", timeout=UI_WAIT_MS)
+        process_btn = page.get_by_role("button", name="Process Document").first
+        await process_btn.wait_for(state="visible", timeout=UI_WAIT_MS)
+
+        # Click Process Document
+        await process_btn.click()
+        print(f"⏳ Processing started: {file_label}")
+
+        # Wait for success/failure/timeout based on UI
+        status, msg = await wait_for_processing_result(page, MAX_PROCESS_TIMEOUT_MS, label=file_label)
+
+        # Optional sanity check: ensure "Download JSON" button exists after success.
+        # It normally renders with the banner, so probe it once before falling back to
+        # a short wait (Streamlit can deliver the two elements in separate updates)
+        if status == "succeeded":
+            download_btn = page.get_by_role("button", name="Download JSON")
             try:
-                loc = page.locator(f'text=/{re.escape(s)}/i')
-                if loc.first.is_visible(timeout=50):
-                    if last_stage != s:
-                        last_stage = s
-                        print(f"   ↳ Stage: {s}...")
-                    break
+                if await download_btn.count() == 0:
+                    await download_btn.first.wait_for(timeout=DOWNLOAD_BUTTON_GRACE_MS)
             except Exception:
+                status = "failed"
+                msg = "Success banner appeared but 'Download JSON' button not found."
+
+        if status == "succeeded":
+            print(f"✅ Completed: {file_label}")
+            print(f"   {msg}")
+        elif status == "timeout":
+            print(f"⏱️ TIMEOUT: {file_label}")
+            print(f"   {msg}")
+        else:
+            print(f"❌ FAILED: {file_label}")
+            print(f"   {msg}")
+
+    except Exception as e:
+        status = "failed"
+        msg = str(e)
+        print(f"❌ Exception: {file_label} | {msg}")
+
+    finally:
+        # Artifacts on non-success
+        if SAVE_SCREENSHOTS and status != "succeeded" and page is not None:
+            try:
+                fn = safe_filename(f"{file_label}_{status}.png")
+                path = os.path.join(ARTIFACT_DIR, fn)
+                await page.screenshot(path=path, full_page=True)
+                print(f"🖼️ Saved screenshot: {path}")
+            except Exception as _:
                 pass
 
-        page.wait_for_timeout(poll_ms)
+        if context is not None:
+            if ENABLE_TRACE:
+                try:
+                    trace_path = os.path.join(TRACE_DIR, safe_filename(f"trace_{file_label}_{int(time.time())}.zip"))
+                    await context.tracing.stop(path=trace_path)
+                    print(f"🧵 Saved Playwright trace: {trace_path}")
+                except Exception:
+                    pass
 
-    return ("timeout", f"No success/error signal within {timeout_ms/1000:.0f}s")
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+    return {
+        "file": file_label,
+        "status": status,
+        "duration_seconds": round(time.time() - start, 2),
+        "message": msg,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
 
 
 # ============================================================
 # MAIN RUNNER
 # ============================================================
 
-def run_vanguard_simulator():
+async def launch_browser(p):
+    try:
+        return await p.chromium.launch(
+            headless=HEADLESS, 
+            args=BROWSER_ARGS
+        )
+    except Exception as e:
+        # If the browser executable is missing, install it and retry
+        if "Executable doesn't exist" in str(e):
+            print("⚠️ Playwright browser not found. Installing chromium...")
+            import subprocess
+            import sys
+            subprocess.run([sys.executable, "-m", "playwright", "install", "chromium"], check=True)
+            print("✅ Browser installed. Retrying launch...")
+            return await p.chromium.launch(
+                headless=HEADLESS,
+                args=BROWSER_ARGS
+            )
+        raise e
+
+
+async def _run_vanguard_simulator():
     ensure_dir(ARTIFACT_DIR)
     ensure_dir(TRACE_DIR)
 
-    with sync_playwright() as p:
-        try:
-            browser = p.chromium.launch(
-                headless=HEADLESS, 
-                args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu"]
-            )
-        except Exception as e:
-            # If the browser executable is missing, install it and retry
-            if "Executable doesn't exist" in str(e):
-                print("⚠️ Playwright browser not found. Installing chromium...")
-                import subprocess
-                import sys
-                subprocess.run([sys.executable, "-m", "playwright", "install", "chromium"], check=True)
-                print("✅ Browser installed. Retrying launch...")
-                browser = p.chromium.launch(
-                    headless=HEADLESS,
-                    args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu"]
-                )
-            else:
-                raise e
-
-        context = browser.new_context()
-        if ENABLE_TRACE:
-            context.tracing.start(screenshots=True, snapshots=True, sources=True)
+    async with async_playwright() as p:
+        # One browser shared by every context
+        browser = await launch_browser(p)
 
-        page = context.new_page()
+        reuse_state = has_storage_state()
+        context = await new_app_context(browser)
+        page = await context.new_page()
 
         # Helpful console logging (Streamlit sometimes logs useful details)
         page.on("console", lambda msg: print(f"[console:{msg.type}] {msg.text}"))
 
         print(f"🌍 Opening Vanguard App (HEADLESS={HEADLESS})")
-        page.goto(APP_URL, timeout=120000)
-        page.wait_for_timeout(6000)
+        await page.goto(APP_URL, timeout=120000, wait_until="domcontentloaded")
+        # Ready once Streamlit has rendered the document dropdown
+        await page.locator('div[data-testid="stSelectbox"]').first.wait_for(state="visible", timeout=120000)
+
+        if STORAGE_STATE_PATH and not reuse_state:
+            try:
+                await context.storage_state(path=STORAGE_STATE_PATH)
+            except Exception as e:
+                print(f"⚠️ Could not save browser storage state: {e}")
 
         # --------------------------------------------------------
         # READ FILES FROM UI
         # --------------------------------------------------------
         print("📂 Reading file list from UI dropdown...")
-        files = collect_dropdown_pdfs(page)
+        files = await collect_dropdown_pdfs(page)
+        await context.close()
 
         if not files:
             print("❌ No eligible PDF files found in dropdown.")
-            context.close()
-            browser.close()
+            await browser.close()
             return
 
         print(f"📄 PDFs to process ({len(files)}):")
         for f in files:
             print(" -", f)
 
-        results = []
-
         # --------------------------------------------------------
-        # PROCESS EACH FILE
+        # PROCESS FILES (up to MAX_CONCURRENT_FILES at once)
         # --------------------------------------------------------
-        for file_label in files:
-            print(f"\n========== Processing {file_label} ==========")
-            start = time.time()
-            status = "failed"
-            msg = ""
-
-            try:
-                # Open dropdown
-                page.locator('div[data-testid="stSelectbox"]').first.click()
-                page.wait_for_timeout(400)
-
-                # Select by label (Streamlit options are text nodes; substring collisions are rare but possible)
-                # If you ever see collisions, switch to exact regex match with anchors.
-                page.locator('[role="option"]', has_text=file_label).first.click()
-                page.wait_for_timeout(600)
-
-                # Click Process Document
-                page.get_by_role("button", name="Process Document").first.click()
-                print("⏳ Processing started...")
-
-                # Wait for success/failure/timeout based on UI
-                status, msg = wait_for_processing_result(page, MAX_PROCESS_TIMEOUT_MS)
-
-                # Optional sanity check: ensure "Download JSON" button exists after success
-                if status == "succeeded":
-                    try:
-                        page.get_by_role("button", name="Download JSON").wait_for(timeout=5000)
-                    except Exception:
-                        status = "failed"
-                        msg = "Success banner appeared but 'Download JSON' button not found."
-
-                if status == "succeeded":
-                    print(f"✅ Completed: {file_label}")
-                    print(f"   {msg}")
-                elif status == "timeout":
-                    print(f"⏱️ TIMEOUT: {file_label}")
-                    print(f"   {msg}")
-                else:
-                    print(f"❌ FAILED: {file_label}")
-                    print(f"   {msg}")
+        semaphore = asyncio.Semaphore(max(1, MAX_CONCURRENT_FILES))
 
-            except Exception as e:
-                status = "failed"
-                msg = str(e)
-                print(f"❌ Exception: {file_label} | {msg}")
-
-            # Artifacts on non-success
-            if SAVE_SCREENSHOTS and status != "succeeded":
-                try:
-                    fn = safe_filename(f"{file_label}_{status}.png")
-                    path = os.path.join(ARTIFACT_DIR, fn)
-                    page.screenshot(path=path, full_page=True)
-                    print(f"🖼️ Saved screenshot: {path}")
-                except Exception as _:
-                    pass
+        async def process_limited(file_label):
+            async with semaphore:
+                return await process_file(browser, file_label)
 
-            results.append({
-                "file": file_label,
-                "status": status,
-                "duration_seconds": round(time.time() - start, 2),
-                "message": msg,
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            })
+        results = []
+        for finished in asyncio.as_completed([process_limited(f) for f in files]):
+            results.append(await finished)
 
-            page.wait_for_timeout(INTER_FILE_WAIT_MS)
+        # Report in dropdown order, whatever order the files finished in
+        order = {f: i for i, f in enumerate(files)}
+        results.sort(key=lambda r: order[r["file"]])
 
         # --------------------------------------------------------
         # SAVE RESULTS
@@ -380,14 +541,12 @@ def run_vanguard_simulator():
                     r["timestamp"]
                 ])
 
-        if ENABLE_TRACE:
-            trace_path = os.path.join(TRACE_DIR, f"trace_{int(time.time())}.zip")
-            context.tracing.stop(path=trace_path)
-            print(f"🧵 Saved Playwright trace: {trace_path}")
-
         print("\n🎉 Vanguard run complete")
-        context.close()
-        browser.close()
+        await browser.close()
+
+
+def run_vanguard_simulator():
+    asyncio.run(_run_vanguard_simulator())
 
 
 if __name__ == "__main__":
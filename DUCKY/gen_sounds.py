@@ -1,8 +1,6 @@
 import wave
-import math
-import struct
-import random
 import os
+import numpy as np
 
 SAMPLE_RATE = 44100
 
@@ -11,32 +9,33 @@ def save_wav(filename, data):
         f.setnchannels(1)
         f.setsampwidth(2)
         f.setframerate(SAMPLE_RATE)
-        for s in data:
-            f.writeframes(struct.pack('h', int(s * 32767.0)))
+        # 16-bit little-endian PCM, truncated toward zero like int()
+        f.writeframes((np.asarray(data) * 32767.0).astype('<i2').tobytes())
+
+def _phase(freq, duration):
+    t = np.arange(int(SAMPLE_RATE * duration))
+    return 2 * np.pi * freq * t / SAMPLE_RATE
 
 def gen_noise(duration):
-    return [random.uniform(-1, 1) for _ in range(int(SAMPLE_RATE * duration))]
+    return np.random.uniform(-1, 1, int(SAMPLE_RATE * duration))
 
 def gen_square(freq, duration):
-    n_samples = int(SAMPLE_RATE * duration)
-    return [1.0 if math.sin(2 * math.pi * freq * t / SAMPLE_RATE) > 0 else -1.0 for t in range(n_samples)]
+    return np.where(np.sin(_phase(freq, duration)) > 0, 1.0, -1.0)
 
 def gen_sine(freq, duration):
-    return [math.sin(2 * math.pi * freq * t / SAMPLE_RATE) for t in range(int(SAMPLE_RATE * duration))]
+    return np.sin(_phase(freq, duration))
 
 def envelope(data, attack, decay):
     n = len(data)
     att_len = int(n * attack)
     dec_len = int(n * decay)
-    res = []
-    for i, s in enumerate(data):
-        amp = 1.0
-        if i < att_len:
-            amp = i / att_len
-        elif i > n - dec_len:
-            amp = (n - i) / dec_len
-        res.append(s * amp)
-    return res
+    i = np.arange(n)
+    amp = np.ones(n)
+    # Linear fade in over the first att_len samples, fade out over the last dec_len
+    amp[:att_len] = i[:att_len] / att_len
+    dec_start = max(att_len, n - dec_len + 1)
+    amp[dec_start:] = (n - i[dec_start:]) / dec_len
+    return data * amp
 
 # --- Sound Definitions ---
 
@@ -48,10 +47,8 @@ def make_shoot():
 
 # 2. Quack (Low square wave)
 def make_quack():
-    data = []
     # Two tones
-    data.extend(gen_square(300, 0.1))
-    data.extend(gen_square(200, 0.1))
+    data = np.concatenate([gen_square(300, 0.1), gen_square(200, 0.1)])
     data = envelope(data, 0.1, 0.1)
     save_wav("assets/quack.wav", data)
 
@@ -63,16 +60,17 @@ def make_flap():
 
 # 4. Start (Jingle)
 def make_start():
-    data = []
+    parts = []
     melody = [523, 659, 783, 1046, 783, 659, 523, 0, 587, 739, 880] # C E G C G E C ...
     tempo = 0.1
     for freq in melody:
         if freq == 0:
-            data.extend([0] * int(SAMPLE_RATE * tempo))
+            parts.append(np.zeros(int(SAMPLE_RATE * tempo)))
         else:
             tone = gen_square(freq, tempo)
             tone = envelope(tone, 0.1, 0.1)
-            data.extend(tone)
+            parts.append(tone)
+    data = np.concatenate(parts)
     save_wav("assets/start.wav", data)
 
 if __name__ == "__main__":
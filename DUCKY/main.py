@@ -3,6 +3,8 @@ import cv2
 import random
 import sys
 import os
+import threading
+import time
 import traceback
 
 print(">>> GAME LAUNCHING...")
@@ -75,6 +77,34 @@ class SoundManager:
             try: self.sounds[name].play()
             except: pass
 
+class CameraThread(threading.Thread):
+    """Reads camera frames in the background, keeping only the newest one for the game loop."""
+    def __init__(self, cap):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self._lock = threading.Lock()
+        self._latest = None
+        self._running = True
+
+    def run(self):
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+            with self._lock:
+                self._latest = frame
+
+    def get_latest(self):
+        """Return the newest frame not handed out yet, or None if none has arrived since."""
+        with self._lock:
+            frame, self._latest = self._latest, None
+        return frame
+
+    def stop(self):
+        self._running = False
+        self.join(timeout=1)
+
 class Dog(pygame.sprite.Sprite):
     def __init__(self):
         super().__init__()
@@ -176,6 +206,10 @@ class Duck(pygame.sprite.Sprite):
             s.fill((0,255,0))
             self.frames = [s]
 
+        # Flipped variants are fixed, so build them once instead of every frame
+        self.frames_right = [pygame.transform.flip(f, True, False) for f in self.frames]
+        self.frame_falling = pygame.transform.flip(self.frames[1], False, True) if len(self.frames) > 1 else None
+
         self.image = self.frames[0]
         self.rect = self.image.get_rect()
         self.speed = speed
@@ -202,15 +236,13 @@ class Duck(pygame.sprite.Sprite):
             
             if len(self.frames) > 1:
                 idx = (pygame.time.get_ticks() // 150) % len(self.frames)
-                img = self.frames[idx]
-                if self.speed_x > 0:
-                    img = pygame.transform.flip(img, True, False)
-                self.image = img
+                frames = self.frames_right if self.speed_x > 0 else self.frames
+                self.image = frames[idx]
             
         elif self.falling:
             self.rect.y += 10
-            if len(self.frames) > 1:
-                self.image = pygame.transform.flip(self.frames[1], False, True)
+            if self.frame_falling is not None:
+                self.image = self.frame_falling
             if self.rect.top > SCREEN_HEIGHT:
                 self.kill()
                 return "CAUGHT" 
@@ -267,6 +299,7 @@ def main():
     # Hand Tracker Lazy Load
     tracker = None
     cap = None
+    camera = None
 
     control_mode = "MOUSE"
     state = STATE_MENU
@@ -280,6 +313,9 @@ def main():
     dog_group = pygame.sprite.GroupSingle()
     
     hud_rect = pygame.Rect(0, SCREEN_HEIGHT-80, SCREEN_WIDTH, 80)
+    # HUD is redrawn only when what it shows changes; otherwise the cached surface is blitted
+    hud_surface = pygame.Surface(hud_rect.size).convert()
+    hud_key = None
     
     running = True
     cursor_pos = (0,0)
@@ -301,20 +337,24 @@ def main():
                  if control_mode == "HAND" and tracker is None:
                      if HandTracker:
                          try:
-                             print("Init Camera...")
-                             cap = cv2.VideoCapture(0)
+                             if camera is None:
+                                 print("Init Camera...")
+                                 cap = cv2.VideoCapture(0)
+                                 camera = CameraThread(cap)
+                                 camera.start()
                              print("Init Tracker...")
                              tracker = HandTracker()
                          except Exception as e:
                              print(f"Tracker init failed: {e}")
                              tracker = None
 
-        # Vision
-        if control_mode == "HAND" and tracker and cap:
-            ret, frame = cap.read()
-            if ret:
+        # Vision (frames come from the camera thread; ticks without a new frame keep the last aim)
+        if control_mode == "HAND" and tracker and camera:
+            frame = camera.get_latest()
+            if frame is not None:
                 frame = cv2.flip(frame, 1)
-                frame = tracker.find_hands(frame)
+                # The camera frame is never shown in game, so skip the landmark overlay
+                frame = tracker.find_hands(frame, draw=False)
                 info = tracker.get_aim_info(frame, SCREEN_WIDTH, SCREEN_HEIGHT)
                 if info:
                     cx, cy, shooting = info
@@ -397,17 +437,20 @@ def main():
                     state = STATE_ROUND_START
                     round_num += 1
 
-        # HUD
-        pygame.draw.rect(screen, GREEN_GROUND, hud_rect)
-        for i in range(ammo):
-            pygame.draw.rect(screen, RED, (50 + i*20, SCREEN_HEIGHT-60, 10, 20))
-        
-        for i, hit in enumerate(hits_in_round):
-            color = RED if hit else BLACK
-            pygame.draw.circle(screen, color, (300 + i*30, SCREEN_HEIGHT-40), 10)
-        
-        score_txt = font.render(f"SCORE: {score:05}", True, WHITE)
-        screen.blit(score_txt, (SCREEN_WIDTH - 250, SCREEN_HEIGHT-50))
+        # HUD (drawn in hud_surface coordinates: y is relative to hud_rect.top)
+        if hud_key != (ammo, tuple(hits_in_round), score):
+            hud_key = (ammo, tuple(hits_in_round), score)
+            hud_surface.fill(GREEN_GROUND)
+            for i in range(ammo):
+                pygame.draw.rect(hud_surface, RED, (50 + i*20, 20, 10, 20))
+            
+            for i, hit in enumerate(hits_in_round):
+                color = RED if hit else BLACK
+                pygame.draw.circle(hud_surface, color, (300 + i*30, 40), 10)
+            
+            score_txt = font.render(f"SCORE: {score:05}", True, WHITE)
+            hud_surface.blit(score_txt, (SCREEN_WIDTH - 250, 30))
+        screen.blit(hud_surface, hud_rect)
 
         pygame.mouse.set_visible(False)
         c_rect = cursor_img.get_rect(center=cursor_pos)
@@ -416,6 +459,7 @@ def main():
         pygame.display.flip()
         clock.tick(FPS)
 
+    if camera: camera.stop()
     if cap: cap.release()
     cv2.destroyAllWindows()
     pygame.quit()
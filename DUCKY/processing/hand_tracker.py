@@ -1,23 +1,43 @@
+import functools
 import cv2
 import mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
-import math
 import numpy as np
 
+# Landmark pairs measured for shot detection, as (from, to) index arrays:
+# thumb tip -> index MCP (curl), thumb tip -> index tip (pinch), wrist -> middle MCP (hand size)
+DIST_FROM = [4, 4, 0]
+DIST_TO = [5, 8, 9]
+
+# Landmark dots for the debug overlay: pixel offsets of a filled radius-5 disk
+LANDMARK_COLOR = (255, 0, 255)
+_dy, _dx = np.mgrid[-5:6, -5:6]
+DOT_OFFSETS = np.stack([_dx, _dy], axis=-1)[_dx ** 2 + _dy ** 2 <= 25]
+
+@functools.lru_cache(maxsize=1)
+def _get_detector(model_path):
+    """
+    Create the HandLandmarker once per process; every HandTracker shares it.
+    A failed load raises and is not cached, so the next tracker retries.
+    """
+    base_options = python.BaseOptions(model_asset_path=model_path)
+    options = vision.HandLandmarkerOptions(
+        base_options=base_options,
+        num_hands=1,
+        min_hand_detection_confidence=0.5,
+        min_hand_presence_confidence=0.5,
+        min_tracking_confidence=0.5)
+    return vision.HandLandmarker.create_from_options(options)
+
 class HandTracker:
     def __init__(self, model_path='assets/hand_landmarker.task'):
-        # Create an HandLandmarker object.
+        # Create an HandLandmarker object (or reuse the one already loaded).
         try:
-            base_options = python.BaseOptions(model_asset_path=model_path)
-            options = vision.HandLandmarkerOptions(
-                base_options=base_options,
-                num_hands=1,
-                min_hand_detection_confidence=0.5,
-                min_hand_presence_confidence=0.5,
-                min_tracking_confidence=0.5)
-            self.detector = vision.HandLandmarker.create_from_options(options)
+            self.detector = _get_detector(model_path)
             self.results = None
+            # RGB copy of the camera frame, reused while the frame size stays the same
+            self._rgb_buf = None
             print(f"HandTracker initialized with model: {model_path}")
         except Exception as e:
             print(f"Failed to init HandTracker: {e}")
@@ -27,21 +47,26 @@ class HandTracker:
         if not self.detector:
             return img
 
-        # Convert the image to RGB
-        rgb_image = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_image)
+        # Convert the image to RGB (into the reused buffer; detect() below is synchronous)
+        if self._rgb_buf is None or self._rgb_buf.shape != img.shape:
+            self._rgb_buf = np.empty_like(img)
+        cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=self._rgb_buf)
 
         # Detect
         self.results = self.detector.detect(mp_image)
         
         # Simple Draw
         if draw and self.results.hand_landmarks:
+            h, w, _ = img.shape
             for hand_landmarks in self.results.hand_landmarks:
-                h, w, _ = img.shape
-                # Draw connections could be complex manually, lets just draw points
-                for lm in hand_landmarks:
-                    cx, cy = int(lm.x * w), int(lm.y * h)
-                    cv2.circle(img, (cx, cy), 5, (255, 0, 255), cv2.FILLED)
+                # Draw connections could be complex manually, lets just draw points:
+                # every dot's pixels are written in one indexed assignment
+                centres = (np.array([(lm.x, lm.y) for lm in hand_landmarks]) * (w, h)).astype(np.int32)
+                dots = (centres[:, None, :] + DOT_OFFSETS[None, :, :]).reshape(-1, 2)
+                inside = (dots[:, 0] >= 0) & (dots[:, 0] < w) & (dots[:, 1] >= 0) & (dots[:, 1] < h)
+                dots = dots[inside]
+                img[dots[:, 1], dots[:, 0]] = LANDMARK_COLOR
         return img
 
     def get_aim_info(self, img, screen_w, screen_h):
@@ -53,10 +78,6 @@ class HandTracker:
         
         # Indices: Index Tip = 8, Thumb Tip = 4, Thumb IP = 3, Index MCP = 5, Wrist = 0, Middle MCP = 9
         index_tip = hand_lms[8]
-        thumb_tip = hand_lms[4]
-        index_mcp = hand_lms[5]
-        wrist = hand_lms[0]
-        middle_mcp = hand_lms[9]
         
         # Mirror X for aim?
         # If camera is flipped (Mirror mode), x increases Left->Right.
@@ -64,13 +85,14 @@ class HandTracker:
         aim_x = int(index_tip.x * screen_w)
         aim_y = int(index_tip.y * screen_h)
 
-        # Calculate Distances
+        # Calculate Distances (all three at once over an (N, 2) landmark array)
         # 1. Thumb Tip to Index MCP (Hammer/Curl)
-        dist_curl = math.hypot(thumb_tip.x - index_mcp.x, thumb_tip.y - index_mcp.y)
         # 2. Thumb Tip to Index Tip (Pinch)
-        dist_pinch = math.hypot(thumb_tip.x - index_tip.x, thumb_tip.y - index_tip.y)
-
-        hand_size = math.hypot(wrist.x - middle_mcp.x, wrist.y - middle_mcp.y)
+        # 3. Wrist to Middle MCP (Hand size)
+        pts = np.fromiter(
+            (c for lm in hand_lms for c in (lm.x, lm.y)), dtype=np.float64, count=len(hand_lms) * 2
+        ).reshape(-1, 2)
+        dist_curl, dist_pinch, hand_size = np.linalg.norm(pts[DIST_FROM] - pts[DIST_TO], axis=1)
         
         is_shooting = False
         if hand_size > 0:
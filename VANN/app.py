@@ -9,9 +9,10 @@ from datetime import datetime
 from config import Config
 from src.blob_storage import BlobStorageService
 from src.document_intelligence import DocumentIntelligenceService
-from src.openai_service import OpenAIService
+from src.openai_service import OpenAIService, RESPONSE_CACHE_MAX_AGE
 from src.rules_validator import RulesValidator
 from utils.helpers import generate_output_path, format_json_output
+from utils.extraction_cache import ExtractionCache
 
 from utils.blob_log_handler import InMemoryLogHandler
 
@@ -136,14 +137,28 @@ def initialize_services():
         
         st.session_state.doc_intelligence_service = DocumentIntelligenceService(
             Config.AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT,
-            Config.AZURE_DOCUMENT_INTELLIGENCE_KEY
+            Config.AZURE_DOCUMENT_INTELLIGENCE_KEY,
+            cache=ExtractionCache(
+                Config.DOCUMENT_CACHE_PATH,
+                max_age=Config.DOCUMENT_CACHE_MAX_AGE or None
+            ) if Config.DOCUMENT_CACHE_PATH else None
         )
         
         st.session_state.openai_service = OpenAIService(
             Config.AZURE_OPENAI_ENDPOINT,
             Config.AZURE_OPENAI_API_KEY,
             Config.AZURE_OPENAI_API_VERSION,
-            Config.AZURE_OPENAI_DEPLOYMENT_NAME
+            Config.AZURE_OPENAI_DEPLOYMENT_NAME,
+            cache=ExtractionCache(
+                Config.OPENAI_CACHE_PATH,
+                max_age=RESPONSE_CACHE_MAX_AGE
+            ) if Config.OPENAI_CACHE_PATH else None,
+            max_workers=Config.OPENAI_MAX_WORKERS,
+            requests_per_minute=Config.OPENAI_REQUESTS_PER_MINUTE,
+            tokens_per_minute=Config.OPENAI_TOKENS_PER_MINUTE,
+            structured_output=Config.OPENAI_STRUCTURED_OUTPUT,
+            chunk_batch_tokens=Config.OPENAI_CHUNK_BATCH_TOKENS,
+            stream_usage=Config.OPENAI_STREAM_USAGE
         )
         
         # Initialize rules validator with blob service
@@ -151,7 +166,8 @@ def initialize_services():
         st.session_state.rules_validator = RulesValidator(
             st.session_state.blob_service,
             Config.RULES_BLOB_CONTAINER,  # Container name from .env
-            Config.RULES_BLOB_FILE  # Excel file name from .env
+            Config.RULES_BLOB_FILE,  # Excel file name from .env
+            cache=ExtractionCache(Config.RULES_CACHE_PATH) if Config.RULES_CACHE_PATH else None
         )
         
         st.session_state.initialized = True
@@ -258,6 +274,7 @@ def process_document(file_name: str):
                 st.info("Structuring content using Azure OpenAI (no validation rules provided)...")
                 logger.info("Calling Azure OpenAI without validation rules")
 
+            usage_before = st.session_state.openai_service.get_usage()
             structured_data = st.session_state.openai_service.structure_and_validate_content(
                 extracted_text,
                 rules if has_rules else None,
@@ -265,6 +282,15 @@ def process_document(file_name: str):
             )
 
             logger.info("Azure OpenAI processing completed")
+            if Config.OPENAI_STREAM_USAGE:
+                usage = st.session_state.openai_service.get_usage()
+                logger.info(
+                    "Azure OpenAI usage: %d requests, %d prompt tokens (%d cached), %d completion tokens",
+                    usage["requests"] - usage_before["requests"],
+                    usage["prompt_tokens"] - usage_before["prompt_tokens"],
+                    usage["cached_tokens"] - usage_before["cached_tokens"],
+                    usage["completion_tokens"] - usage_before["completion_tokens"]
+                )
 
             # Clean up output - remove unwanted fields
             structured_data.pop("structured_content", None)
@@ -27,17 +27,36 @@ class Config:
     # Azure Document Intelligence Configuration
     AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT", "")
     AZURE_DOCUMENT_INTELLIGENCE_KEY = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY", "")
+    # Local cache of extraction results keyed by document hash (empty string disables it)
+    DOCUMENT_CACHE_PATH = os.getenv("DOCUMENT_CACHE_PATH", "~/.cache/candy/docintel.sqlite")
+    # Seconds a cached extraction is reused before the document is analyzed again (0 keeps entries forever)
+    DOCUMENT_CACHE_MAX_AGE = int(os.getenv("DOCUMENT_CACHE_MAX_AGE", str(30 * 24 * 60 * 60)))
     
     # Azure OpenAI Configuration
     AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT", "")
     AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY", "")
     AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
     AZURE_OPENAI_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "")
+    # Opt-in cache of parsed chunk responses (empty string disables it)
+    OPENAI_CACHE_PATH = os.getenv("OPENAI_CACHE_PATH", "")
+    # Concurrent OpenAI requests (unset uses the service default)
+    OPENAI_MAX_WORKERS = int(os.getenv("OPENAI_MAX_WORKERS", "0")) or None
+    # Deployment quota enforced client-side (0 disables the limit)
+    OPENAI_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "0"))
+    OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "0"))
+    # Enforce the output schema server-side (needs API version 2024-08-01-preview or later)
+    OPENAI_STRUCTURED_OUTPUT = os.getenv("OPENAI_STRUCTURED_OUTPUT", "false").lower() == "true"
+    # Pack small chunks into shared requests up to this many text tokens (0 sends each chunk alone)
+    OPENAI_CHUNK_BATCH_TOKENS = int(os.getenv("OPENAI_CHUNK_BATCH_TOKENS", "0"))
+    # Report token usage from the API (needs API version 2024-09-01-preview or later)
+    OPENAI_STREAM_USAGE = os.getenv("OPENAI_STREAM_USAGE", "false").lower() == "true"
     
     # Application Configuration
     RULES_FILE_PATH = os.getenv("RULES_FILE_PATH", "rules/rules.json")  # Legacy: not used when loading from blob
     RULES_BLOB_CONTAINER = os.getenv("RULES_BLOB_CONTAINER", "samplefiles")
     RULES_BLOB_FILE = os.getenv("RULES_BLOB_FILE", "POC_ruleset-examples.xlsx")
+    # Local cache of parsed rules keyed by the rules file's ETag (empty string disables it)
+    RULES_CACHE_PATH = os.getenv("RULES_CACHE_PATH", "~/.cache/candy/rules.sqlite")
     
     @classmethod
     def validate(cls):
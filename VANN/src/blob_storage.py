@@ -105,6 +105,33 @@ class BlobStorageService:
 
             raise
     
+    def get_blob_etag(self, container_name: str, blob_name: str) -> str:
+        """
+        Get a blob's ETag without downloading its content
+        
+        Args:
+            container_name: Name of the container
+            blob_name: Name of the blob
+            
+        Returns:
+            ETag of the blob's current version
+        """
+        try:
+            blob_client = self.blob_service_client.get_blob_client(
+                container=container_name,
+                blob=blob_name
+            )
+            return blob_client.get_blob_properties().etag
+        except Exception as e:
+            logger.error(
+                "Error reading blob properties (container=%s, blob=%s)",
+                container_name,
+                blob_name,
+                exc_info=True
+            )
+
+            raise
+    
     def upload_blob(self, container_name: str, blob_name: str, data: bytes) -> None:
         """
         Upload a blob to storage
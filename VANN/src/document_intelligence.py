@@ -88,98 +88,859 @@
 Azure Document Intelligence operations module
 """
 from azure.ai.documentintelligence import DocumentIntelligenceClient
+from azure.ai.documentintelligence.aio import DocumentIntelligenceClient as AioDocumentIntelligenceClient
 from azure.core.credentials import AzureKeyCredential
-from typing import Dict, Any
+from azure.core.exceptions import HttpResponseError, ServiceRequestError
+from azure.core.pipeline.transport import AioHttpTransport, RequestsTransport
+from pypdf import PdfReader, PdfWriter
+from requests.adapters import HTTPAdapter
+from tenacity import (
+    before_sleep_log,
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential
+)
+from utils.extraction_cache import ExtractionCache
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Any, BinaryIO, List, Iterator, Optional, Pattern, Tuple, Union
+import aiohttp
+import asyncio
+import concurrent.futures
+import hashlib
+import io
 import logging
+import orjson
+import os
+import re
+import requests
+import threading
+import weakref
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of analyses kept in flight by analyze_many()
+DEFAULT_ASYNC_CONCURRENCY = 8
+
+# Thread fan-out defaults for analyze_batch()
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_RPS = 5
+
+# Output format requested from the service; part of the cache key
+OUTPUT_CONTENT_FORMAT = "markdown"
+
+# Seconds between LRO status polls. The SDK default of 1s wastes request quota on
+# layouts that take 20-60s; a Retry-After header from the service still wins.
+DEFAULT_POLLING_INTERVAL = 5.0
+
+# Attempts for a submission that fails with a transient (429/5xx/network) error
+RETRY_ATTEMPTS = 3
+
+# PDFs longer than this are split into page ranges analyzed in parallel
+DEFAULT_MAX_PAGES_PER_CALL = 8
+# Separator the markdown output puts between pages; used to join split parts
+PAGE_BREAK_MARKER = "\n<!-- PageBreak -->\n"
+
+# Service limit on request size (S0 tier)
+MAX_DOCUMENT_BYTES = 500 * 1024 * 1024
+
+# Read size used when hashing files/streams for the cache key
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# A document can be given as bytes, a filesystem path, or a binary file object.
+# Paths and file objects are passed to the SDK as streams so large PDFs are not
+# buffered in memory before upload.
+DocumentInput = Union[bytes, str, os.PathLike, BinaryIO]
+
+# Connection pool size of the shared HTTP transport (urllib3 defaults to 10)
+HTTP_POOL_SIZE = 64
+
+# Seconds an idle pooled connection of the async transport stays open
+AIO_KEEPALIVE_TIMEOUT = 60
+
+# One aiohttp session per event loop, shared by every async client on that loop
+_aio_sessions = weakref.WeakKeyDictionary()
+
+
+@lru_cache(maxsize=1)
+def _get_shared_transport() -> RequestsTransport:
+    """
+    Process-wide requests transport shared by every client, so parallel calls
+    reuse warm TCP/TLS connections
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=0
+    )
+    session.mount("https://", adapter)
+    # session_owner=False keeps the pool alive when a client is closed
+    return RequestsTransport(session=session, session_owner=False)
+
+
+@lru_cache(maxsize=16)
+def _get_client(endpoint: str, key: str) -> DocumentIntelligenceClient:
+    """
+    Build (or reuse) the sync client for an endpoint/key pair
+
+    The key is held in this in-memory cache only; it is never logged.
+    """
+    return DocumentIntelligenceClient(
+        endpoint=endpoint,
+        credential=AzureKeyCredential(key),
+        transport=_get_shared_transport()
+    )
+
+
+# Markdown heading line in result.content (output_content_format="markdown")
+_SECTION_RE = re.compile(r"^#+\s+(?P<title>.+)$", re.M)
+
+
+@lru_cache(maxsize=32)
+def _section_matcher(sections: Tuple[str, ...]) -> Pattern:
+    """Compiled case-insensitive matcher for a set of section titles"""
+    return re.compile("|".join(re.escape(section) for section in sections), re.I)
+
+
+def _filter_sections(text: str, sections: List[str]) -> str:
+    """Keep only the markdown sections whose heading matches one of the titles"""
+    wanted = _section_matcher(tuple(sections))
+    headings = list(_SECTION_RE.finditer(text))
+
+    parts = []
+    for i, heading in enumerate(headings):
+        if wanted.search(heading.group("title")):
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+            parts.append(text[heading.start():end])
+    return "".join(parts)
+
+
+def _get_aio_session() -> aiohttp.ClientSession:
+    """
+    aiohttp session for the running event loop, shared process-wide so all async
+    analyses reuse one keep-alive connection pool
+
+    aiohttp sessions are bound to the loop they were created on, so a new one is
+    made for each loop (e.g. each asyncio.run()).
+    """
+    loop = asyncio.get_running_loop()
+    session = _aio_sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, keepalive_timeout=AIO_KEEPALIVE_TIMEOUT)
+        )
+        _aio_sessions[loop] = session
+    return session
+
+
+def _count(items) -> int:
+    """Number of items in an optional collection without materializing it"""
+    if not items:
+        return 0
+    if hasattr(items, "__len__"):
+        return len(items)
+    return sum(1 for _ in items)
+
+
+def _is_transient_error(error: BaseException) -> bool:
+    """True for throttling, server-side and connection errors worth retrying"""
+    if isinstance(error, ServiceRequestError):
+        return True
+    if isinstance(error, HttpResponseError):
+        status_code = error.status_code or 0
+        return status_code == 429 or status_code >= 500
+    # Terminal failures (bad input, failed analysis) are raised as-is
+    return False
+
+
+# Exponential backoff with jitter for transient failures; a single throttled or
+# failed request no longer aborts the whole run
+_retry_transient = retry(
+    retry=retry_if_exception(_is_transient_error),
+    wait=wait_random_exponential(min=2, max=30),
+    stop=stop_after_attempt(RETRY_ATTEMPTS),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True
+)
+
 
 class DocumentIntelligenceService:
     """Service for extracting content using Azure Document Intelligence"""
-    
-    def __init__(self, endpoint: str, key: str):
+
+    def __init__(
+        self,
+        endpoint: str,
+        key: str,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        rps: int = DEFAULT_RPS,
+        cache: Optional[ExtractionCache] = None,
+        max_pages_per_call: Optional[int] = DEFAULT_MAX_PAGES_PER_CALL
+    ):
         """
         Initialize Document Intelligence Service
+
+        Args:
+            endpoint: Azure Document Intelligence endpoint
+            key: Azure Document Intelligence API key
+            max_workers: Thread pool size used by analyze_batch()
+            rps: Maximum number of analyze requests being submitted at once
+            cache: Optional persistent cache of results keyed by document hash
+            max_pages_per_call: Split PDFs with more pages than this into parallel
+                calls (None or 0 disables splitting)
         """
-        self.client = DocumentIntelligenceClient(
-            endpoint=endpoint,
-            credential=AzureKeyCredential(key)
-        )
-    
+        self.cache = cache
+        self.max_pages_per_call = max_pages_per_call
+        self.max_workers = max_workers
+        self.rps = rps
+        # Caps concurrent submit calls so batch runs stay under the account's TPS limit;
+        # held only while a request is being submitted, never while its result is polled
+        self._submit_semaphore = threading.Semaphore(rps)
+        # Futures for analyses currently running, keyed by request key
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        # Services for the same endpoint/key share one client and its pipeline
+        self.client = _get_client(endpoint, key)
+        # Async client lets many long-running analyses overlap their poll waits on
+        # one thread; it is created lazily on the loop that uses it
+        self._endpoint = endpoint
+        self._credential = AzureKeyCredential(key)
+        self._aio_client = None
+        self._aio_session = None
+
     # CHANGE 1: Update default model_id to "prebuilt-layout"
-    def analyze_document(self, document_bytes: bytes, model_id: str = "prebuilt-layout") -> Dict[str, Any]:
+    def analyze_document(
+        self,
+        document: DocumentInput,
+        model_id: str = "prebuilt-layout",
+        include_raw: bool = False,
+        polling_interval: float = DEFAULT_POLLING_INTERVAL,
+        extract_sections: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
         """
         Analyze a document and extract content
-        
+
         Args:
-            document_bytes: Document content as bytes
+            document: Document content as bytes, a file path, or a binary file object
             model_id: Model ID to use for analysis (default: "prebuilt-layout")
-            
+            include_raw: Also return the full AnalyzeResult as JSON bytes under "raw_result_bytes"
+            polling_interval: Seconds between status polls while the analysis runs
+            extract_sections: If given, "text" only keeps the markdown sections whose
+                heading contains one of these titles (case-insensitive)
+
         Returns:
             Dictionary containing extracted content and metadata
         """
+        # Only this path splits long PDFs, so its results are keyed apart from the async ones
+        request_key = self._request_key(document, model_id, include_raw, split=True)
+        cached = self._get_cached(request_key)
+        if cached is not None:
+            return self._select_sections(cached, extract_sections)
+
+        if request_key is None:
+            extracted_data = self._analyze_and_cache(document, request_key, model_id, include_raw, polling_interval)
+            return self._select_sections(extracted_data, extract_sections)
+
+        # Single-flight: concurrent calls for the same document share one Azure request
+        with self._inflight_lock:
+            future = self._inflight.get(request_key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[request_key] = future
+
+        if not is_owner:
+            logger.info("Waiting for identical in-flight analysis (model=%s)", model_id)
+            return self._select_sections(future.result(), extract_sections)
+
+        try:
+            extracted_data = self._analyze_and_cache(document, request_key, model_id, include_raw, polling_interval)
+            future.set_result(extracted_data)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[request_key]
+
+        return self._select_sections(extracted_data, extract_sections)
+
+    def _analyze_and_cache(
+        self,
+        document: DocumentInput,
+        request_key: Optional[str],
+        model_id: str,
+        include_raw: bool,
+        polling_interval: float
+    ) -> Dict[str, Any]:
+        """Run the analysis against Azure and store the result in the cache"""
         try:
             logger.info(
                 "Analyzing document with model=%s",
                 model_id
             )
 
-            
-            # Analyze the document
-            # CHANGE 2: Add output_content_format="markdown"
-            # This is crucial. It forces Azure to return the text with table characters (| -)
-            # which helps the LLM understand the grid structure.
-            poller = self.client.begin_analyze_document(
-                model_id=model_id,
-                body=document_bytes,
-                content_type="application/octet-stream",
-                output_content_format="markdown" 
+
+            if isinstance(document, (bytes, bytearray)) and len(document) > MAX_DOCUMENT_BYTES:
+                raise ValueError(
+                    f"Document is {len(document):,} bytes; the service accepts at most {MAX_DOCUMENT_BYTES:,}"
+                )
+
+            # Large PDFs are analyzed as parallel page ranges; the raw result of a
+            # single AnalyzeResult cannot be reproduced that way, so skip when requested
+            parts = None if include_raw else self._split_pdf(document)
+            if parts:
+                extracted_data = self._analyze_parts(parts, model_id, polling_interval)
+            else:
+                # Analyze the document
+                with self._open_document(document) as body:
+                    result = self._run_analysis(body, self._stream_start(body), model_id, polling_interval)
+                extracted_data = self._build_extracted_data(result, include_raw)
+            self._put_cached(request_key, extracted_data)
+            return extracted_data
+
+        except Exception as e:
+            logger.error(
+                "Error analyzing document with Azure Document Intelligence",
+                exc_info=True
             )
-            
-            result = poller.result()
-            
-            # Extract text content (Now contains Markdown Table syntax)
-            extracted_text = ""
-            if result.content:
-                extracted_text = result.content
-            
-            logger.debug(
-                "Extracted text length=%s characters",
-                len(extracted_text)
+
+            raise
+
+    def _split_pdf(self, document: DocumentInput) -> Optional[List[Tuple[int, bytes]]]:
+        """
+        Split a PDF longer than max_pages_per_call into (first_page, pdf_bytes) parts
+
+        Bytes, paths and seekable streams are split alike, so the same content gives
+        the same result (and cache entry) whichever form it was passed in. Returns None
+        when the document should be sent in one call (splitting disabled, not a PDF,
+        a stream that can't be rewound, short enough, or unreadable by pypdf).
+        """
+        if not self.max_pages_per_call:
+            return None
+
+        content = self._read_pdf(document)
+        if content is None:
+            return None
+
+        try:
+            reader = PdfReader(io.BytesIO(content))
+            page_count = len(reader.pages)
+            if page_count <= self.max_pages_per_call:
+                return None
+
+            parts = []
+            for start in range(0, page_count, self.max_pages_per_call):
+                writer = PdfWriter()
+                for page in reader.pages[start:start + self.max_pages_per_call]:
+                    writer.add_page(page)
+                buffer = io.BytesIO()
+                writer.write(buffer)
+                parts.append((start + 1, buffer.getvalue()))
+        except Exception:
+            logger.warning("Could not split PDF, analyzing it in a single call", exc_info=True)
+            return None
+
+        logger.info(
+            "Split %d-page PDF into %d parts of up to %d pages",
+            page_count,
+            len(parts),
+            self.max_pages_per_call
+        )
+        return parts
+
+    @staticmethod
+    def _read_pdf(document: DocumentInput) -> Optional[bytes]:
+        """Content of a PDF document, leaving a stream at its position (None if not a readable PDF)"""
+        if isinstance(document, (bytes, bytearray)):
+            content = document
+        elif isinstance(document, (str, os.PathLike)):
+            with open(document, "rb") as f:
+                if f.read(4) != b"%PDF":
+                    return None
+                f.seek(0)
+                content = f.read()
+        else:
+            if not (hasattr(document, "seekable") and document.seekable()):
+                return None
+            position = document.tell()
+            content = document.read()
+            document.seek(position)
+        return content if content.startswith(b"%PDF") else None
+
+    def _analyze_parts(
+        self,
+        parts: List[Tuple[int, bytes]],
+        model_id: str,
+        polling_interval: float
+    ) -> Dict[str, Any]:
+        """Analyze PDF parts in parallel and stitch the results back in page order"""
+        def _analyze(part_bytes: bytes) -> Dict[str, Any]:
+            result = self._run_analysis(part_bytes, None, model_id, polling_interval)
+            return self._build_extracted_data(result)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_workers, len(parts))) as executor:
+            part_results = list(executor.map(_analyze, [part_bytes for _, part_bytes in parts]))
+
+        return {
+            # Keep the page break marker at the boundaries between parts, as a single call has it
+            "text": PAGE_BREAK_MARKER.join(r["text"] for r in part_results if r["text"]),
+            "pages": sum(r["pages"] for r in part_results),
+            "tables": sum(r["tables"] for r in part_results),
+            "key_value_pairs": sum(r["key_value_pairs"] for r in part_results),
+            "raw_result_bytes": None,
+            # First page number (1-based) of each part, in the order the text was joined
+            "page_offsets": [first_page for first_page, _ in parts]
+        }
+
+    def submit_analysis(self, document: DocumentInput, model_id: str = "prebuilt-layout") -> str:
+        """
+        Start an analysis without waiting for it to finish
+
+        The returned continuation token identifies the operation; pass it to
+        fetch_completed() from whatever handler learns the analysis is done
+        (queue worker, blob/Event Grid trigger) instead of holding a thread in
+        the poll loop.
+
+        Args:
+            document: Document content as bytes, a file path, or a binary file object
+            model_id: Model ID to use for analysis (default: "prebuilt-layout")
+
+        Returns:
+            Continuation token for the long-running operation
+        """
+        try:
+            logger.info(
+                "Submitting document for analysis with model=%s",
+                model_id
+            )
+
+            with self._open_document(document) as body, self._submit_semaphore:
+                poller = self.client.begin_analyze_document(
+                    model_id=model_id,
+                    body=body,
+                    content_type="application/octet-stream",
+                    output_content_format=OUTPUT_CONTENT_FORMAT
+                )
+            return poller.continuation_token()
+
+        except Exception as e:
+            logger.error(
+                "Error submitting document to Azure Document Intelligence",
+                exc_info=True
+            )
+
+            raise
+
+    def fetch_completed(
+        self,
+        continuation_token: str,
+        model_id: str = "prebuilt-layout",
+        include_raw: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Fetch the result of an analysis started with submit_analysis()
+
+        Args:
+            continuation_token: Token returned by submit_analysis()
+            model_id: Model ID the analysis was submitted with
+            include_raw: Also return the full AnalyzeResult as JSON bytes under "raw_result_bytes"
+
+        Returns:
+            Extracted data dictionary, or None if the analysis is still running
+        """
+        poller = self.client.begin_analyze_document(
+            model_id=model_id,
+            continuation_token=continuation_token
+        )
+        if not poller.done():
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Analysis still running (status=%s)", poller.status())
+            return None
+
+        return self._build_extracted_data(poller.result(), include_raw)
+
+    def analyze_corpus(
+        self,
+        source_container_url: str,
+        output_container_url: str,
+        model_id: str = "prebuilt-layout"
+    ) -> str:
+        """
+        Analyze every document in a blob container with the server-side batch API
+
+        Results are written by the service to output_container_url, so client
+        memory stays constant regardless of corpus size. Batch submissions are
+        known to fail transiently, so submission is retried with backoff.
+
+        Args:
+            source_container_url: SAS URL of the container holding input documents
+            output_container_url: SAS URL of the container that receives results
+            model_id: Model ID to use for analysis (default: "prebuilt-layout")
+
+        Returns:
+            Continuation token for the batch operation
+        """
+        request = {
+            "azureBlobSource": {"containerUrl": source_container_url},
+            "resultContainerUrl": output_container_url
+        }
+
+        try:
+            logger.info(
+                "Submitting batch analysis with model=%s",
+                model_id
+            )
+            return self._submit_batch(request, model_id)
+
+        except Exception as e:
+            logger.error(
+                "Error submitting batch analysis to Azure Document Intelligence",
+                exc_info=True
             )
 
-            # Extract structured data
-            extracted_data = {
-                "text": extracted_text,
-                "pages": len(result.pages) if result.pages else 0,
-                "tables": len(result.tables) if result.tables else 0,
-                # Note: 'key_value_pairs' is not typically returned by prebuilt-layout, 
-                # but we leave it here for safety as it won't crash the code.
-                "key_value_pairs": len(result.key_value_pairs) if hasattr(result, 'key_value_pairs') and result.key_value_pairs else 0,
-                "raw_result": result.to_dict() if hasattr(result, 'to_dict') else {}
+            raise
+
+    def analyze_batch(
+        self,
+        docs: List[DocumentInput],
+        model_id: str = "prebuilt-layout",
+        max_workers: Optional[int] = None,
+        include_raw: bool = False,
+        polling_interval: float = DEFAULT_POLLING_INTERVAL
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Analyze several documents in parallel using a thread pool
+
+        Args:
+            docs: List of documents (bytes, file paths, or binary file objects)
+            model_id: Model ID to use for analysis
+            max_workers: Thread pool size (defaults to the value given at init)
+            include_raw: Also return the full AnalyzeResult as JSON bytes under "raw_result_bytes"
+            polling_interval: Seconds between status polls for each analysis
+
+        Yields:
+            (index, extracted_data) tuples in completion order, where index is
+            the position of the document in docs
+        """
+        workers = max_workers or self.max_workers
+
+        def _analyze(document: DocumentInput) -> Dict[str, Any]:
+            return self.analyze_document(document, model_id, include_raw, polling_interval)
+
+        logger.info(
+            "Analyzing %d documents in parallel (max_workers=%d, rps=%d)",
+            len(docs),
+            workers,
+            self.rps
+        )
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            future_to_index = {
+                executor.submit(_analyze, document): i
+                for i, document in enumerate(docs)
             }
-            
+
+            for future in concurrent.futures.as_completed(future_to_index):
+                yield future_to_index[future], future.result()
+
+    async def analyze_document_async(
+        self,
+        document: DocumentInput,
+        model_id: str = "prebuilt-layout",
+        include_raw: bool = False,
+        polling_interval: float = DEFAULT_POLLING_INTERVAL,
+        extract_sections: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze a document using the async client
+
+        Args:
+            document: Document content as bytes, a file path, or a binary file object
+            model_id: Model ID to use for analysis (default: "prebuilt-layout")
+            include_raw: Also return the full AnalyzeResult as JSON bytes under "raw_result_bytes"
+            polling_interval: Seconds between status polls while the analysis runs
+            extract_sections: If given, "text" only keeps the markdown sections whose
+                heading contains one of these titles (case-insensitive)
+
+        Returns:
+            Dictionary containing extracted content and metadata
+        """
+        request_key = self._request_key(document, model_id, include_raw)
+        cached = self._get_cached(request_key)
+        if cached is not None:
+            return self._select_sections(cached, extract_sections)
+
+        try:
             logger.info(
-                "Document analyzed successfully (pages=%s, tables=%s)",
-                extracted_data.get("pages"),
-                extracted_data.get("tables")
+                "Analyzing document asynchronously with model=%s",
+                model_id
             )
 
-            return extracted_data
-            
+            with self._open_document(document) as body:
+                result = await self._run_analysis_async(body, self._stream_start(body), model_id, polling_interval)
+            extracted_data = self._build_extracted_data(result, include_raw)
+            self._put_cached(request_key, extracted_data)
+            return self._select_sections(extracted_data, extract_sections)
+
         except Exception as e:
             logger.error(
-                "Error analyzing document with Azure Document Intelligence",
+                "Error analyzing document asynchronously with Azure Document Intelligence",
                 exc_info=True
             )
 
             raise
-    
+
+    async def analyze_many(
+        self,
+        docs: List[DocumentInput],
+        model_id: str = "prebuilt-layout",
+        concurrency: int = DEFAULT_ASYNC_CONCURRENCY,
+        include_raw: bool = False,
+        polling_interval: float = DEFAULT_POLLING_INTERVAL
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze several documents concurrently on a single event loop
+
+        Usage: results = asyncio.run(service.analyze_many(docs)). When running
+        several batches on a long-lived loop, await close_async() at shutdown to
+        release the loop's shared connection pool.
+
+        Args:
+            docs: List of documents (bytes, file paths, or binary file objects)
+            model_id: Model ID to use for analysis
+            concurrency: Maximum number of analyses in flight at once
+            include_raw: Also return the full AnalyzeResult as JSON bytes under "raw_result_bytes"
+            polling_interval: Seconds between status polls for each analysis
+
+        Returns:
+            List of extracted data dictionaries, in the same order as docs
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _analyze(document: DocumentInput) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.analyze_document_async(document, model_id, include_raw, polling_interval)
+
+        logger.info(
+            "Analyzing %d documents asynchronously (concurrency=%d)",
+            len(docs),
+            concurrency
+        )
+        return await asyncio.gather(*[_analyze(d) for d in docs])
+
+    def _get_aio_client(self) -> AioDocumentIntelligenceClient:
+        """Async client bound to the running loop's shared aiohttp session"""
+        session = _get_aio_session()
+        if self._aio_client is None or self._aio_session is not session:
+            self._aio_client = AioDocumentIntelligenceClient(
+                endpoint=self._endpoint,
+                credential=self._credential,
+                transport=AioHttpTransport(session=session, session_owner=False)
+            )
+            self._aio_session = session
+        return self._aio_client
+
+    async def close_async(self) -> None:
+        """Close the async client and the running loop's shared aiohttp session"""
+        if self._aio_client is not None:
+            await self._aio_client.close()
+            self._aio_client = None
+            self._aio_session = None
+
+        session = _aio_sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    @_retry_transient
+    def _run_analysis(self, body, start: Optional[int], model_id: str, polling_interval: float):
+        """Submit one analysis and wait for its result (retried on transient errors)"""
+        if start is not None:
+            body.seek(start)
+
+        # CHANGE 2: Add output_content_format="markdown"
+        # This is crucial. It forces Azure to return the text with table characters (| -)
+        # which helps the LLM understand the grid structure.
+        with self._submit_semaphore:
+            poller = self.client.begin_analyze_document(
+                model_id=model_id,
+                body=body,
+                content_type="application/octet-stream",
+                output_content_format=OUTPUT_CONTENT_FORMAT,
+                polling_interval=polling_interval
+            )
+        return poller.result()
+
+    @_retry_transient
+    async def _run_analysis_async(self, body, start: Optional[int], model_id: str, polling_interval: float):
+        """Async variant of _run_analysis()"""
+        if start is not None:
+            body.seek(start)
+
+        poller = await self._get_aio_client().begin_analyze_document(
+            model_id=model_id,
+            body=body,
+            content_type="application/octet-stream",
+            output_content_format=OUTPUT_CONTENT_FORMAT,
+            polling_interval=polling_interval
+        )
+        return await poller.result()
+
+    @_retry_transient
+    def _submit_batch(self, request: Dict[str, Any], model_id: str) -> str:
+        """Submit a server-side batch analysis (retried on transient errors)"""
+        poller = self.client.begin_analyze_batch_documents(
+            model_id=model_id,
+            body=request,
+            output_content_format=OUTPUT_CONTENT_FORMAT
+        )
+        return poller.continuation_token()
+
+    @staticmethod
+    def _stream_start(body) -> Optional[int]:
+        """Position to rewind a seekable stream to before a retry (None for bytes)"""
+        if hasattr(body, "seekable") and body.seekable():
+            return body.tell()
+        return None
+
+    @staticmethod
+    @contextmanager
+    def _open_document(document: DocumentInput):
+        """Yield a request body for the document, opening (and closing) paths as streams"""
+        if isinstance(document, (str, os.PathLike)):
+            with open(document, "rb") as f:
+                yield f
+        else:
+            yield document
+
+    @staticmethod
+    def _document_digest(document: DocumentInput) -> Optional[str]:
+        """
+        SHA-256 of the document content, read in chunks for paths and streams
+
+        Returns None for streams that cannot be rewound after hashing.
+        """
+        digest = hashlib.sha256()
+        if isinstance(document, (bytes, bytearray, memoryview)):
+            digest.update(document)
+        elif isinstance(document, (str, os.PathLike)):
+            with open(document, "rb") as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+        else:
+            if not (hasattr(document, "seekable") and document.seekable()):
+                return None
+            position = document.tell()
+            for chunk in iter(lambda: document.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+            document.seek(position)
+        return digest.hexdigest()
+
+    def _request_key(
+        self,
+        document: DocumentInput,
+        model_id: str,
+        include_raw: bool = False,
+        split: bool = False
+    ) -> Optional[str]:
+        """
+        Key identifying a document/model request, used for the cache and for
+        coalescing in-flight calls (None if the document cannot be hashed)
+        """
+        digest = self._document_digest(document)
+        if digest is None:
+            return None
+
+        key = f"{digest}:{model_id}:{OUTPUT_CONTENT_FORMAT}"
+        if include_raw:
+            return f"{key}:raw"
+        # Results of split analyses are shaped by the part size, so it is part of the key
+        return f"{key}:pages{self.max_pages_per_call}" if split and self.max_pages_per_call else key
+
+    def _get_cached(self, request_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return a cached extraction result, if caching is enabled and the key is present"""
+        if self.cache is None or request_key is None:
+            return None
+
+        cached = self.cache.get(request_key)
+        if cached is not None:
+            logger.info(
+                "Using cached extraction result (hits=%d, misses=%d)",
+                self.cache.hits,
+                self.cache.misses
+            )
+        return cached
+
+    def _put_cached(self, request_key: Optional[str], extracted_data: Dict[str, Any]) -> None:
+        """Store an extraction result, if caching is enabled"""
+        if self.cache is not None and request_key is not None:
+            self.cache.put(request_key, extracted_data)
+
+    def _build_extracted_data(self, result, include_raw: bool = False) -> Dict[str, Any]:
+        """Convert an AnalyzeResult into the extracted data dictionary"""
+        # Extract text content (Now contains Markdown Table syntax)
+        extracted_text = ""
+        if result.content:
+            extracted_text = result.content
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Extracted text length=%s characters",
+                len(extracted_text)
+            )
+
+        # Extract structured data
+        extracted_data = {
+            "text": extracted_text,
+            "pages": _count(result.pages),
+            "tables": _count(result.tables),
+            # Note: 'key_value_pairs' is not typically returned by prebuilt-layout,
+            # but we leave it here for safety as it won't crash the code.
+            "key_value_pairs": _count(getattr(result, 'key_value_pairs', None)),
+            # Serializing the full result tree is expensive on large layouts; only do it on request
+            "raw_result_bytes": self._serialize_result(result) if include_raw else None,
+            # One call covers the whole document, starting at page 1 (see _analyze_parts)
+            "page_offsets": [1]
+        }
+
+        logger.info(
+            "Document analyzed successfully (pages=%s, tables=%s)",
+            extracted_data.get("pages"),
+            extracted_data.get("tables")
+        )
+
+        return extracted_data
+
+    @staticmethod
+    def _select_sections(extracted_data: Dict[str, Any], extract_sections: Optional[List[str]]) -> Dict[str, Any]:
+        """Return extracted_data with "text" trimmed to the requested sections (copy, cache untouched)"""
+        if not extract_sections:
+            return extracted_data
+
+        trimmed = dict(extracted_data)
+        trimmed["text"] = _filter_sections(extracted_data.get("text", ""), extract_sections)
+        return trimmed
+
+    @staticmethod
+    def _serialize_result(result) -> bytes:
+        """
+        Serialize an AnalyzeResult to JSON bytes with orjson
+
+        Callers that need a dict can orjson.loads() the bytes when required.
+        """
+        return orjson.dumps(result.as_dict(), option=orjson.OPT_NON_STR_KEYS)
+
     # CHANGE 3: Update default model_id here as well
-    def extract_text(self, document_bytes: bytes, model_id: str = "prebuilt-layout") -> str:
+    def extract_text(self, document: DocumentInput, model_id: str = "prebuilt-layout") -> str:
         """
         Extract only text content from a document
         """
-        result = self.analyze_document(document_bytes, model_id)
-        return result.get("text", "")
\ No newline at end of file
+        result = self.analyze_document(document, model_id, include_raw=False)
+        return result.get("text", "")
+
+    def extract_text_bytes(self, document: DocumentInput, model_id: str = "prebuilt-layout") -> bytes:
+        """
+        Extract text content as UTF-8 bytes, ready for blob upload or an HTTP body
+        """
+        return self.extract_text(document, model_id).encode("utf-8")
@@ -1,49 +1,438 @@
 """
 Azure OpenAI operations module
 """
-from openai import AzureOpenAI
-from typing import Dict, Any, List, Optional
+from openai import AsyncAzureOpenAI, AzureOpenAI, BadRequestError, RateLimitError
+from tenacity import (
+    before_sleep_log,
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+from utils.extraction_cache import ExtractionCache
+from src.prompts import (
+    CHUNK_BOUNDARY_NOTE,
+    CHUNK_CONTEXT_FINAL,
+    CHUNK_CONTEXT_FIRST,
+    CHUNK_CONTEXT_MIDDLE,
+    CHUNK_CONTINUATION_NOTE,
+    CHUNK_INSTRUCTIONS,
+    CHUNK_NOTE,
+    CHUNK_NOTE_FINAL_TOTALS,
+    CHUNK_NOTE_METADATA,
+    CHUNK_NOTE_TOTALS,
+    DOCUMENT_INSTRUCTIONS,
+    NULL_FIELDS_REMINDER,
+    SYSTEM_PROMPT_HEADER,
+    SYSTEM_PROMPT_PROTOCOLS
+)
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import bisect
+import hashlib
 import json
 import logging
+import orjson
 import re
 import os
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
 import concurrent.futures
+from collections import defaultdict
+import tiktoken
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the prompts or schema change so cached chunk responses are not reused
+PROMPT_VERSION = "3"
+
+# Cached chunk responses older than this are re-requested
+RESPONSE_CACHE_MAX_AGE = 7 * 24 * 60 * 60
+
+# Fixed sampling seed so re-running a document gives (best-effort) repeatable output
+COMPLETION_SEED = 20240215
+
+# Chunk calls are network-bound, so run well above the core count
+DEFAULT_MAX_WORKERS = min(32, 4 * (os.cpu_count() or 1))
+
+# Attempts per request when Azure OpenAI answers 429
+RATE_LIMIT_ATTEMPTS = 4
+
+# Token-based chunking (roughly the old 50k/15k character settings)
+CHUNK_THRESHOLD_TOKENS = 12000
+CHUNK_TOKENS = 3500
+# How far back from a window's end to look for a section header to split on
+CHUNK_BOUNDARY_SEARCH_TOKENS = 300
+# Fallback when the deployment name is not a model tiktoken knows
+DEFAULT_TOKEN_ENCODING = "o200k_base"
+# Replies to a batch carry every section's JSON, so keep batches well inside the output limit
+MAX_CHUNKS_PER_BATCH = 4
+# Completion budget: the reply's JSON runs several times longer than the text it describes,
+# plus room for the metadata/summary blocks; capped at what the deployment allows
+MAX_COMPLETION_TOKENS = 32000
+COMPLETION_TOKENS_PER_PROMPT_TOKEN = 4
+COMPLETION_TOKENS_OVERHEAD = 4000
+
+# Runs of whitespace, collapsed when normalizing dedup keys
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Room/section headers that make good split points
+_CHUNK_BOUNDARY_RE = re.compile(r'\n(?:[A-Z][A-Z0-9 /]+:|Room\s*\d+|Recap\b|Grand Total\b)')
+
+# JSON tokens for _repair_json: a string, a structural character, a bare value (number/literal),
+# or a lone quote where a string was cut off
+_JSON_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]:,]|[^\s{}\[\]:,"]+|"', re.DOTALL)
+
+
+_retry_rate_limited = retry(
+    retry=retry_if_exception_type(RateLimitError),
+    wait=wait_exponential_jitter(initial=1, max=30),
+    stop=stop_after_attempt(RATE_LIMIT_ATTEMPTS),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True
+)
+
+
+@lru_cache(maxsize=8192)
+def _normalize_key_text(text: str) -> str:
+    """
+    Memoized OpenAIService._norm for strings: duplicated rooms repeat the same
+    names and descriptions, so most merge keys are cache hits
+    """
+    return _WHITESPACE_RE.sub(" ", text).strip().casefold()
+
+
+class _TokenBucket:
+    """
+    Thread-safe requests-per-minute / tokens-per-minute limiter shared by all
+    callers of one service (a limit of 0 or None is not enforced)
+    """
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.rpm = rpm or 0
+        self.tpm = tpm or 0
+        self._requests = float(self.rpm)
+        self._tokens = float(self.tpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> None:
+        """Block until one request of roughly `tokens` tokens fits in both budgets"""
+        while True:
+            wait = self._reserve(tokens)
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int) -> None:
+        """acquire() for coroutines: waits without blocking the event loop"""
+        while True:
+            wait = self._reserve(tokens)
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    def _reserve(self, tokens: int) -> float:
+        """Take one request and `tokens` tokens if both budgets allow, else return the seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+            # A single request larger than the whole budget waits for a full bucket
+            tokens_needed = min(tokens, self.tpm)
+            wait = 0.0
+            if self.rpm and self._requests < 1:
+                wait = (1 - self._requests) * 60 / self.rpm
+            if self.tpm and self._tokens < tokens_needed:
+                wait = max(wait, (tokens_needed - self._tokens) * 60 / self.tpm)
+
+            if wait == 0:
+                if self.rpm:
+                    self._requests -= 1
+                if self.tpm:
+                    self._tokens -= tokens_needed
+            return wait
+
+
+def _repair_json(json_str: str, close_truncated: bool = False) -> Optional[str]:
+    """
+    Single-pass repair of model JSON: drops trailing commas before } and ], ignores text
+    after the top-level value and cuts a reply that ends mid-value back to its last complete
+    member, closing whatever is still open. close_truncated applies that cut even where the
+    scan stops at malformed text instead. Returns None if it can't be repaired.
+    """
+    pieces = []
+    # Open containers, innermost last
+    stack = []
+    # What the next token may be: "value", "key", "colon" or "after" (a complete value)
+    state = "value"
+    # Index in pieces of a comma that is dropped if a closer follows it
+    pending_comma = None
+    # Longest prefix that can be closed into valid JSON: (number of pieces, open containers)
+    safe = (0, [])
+    pos = 0
+    for match in _JSON_TOKEN_RE.finditer(json_str):
+        token = match.group()
+        piece = json_str[pos:match.start()] + token
+        pos = match.end()
+        first = token[0]
+        
+        if first in "}]":
+            opener = "{" if first == "}" else "["
+            if not stack or stack[-1] != opener:
+                break
+            if not (state == "after" or (state == "key" and first == "}") or (state == "value" and first == "]")):
+                break
+            if pending_comma is not None:
+                pieces[pending_comma] = pieces[pending_comma][:-1]
+            stack.pop()
+            pieces.append(piece)
+            state = "after"
+            safe = (len(pieces), stack[:])
+            if not stack:
+                break
+        elif first == ",":
+            if not stack:
+                break
+            if state != "after":
+                # A stray comma with no value before it ("[," or ", ,") is dropped
+                if state == "colon" or (state == "value" and stack[-1] == "{"):
+                    break
+                pieces.append(piece[:-1])
+                continue
+            safe = (len(pieces), stack[:])
+            pieces.append(piece)
+            pending_comma = len(pieces) - 1
+            state = "key" if stack[-1] == "{" else "value"
+            continue
+        elif first == ":":
+            if state != "colon":
+                break
+            pieces.append(piece)
+            state = "value"
+        elif first in "{[":
+            if state != "value":
+                break
+            stack.append(first)
+            pieces.append(piece)
+            state = "key" if first == "{" else "value"
+            safe = (len(pieces), stack[:])
+        elif token == '"':
+            # A string that runs off the end: the reply was cut short
+            close_truncated = True
+            break
+        elif state == "key" and first == '"':
+            pieces.append(piece)
+            state = "colon"
+        elif state == "value":
+            pieces.append(piece)
+            state = "after"
+            # A closed string is complete, as is a bare value with anything after it;
+            # a bare value at the very end may have been cut short
+            if first == '"' or pos < len(json_str):
+                safe = (len(pieces), stack[:])
+        else:
+            break
+        pending_comma = None
+    else:
+        # Ran off the end of the text with containers still open: the reply was cut short
+        close_truncated = True
+    
+    if not stack and state == "after":
+        return "".join(pieces)
+    if not close_truncated or not safe[0]:
+        return None
+    count, open_containers = safe
+    closers = "".join("}" if opener == "{" else "]" for opener in reversed(open_containers))
+    return "".join(pieces[:count]) + closers
+
+
+def _run_sync(coro):
+    """Run a coroutine to completion from synchronous code"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # Called from inside a running loop (e.g. an async host): use a fresh loop on another thread
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
 
 class OpenAIService:
     """Service for interacting with Azure OpenAI"""
     
-    def __init__(self, endpoint: str, api_key: str, api_version: str, deployment_name: str):
+    def __init__(
+        self,
+        endpoint: str,
+        api_key: str,
+        api_version: str,
+        deployment_name: str,
+        cache: Optional[ExtractionCache] = None,
+        max_workers: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        structured_output: bool = False,
+        chunk_batch_tokens: Optional[int] = None,
+        stream_usage: bool = False
+    ):
 
-        self.client = AzureOpenAI(
-            azure_endpoint=endpoint,
-            api_key=api_key,
-            api_version=api_version
-        )
+        self._client_args = {
+            "azure_endpoint": endpoint,
+            "api_key": api_key,
+            "api_version": api_version
+        }
+        self.client = AzureOpenAI(**self._client_args)
         self.deployment_name = deployment_name
-        self.json_schema = self._load_json_schema()
+        try:
+            self.encoding = tiktoken.encoding_for_model(deployment_name)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding(DEFAULT_TOKEN_ENCODING)
+        self._schema_template = self._load_json_schema()
+        self.json_schema = (
+            orjson.dumps(self._schema_template, option=orjson.OPT_INDENT_2).decode("utf-8")
+            if self._schema_template else ""
+        )
+        # With structured output the schema is enforced by the API instead of described in the prompt
+        self.structured_output = bool(structured_output and self._schema_template)
+        self._response_format = {"type": "json_object"}
+        if self.structured_output:
+            self._response_format = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "xactimate_estimate",
+                    "schema": self._template_to_json_schema(self._schema_template),
+                    "strict": True
+                }
+            }
+        # Batched chunk requests answer {"sections": [...]}, one estimate object per chunk
+        self._batch_response_format = {"type": "json_object"}
+        if self.structured_output:
+            self._batch_response_format = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "xactimate_estimate_sections",
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "sections": {
+                                "type": "array",
+                                "items": self._response_format["json_schema"]["schema"]
+                            }
+                        },
+                        "required": ["sections"],
+                        "additionalProperties": False
+                    },
+                    "strict": True
+                }
+            }
+        # Cleared the first time the deployment rejects response_format, so later calls
+        # go straight to a plain request instead of failing and retrying each time
+        self._supports_json_mode = True
+        # Chunk text tokens allowed in one batched request (None/0 sends every chunk on its own)
+        self.chunk_batch_tokens = chunk_batch_tokens or None
+        # Ask for token counts on the final streamed chunk (needs API version 2024-09-01-preview
+        # or later) and keep running totals for callers to report
+        self.stream_usage = stream_usage
+        self._usage_lock = threading.Lock()
+        self._usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        # The schema never changes after init, so its prompt block is rendered once
+        self._schema_section = self._render_schema_section()
+        # ...and with it the whole system prompt, which is the same for every call. With
+        # structured output the schema is enforced by the API instead of described in it
+        self._system_prompt = "".join([
+            SYSTEM_PROMPT_HEADER, "" if self.structured_output else self._schema_section, SYSTEM_PROMPT_PROTOCOLS
+        ])
+        # Sent instead when a request falls back to no response_format, so the model still sees the schema
+        self._fallback_system_prompt = "".join([SYSTEM_PROMPT_HEADER, self._schema_section, SYSTEM_PROMPT_PROTOCOLS])
+        # ...so its exact token count is also taken once, with the encoder loaded above
+        self._system_prompt_tokens = len(self.encoding.encode(self._system_prompt))
+        # (rules list, formatted text, serialized rules) for the most recent rules, shared
+        # across a document's chunks and across documents while the rules list is unchanged
+        self._rules_text_cache = None
+        # Optional store of parsed chunk responses, keyed by prompt inputs
+        self.cache = cache
+        # Upper bound on concurrent single-call requests across threads. Chunked and async
+        # runs bound their own requests with a per-run asyncio.Semaphore of the same size,
+        # so requests from both kinds of path together can exceed max_workers
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self._request_semaphore = threading.Semaphore(self.max_workers)
+        logger.info("OpenAI service using up to %d concurrent requests", self.max_workers)
+        # Deployment quota, enforced client-side so a large pool doesn't just collect 429s
+        self._rate_limiter = None
+        if requests_per_minute or tokens_per_minute:
+            self._rate_limiter = _TokenBucket(requests_per_minute, tokens_per_minute)
+            logger.info(
+                "OpenAI rate limit: %s requests/min, %s tokens/min",
+                requests_per_minute or "unlimited",
+                tokens_per_minute or "unlimited"
+            )
     
-    def _load_json_schema(self) -> str:
-        """Load JSON schema from file"""
+    def _load_json_schema(self) -> Dict[str, Any]:
+        """Load the example output structure from file"""
         try:
             # Get the path to the schema file relative to this module
             current_dir = Path(__file__).parent.parent
             schema_path = current_dir / "schemas" / "output_schema.json"
             
             if schema_path.exists():
-                with open(schema_path, 'r', encoding='utf-8') as f:
-                    schema_data = json.load(f)
-                    # Return formatted JSON string for inclusion in prompt
-                    return json.dumps(schema_data, indent=2)
+                with open(schema_path, 'rb') as f:
+                    return orjson.loads(f.read())
             else:
                 logger.warning(f"JSON schema file not found at {schema_path}. Using default structure.")
-                return ""
+                return {}
         except Exception as e:
             logger.error(f"Error loading JSON schema: {str(e)}")
+            return {}
+    
+    @classmethod
+    def _template_to_json_schema(cls, node: Any) -> Dict[str, Any]:
+        """
+        Convert the example structure in output_schema.json ("String or null",
+        "Number", one-element lists, ...) into a strict JSON Schema
+        """
+        if isinstance(node, dict):
+            return {
+                "type": "object",
+                "properties": {key: cls._template_to_json_schema(value) for key, value in node.items()},
+                # Strict mode requires every property; absent values come back as null
+                "required": list(node.keys()),
+                "additionalProperties": False
+            }
+        if isinstance(node, list):
+            items = cls._template_to_json_schema(node[0]) if node else {"type": ["string", "null"]}
+            return {"type": "array", "items": items}
+        
+        hint = str(node)
+        if " | " in hint:
+            return {"type": ["string", "null"], "enum": [v.strip() for v in hint.split("|")] + [None]}
+        if hint.startswith("String or Number"):
+            types = ["string", "number"]
+        elif hint.startswith("Number"):
+            types = ["number"]
+        else:
+            types = ["string"]
+        return {"type": types + ["null"], "description": hint}
+    
+    def _render_schema_section(self) -> str:
+        """Build the TARGET JSON STRUCTURE prompt block from the loaded schema"""
+        if not self.json_schema:
             return ""
+        return f"""
+    ### TARGET JSON STRUCTURE
+    You must output a single JSON object.
+    
+    **PRODUCTION RULES:**
+    1. **Use Exact Schema Keys:** You MUST use the exact keys defined in the schema (e.g., 'dimensions', 'line_items', 'sub_areas', 'architectural_features').
+    2. **Exclude Nulls:** OMIT any field that is `null`, `0`, or `0.00` to save space.
+    3. **No Markdown:** Output raw JSON only. Do not wrap in ```json ... ``` blocks.
+
+    {self.json_schema}
+    """
     
     def structure_and_validate_content(
         self,
@@ -55,24 +444,33 @@ class OpenAIService:
         try:
             logger.info(f"Structuring and validating content for file: {file_name}")
             
-            # Use chunking for large documents (>50,000 characters)
+            # Use chunking for large documents (>CHUNK_THRESHOLD_TOKENS tokens)
             # This prevents token limit issues and ensures complete data extraction
-            chunk_threshold = 50000
-            doc_length = len(extracted_text)
-            logger.info(f"Document length: {doc_length:,} characters, threshold: {chunk_threshold:,}")
+            chunk_threshold = CHUNK_THRESHOLD_TOKENS
+            # Chunk results are merged from replies produced (or cached) in any mode
+            json_mode = False
+            tokens = self.encoding.encode(extracted_text)
+            doc_length = len(tokens)
+            logger.info(f"Document length: {doc_length:,} tokens, threshold: {chunk_threshold:,}")
             
             if doc_length > chunk_threshold:
-                logger.info(f"Document exceeds {chunk_threshold:,} characters. Using chunking method.")
-                structured_data = self._process_with_chunking(extracted_text, rules, file_name)
+                logger.info(f"Document exceeds {chunk_threshold:,} tokens. Using chunking method.")
+                structured_data = self._process_with_chunking(extracted_text, rules, file_name, tokens=tokens)
             else:
                 # Process normally for smaller documents
-                logger.info(f"Document is {doc_length:,} characters (below {chunk_threshold:,} threshold). Processing without chunking.")
+                logger.info(f"Document is {doc_length:,} tokens (below {chunk_threshold:,} threshold). Processing without chunking.")
                 system_prompt, user_prompt = self._create_prompts(extracted_text, rules, file_name)
-                response_content, is_truncated = self._call_openai(system_prompt, user_prompt)
-                structured_data = self._parse_json_response(response_content, extracted_text, file_name, is_truncated=is_truncated)
+                response_content, is_truncated, parsed = self._call_openai(
+                    system_prompt, user_prompt, cache_user=self._prompt_cache_user(file_name)
+                )
+                # A parsed reply came back in JSON mode; anything else went through the text fallbacks
+                json_mode = isinstance(parsed, dict)
+                structured_data = parsed if json_mode else self._parse_json_response(
+                    response_content, extracted_text, file_name, is_truncated=is_truncated
+                )
             
             # Post-process: parse nested JSON strings and merge processed_text
-            structured_data = self._post_process_response(structured_data, extracted_text, file_name)
+            structured_data = self._post_process_response(structured_data, extracted_text, file_name, json_mode)
             
             logger.info(f"Content structured and validated successfully for: {file_name}")
             return structured_data
@@ -82,69 +480,163 @@ class OpenAIService:
             raise
     
 
-    def _get_text_chunks(self, full_text: str, chunk_size: int = 15000, overlap: int = 2000) -> List[str]:
+    async def structure_many_async(
+        self,
+        documents: List[Tuple[str, str]],
+        rules: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Structure several documents concurrently on a single event loop
+
+        Usage: results = asyncio.run(service.structure_many_async(documents, rules))
+
+        Args:
+            documents: (extracted_text, file_name) pairs
+            rules: Validation rules applied to every document
+
+        Returns:
+            List of structured data dictionaries, in the same order as documents
+        """
+        # One client and one request limit shared by every document and chunk
+        semaphore = asyncio.Semaphore(self.max_workers)
+        logger.info(
+            "Structuring %d documents asynchronously (concurrency=%d)",
+            len(documents),
+            self.max_workers
+        )
+        async with AsyncAzureOpenAI(**self._client_args) as aclient:
+            return await asyncio.gather(*[
+                self._structure_async(aclient, semaphore, extracted_text, rules, file_name)
+                for extracted_text, file_name in documents
+            ])
+    
+    async def _structure_async(
+        self,
+        aclient: AsyncAzureOpenAI,
+        semaphore: asyncio.Semaphore,
+        extracted_text: str,
+        rules: List[Dict[str, Any]],
+        file_name: str
+    ) -> Dict[str, Any]:
+        """structure_and_validate_content() on a shared async client"""
+        try:
+            logger.info(f"Structuring and validating content for file: {file_name}")
+            
+            tokens = self.encoding.encode(extracted_text)
+            json_mode = False
+            if len(tokens) > CHUNK_THRESHOLD_TOKENS:
+                text_chunks = self._get_text_chunks(extracted_text, tokens=tokens)
+                logger.info("[file=%s] Processing %d chunks in parallel", file_name, len(text_chunks))
+                chunk_results = await self._gather_chunks_async(aclient, semaphore, text_chunks, rules, file_name)
+                structured_data = self._merge_chunk_results(chunk_results, rules)
+            else:
+                system_prompt, user_prompt = self._create_prompts(extracted_text, rules, file_name)
+                response_content, is_truncated, parsed = await self._call_openai_async(
+                    aclient, semaphore, system_prompt, user_prompt, cache_user=self._prompt_cache_user(file_name)
+                )
+                json_mode = isinstance(parsed, dict)
+                structured_data = parsed if json_mode else self._parse_json_response(
+                    response_content, extracted_text, file_name, is_truncated=is_truncated
+                )
+            
+            return self._post_process_response(structured_data, extracted_text, file_name, json_mode)
+            
+        except Exception as e:
+            logger.error(f"Error structuring content: {str(e)}")
+            raise
+    
+    def _get_text_chunks(
+        self,
+        full_text: str,
+        chunk_size: int = CHUNK_TOKENS,
+        tokens: Optional[List[int]] = None
+    ) -> List[Tuple[str, str]]:
+        """
+        Split text into non-overlapping windows of up to chunk_size tokens, snapping each
+        split back to the nearest room/section header (or line break) when one is close
+
+        Returns (chunk_text, preceding_header) pairs, where preceding_header is the last
+        section header before the chunk starts ("" for the first chunk or if none), so a
+        chunk that begins mid-room knows which room it continues without re-sending the
+        previous chunk's text.
+        """
+        if tokens is None:
+            tokens = self.encoding.encode(full_text)
 
         chunks = []
         start = 0
+        total = len(tokens)
+        preceding_header = ""
         
-        while start < len(full_text):
-            end = start + chunk_size
-            chunk = full_text[start:end]
-            chunks.append(chunk)
-            
-            # Move start forward by chunk_size minus overlap
-            # This ensures we include some content from previous chunk
-            start += (chunk_size - overlap)
+        while start < total:
+            end = min(start + chunk_size, total)
+            if end < total:
+                end = self._find_chunk_boundary(tokens, start + 1, end)
+            chunk_text = self.encoding.decode(tokens[start:end])
+            # A chunk that opens on a header starts a fresh room and needs no continuation hint
+            starts_at_header = _CHUNK_BOUNDARY_RE.match(chunk_text) is not None
+            chunks.append((chunk_text, "" if starts_at_header else preceding_header))
+            preceding_header = self._last_section_header(chunk_text) or preceding_header
+            start = end
         
-        logger.info(f"Split document into {len(chunks)} chunks (chunk_size={chunk_size}, overlap={overlap})")
+        logger.info(f"Split document into {len(chunks)} chunks (chunk_size={chunk_size} tokens)")
         return chunks
     
+    def _find_chunk_boundary(self, tokens: List[int], lower: int, end: int) -> int:
+        """
+        Token index of the last section header within the search window before end,
+        else of the last line break, else end
+        """
+        search_start = max(lower, end - CHUNK_BOUNDARY_SEARCH_TOKENS)
+        if search_start >= end:
+            return end
+        
+        window, offsets = self.encoding.decode_with_offsets(tokens[search_start:end])
+        last_match = None
+        for last_match in _CHUNK_BOUNDARY_RE.finditer(window):
+            pass
+        split_char = last_match.start() if last_match is not None else window.rfind("\n")
+        if split_char <= 0:
+            return end
+        
+        # Split before the token holding the header's (or line's) leading newline
+        split = search_start + bisect.bisect_right(offsets, split_char) - 1
+        return split if split > search_start else end
+    
+    @staticmethod
+    def _last_section_header(text: str) -> str:
+        """The last room/section header line in text, or "" if there is none"""
+        last_match = None
+        for last_match in _CHUNK_BOUNDARY_RE.finditer(text):
+            pass
+        if last_match is None:
+            return ""
+        line_start = last_match.start() + 1
+        line_end = text.find("\n", line_start)
+        return text[line_start:line_end if line_end >= 0 else len(text)].strip()
+    
     def _process_with_chunking(
         self,
         extracted_text: str,
         rules: List[Dict[str, Any]],
-        file_name: str
+        file_name: str,
+        tokens: Optional[List[int]] = None
     ) -> Dict[str, Any]:
 
-        text_chunks = self._get_text_chunks(extracted_text, chunk_size=15000, overlap=2000)
+        text_chunks = self._get_text_chunks(extracted_text, tokens=tokens)
         total_chunks = len(text_chunks)
         
-        # This will hold the results from all threads
-        chunk_results = [None] * total_chunks
+        # Results from all chunks, in chunk order (failed chunks are empty dicts)
         logger.info("[file=%s] Processing %d chunks in parallel", file_name, total_chunks)
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_chunk = {
-                executor.submit(
-                    self._process_single_chunk,
-                    chunk_text,
-                    rules,
-                    file_name,
-                    i + 1,
-                    total_chunks
-                ): i for i, chunk_text in enumerate(text_chunks)
-            }
-           
-            for future in concurrent.futures.as_completed(future_to_chunk):
-                idx = future_to_chunk[future]
-                try:
-                    chunk_results[idx] = future.result()
-                    logger.info(
-                        "Chunk %d/%d completed successfully (stored at index %d)",
-                        idx + 1,
-                        total_chunks,
-                        idx
-                    )
- 
-                except Exception as e:
-                    logger.error(
-                        "Error processing chunk %d",
-                        idx + 1,
-                        exc_info=True
-                    )
- 
-                    # Create empty result for failed chunk
-                    chunk_results[idx] = {}
-        
+        chunk_results = _run_sync(self._process_chunks_async(text_chunks, rules, file_name))
+        return self._merge_chunk_results(chunk_results, rules)
+    
+    def _merge_chunk_results(
+        self,
+        chunk_results: List[Dict[str, Any]],
+        rules: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Merge per-chunk responses, in chunk order, into one document result"""
         # MERGING LOGIC
         # Initialize master JSON structure
         master_json = {
@@ -167,77 +659,90 @@ class OpenAIService:
         total_rules_checked = 0
         
 
+        # Bind the master containers once instead of re-indexing master_json per chunk
+        master_rooms = master_json["rooms"]
+        master_grand_totals = master_json["grand_total_areas"]
+        master_dwelling_summary = master_json["summary_for_dwelling"]
+        master_recap_taxes = master_json["Recap of Taxes Overhead and Profit"]
+        master_recap_by_room = master_json["Recap by Room"]
+        master_recap_by_category = master_json["recap_by_category"]
+        master_review_findings = master_json["review_findings"]
+        
+        # Keys already in the recap/findings lists, kept across chunks instead of rescanning each time
+        existing_descs = set()
+        existing_room_names = set()
+        existing_cats = set()
+        existing_findings = set()
+
         for i, chunk_data in enumerate(chunk_results):
             if not chunk_data:
                 logger.warning(f"Chunk {i + 1} returned empty data, skipping...")
                 continue
+            
+            # Look each key up once; `or` also covers keys the model returned as null
+            get = chunk_data.get
+            rooms_data = get("rooms") or get("areas") or []
+            vs = get("validation_summary") or {}
+            grand_total_areas = get("grand_total_areas") or {}
+            summary_for_dwelling = get("summary_for_dwelling") or {}
+            recap_taxes = get("Recap of Taxes Overhead and Profit") or []
+            recap_by_room = get("Recap by Room") or []
+            recap_by_category = get("recap_by_category") or []
+            review_findings = get("review_findings") or []
                 
             # First chunk: Extract metadata
             if i == 0:
-                master_json["document_metadata"] = chunk_data.get("document_metadata", {})
-            
-            rooms_data = chunk_data.get("rooms", [])
-            if not rooms_data:
-                rooms_data = chunk_data.get("areas", [])
+                master_json["document_metadata"] = get("document_metadata") or {}
             
             if isinstance(rooms_data, list):
                 logger.debug(f"Chunk {i + 1}: Adding {len(rooms_data)} rooms to master list")
-                master_json["rooms"].extend(rooms_data)
+                master_rooms.extend(rooms_data)
             else:
                 logger.warning(f"Chunk {i + 1}: rooms_data is not a list, type: {type(rooms_data)}")
             
             # Collect validation summary data
-            if "validation_summary" in chunk_data:
-                vs = chunk_data["validation_summary"]
+            if vs:
                 total_rules_checked += vs.get("total_rules_checked", 0)
                 total_flags += vs.get("critical_flags", 0)
             
-            if chunk_data.get("grand_total_areas"):
-                # Update with non-null values (defensive merging)
-                for key, value in chunk_data.get("grand_total_areas", {}).items():
-                    if value is not None:
-                        master_json["grand_total_areas"][key] = value
+            # Update with non-null values (defensive merging)
+            for key, value in grand_total_areas.items():
+                if value is not None:
+                    master_grand_totals[key] = value
             
-            if chunk_data.get("summary_for_dwelling"):
-                # Update with non-null values (defensive merging)
-                for key, value in chunk_data.get("summary_for_dwelling", {}).items():
-                    if value is not None:
-                        master_json["summary_for_dwelling"][key] = value
+            for key, value in summary_for_dwelling.items():
+                if value is not None:
+                    master_dwelling_summary[key] = value
             
             # For lists, extend them if they contain data (avoid duplicates)
-            recap_taxes = chunk_data.get("Recap of Taxes Overhead and Profit", [])
             if recap_taxes:
                 # Simple deduplication by description
-                existing_descs = {item.get("description", "") for item in master_json["Recap of Taxes Overhead and Profit"]}
                 for item in recap_taxes:
-                    if item.get("description", "") not in existing_descs:
-                        master_json["Recap of Taxes Overhead and Profit"].append(item)
-                        existing_descs.add(item.get("description", ""))
+                    desc = item.get("description", "")
+                    if desc not in existing_descs:
+                        master_recap_taxes.append(item)
+                        existing_descs.add(desc)
             
-            recap_by_room = chunk_data.get("Recap by Room", [])
             if recap_by_room:
-                existing_room_names = {item.get("room_name", "") for item in master_json["Recap by Room"]}
                 for item in recap_by_room:
-                    if item.get("room_name", "") not in existing_room_names:
-                        master_json["Recap by Room"].append(item)
-                        existing_room_names.add(item.get("room_name", ""))
+                    room_name = item.get("room_name", "")
+                    if room_name not in existing_room_names:
+                        master_recap_by_room.append(item)
+                        existing_room_names.add(room_name)
             
-            recap_by_category = chunk_data.get("recap_by_category", [])
             if recap_by_category:
-                existing_cats = {(item.get("category", ""), item.get("section_type", "")) for item in master_json["recap_by_category"]}
                 for item in recap_by_category:
                     cat_key = (item.get("category", ""), item.get("section_type", ""))
                     if cat_key not in existing_cats:
-                        master_json["recap_by_category"].append(item)
+                        master_recap_by_category.append(item)
                         existing_cats.add(cat_key)
             
-            review_findings = chunk_data.get("review_findings", [])
             if review_findings:
-                existing_findings = {item.get("description", "") for item in master_json["review_findings"]}
                 for item in review_findings:
-                    if item.get("description", "") not in existing_findings:
-                        master_json["review_findings"].append(item)
-                        existing_findings.add(item.get("description", ""))
+                    desc = item.get("description", "")
+                    if desc not in existing_findings:
+                        master_review_findings.append(item)
+                        existing_findings.add(desc)
         
         # SMART DEDUPLICATION (Data loss fix - merges items instead of replacing)
         master_json["rooms"] = self._merge_and_deduplicate_rooms(master_json["rooms"])
@@ -268,15 +773,192 @@ class OpenAIService:
         logger.info(f"Chunking complete. Total rooms extracted: {len(master_json['rooms'])} (after deduplication)")
         return master_json
     
-    def _process_single_chunk(
+    async def _process_chunks_async(
+        self,
+        text_chunks: List[Tuple[str, str]],
+        rules: List[Dict[str, Any]],
+        file_name: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Process every chunk concurrently on one event loop, at most max_workers requests
+        in flight, returning results in chunk order ({} for a chunk that failed)
+        """
+        semaphore = asyncio.Semaphore(self.max_workers)
+        # The async client is bound to this run's loop, so it is created and closed here
+        async with AsyncAzureOpenAI(**self._client_args) as aclient:
+            return await self._gather_chunks_async(aclient, semaphore, text_chunks, rules, file_name)
+    
+    async def _gather_chunks_async(
+        self,
+        aclient: AsyncAzureOpenAI,
+        semaphore: asyncio.Semaphore,
+        text_chunks: List[Tuple[str, str]],
+        rules: List[Dict[str, Any]],
+        file_name: str
+    ) -> List[Dict[str, Any]]:
+        """_process_chunks_async() on a caller's client and request semaphore"""
+        total_chunks = len(text_chunks)
+        
+        # A batch is only split from a JSON reply; without JSON mode most batches would be
+        # re-sent chunk by chunk, costing an extra request each
+        if self.chunk_batch_tokens and self._supports_json_mode:
+            batches = self._pack_chunks(text_chunks, self.chunk_batch_tokens)
+            logger.info("[file=%s] Packed %d chunks into %d requests", file_name, total_chunks, len(batches))
+        else:
+            batches = [[i] for i in range(total_chunks)]
+        
+        results = await asyncio.gather(
+            *[
+                self._process_chunk_batch_async(aclient, semaphore, text_chunks, batch, rules, file_name)
+                for batch in batches
+            ],
+            return_exceptions=True
+        )
+        
+        chunk_results = [{} for _ in range(total_chunks)]
+        for batch, result in zip(batches, results):
+            for position, idx in enumerate(batch):
+                if isinstance(result, BaseException):
+                    logger.error(
+                        "Error processing chunk %d",
+                        idx + 1,
+                        exc_info=result
+                    )
+                    # Leave the empty result for the failed chunk
+                    continue
+                logger.info(
+                    "Chunk %d/%d completed successfully",
+                    idx + 1,
+                    total_chunks
+                )
+                chunk_results[idx] = result[position]
+        return chunk_results
+    
+    def _pack_chunks(self, text_chunks: List[Tuple[str, str]], max_prompt_tokens: int) -> List[List[int]]:
+        """
+        Greedily group consecutive chunk indexes so each group's text stays within
+        max_prompt_tokens (and MAX_CHUNKS_PER_BATCH chunks); a chunk over budget goes alone
+        """
+        batches = []
+        batch = []
+        batch_tokens = 0
+        for idx, (chunk_text, _) in enumerate(text_chunks):
+            chunk_tokens = len(self.encoding.encode(chunk_text))
+            if batch and (batch_tokens + chunk_tokens > max_prompt_tokens or len(batch) >= MAX_CHUNKS_PER_BATCH):
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+            batch.append(idx)
+            batch_tokens += chunk_tokens
+        if batch:
+            batches.append(batch)
+        return batches
+    
+    async def _process_chunk_batch_async(
         self,
+        aclient: AsyncAzureOpenAI,
+        semaphore: asyncio.Semaphore,
+        text_chunks: List[Tuple[str, str]],
+        batch: List[int],
+        rules: List[Dict[str, Any]],
+        file_name: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Process the chunks at the indexes in batch with one request, returning one
+        result per index; falls back to a request per chunk if the reply can't be split
+        """
+        total_chunks = len(text_chunks)
+        
+        async def single(idx: int) -> Dict[str, Any]:
+            chunk_text, preceding_header = text_chunks[idx]
+            return await self._process_single_chunk_async(
+                aclient, semaphore, chunk_text, rules, file_name, idx + 1, total_chunks, preceding_header
+            )
+        
+        # Cached chunks don't need to ride along in the batch, whether they were cached
+        # from a request of their own or as a section of an earlier batch
+        results = {}
+        if self.cache is not None:
+            for idx in batch:
+                chunk_text, preceding_header = text_chunks[idx]
+                for batched in (False, True):
+                    cached = self.cache.get(
+                        self._chunk_cache_key(chunk_text, rules, idx + 1, total_chunks, preceding_header, batched)
+                    )
+                    if isinstance(cached, dict):
+                        logger.info("Chunk %d/%d served from response cache", idx + 1, total_chunks)
+                        results[idx] = cached
+                        break
+        pending = [idx for idx in batch if idx not in results]
+        
+        if len(pending) == 1:
+            results[pending[0]] = await single(pending[0])
+        elif pending:
+            sections = [(idx + 1, text_chunks[idx][0], text_chunks[idx][1]) for idx in pending]
+            system_prompt, user_prompt = self._create_prompts(
+                "",
+                rules,
+                file_name,
+                is_chunk=True,
+                total_chunks=total_chunks,
+                sections=sections
+            )
+            response_content, is_truncated, parsed = await self._call_openai_async(
+                aclient,
+                semaphore,
+                system_prompt,
+                user_prompt,
+                cache_user=self._prompt_cache_user(file_name),
+                response_format=self._batch_response_format
+            )
+            # A reply that came back without JSON mode goes through the usual parse fallbacks
+            if not isinstance(parsed, dict) and not is_truncated:
+                parsed = self._parse_json_response(response_content, "", file_name)
+            section_results = parsed.get("sections") if isinstance(parsed, dict) else None
+            if (
+                not isinstance(section_results, list)
+                or len(section_results) != len(pending)
+                or not all(isinstance(section, dict) for section in section_results)
+            ):
+                logger.warning(
+                    "Batched reply for chunks %s could not be split (truncated=%s), sending them one by one",
+                    [idx + 1 for idx in pending],
+                    is_truncated
+                )
+                section_results = await asyncio.gather(*[single(idx) for idx in pending])
+            elif self.cache is not None:
+                for idx, section in zip(pending, section_results):
+                    # Same rule as single chunks: only complete, parsed sections are cached
+                    if "structured_content" in section:
+                        continue
+                    chunk_text, preceding_header = text_chunks[idx]
+                    self.cache.put(
+                        self._chunk_cache_key(chunk_text, rules, idx + 1, total_chunks, preceding_header, batched=True),
+                        section
+                    )
+            results.update(zip(pending, section_results))
+        
+        return [results[idx] for idx in batch]
+    
+    async def _process_single_chunk_async(
+        self,
+        aclient: AsyncAzureOpenAI,
+        semaphore: asyncio.Semaphore,
         chunk_text: str,
         rules: List[Dict[str, Any]],
         file_name: str,
         chunk_number: int,
-        total_chunks: int
+        total_chunks: int,
+        preceding_header: str = ""
     ) -> Dict[str, Any]:
 
+        cache_key = self._chunk_cache_key(chunk_text, rules, chunk_number, total_chunks, preceding_header)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if isinstance(cached, dict):
+                logger.info("Chunk %d/%d served from response cache", chunk_number, total_chunks)
+                return cached
+
         # Create prompts for this chunk
         system_prompt, user_prompt = self._create_prompts(
             chunk_text,
@@ -284,26 +966,81 @@ class OpenAIService:
             file_name,
             is_chunk=True,
             chunk_number=chunk_number,
-            total_chunks=total_chunks
+            total_chunks=total_chunks,
+            preceding_header=preceding_header
         )
         
         # Call OpenAI for this chunk
-        response_content, is_truncated = self._call_openai(system_prompt, user_prompt)
+        response_content, is_truncated, parsed = await self._call_openai_async(
+            aclient, semaphore, system_prompt, user_prompt, cache_user=self._prompt_cache_user(file_name)
+        )
         
-        # Parse JSON response
-        chunk_data = self._parse_json_response(response_content, chunk_text, file_name, is_truncated=is_truncated)
+        # Parse JSON response (skipped when the call already parsed a valid reply)
+        chunk_data = parsed if isinstance(parsed, dict) else self._parse_json_response(
+            response_content, chunk_text, file_name, is_truncated=is_truncated
+        )
+        
+        # Only cache complete, parsed responses (not the raw-text fallback)
+        if self.cache is not None and not is_truncated and "structured_content" not in chunk_data:
+            self.cache.put(cache_key, chunk_data)
         
         return chunk_data
     
-    def _merge_and_deduplicate_rooms(self, rooms: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _prompt_cache_user(file_name: str) -> Optional[str]:
+        """Stable, non-identifying `user` value per document for prompt-cache routing"""
+        if not file_name:
+            return None
+        return "doc-" + hashlib.sha256(file_name.encode("utf-8")).hexdigest()[:16]
+    
+    def _chunk_cache_key(
+        self,
+        chunk_text: str,
+        rules: List[Dict[str, Any]],
+        chunk_number: int,
+        total_chunks: int,
+        preceding_header: str = "",
+        batched: bool = False
+    ) -> str:
+        """
+        Content-addressable key for a chunk response: prompt version, model, response
+        format, position, text and rules. Sections of a batched reply are produced under
+        the batch format and prompt, so they are keyed apart from single-chunk replies
+        """
+        response_format = self._batch_response_format if batched else self._response_format
+        digest = hashlib.sha256(b"\x00".join([
+            PROMPT_VERSION.encode(),
+            self.deployment_name.encode(),
+            (b"batch:" if batched else b"") + response_format["type"].encode(),
+            f"{chunk_number}/{total_chunks}".encode(),
+            preceding_header.encode("utf-8"),
+            chunk_text.encode("utf-8"),
+            self._get_rules_key(rules)
+        ]))
+        return f"chunk:{digest.hexdigest()}"
+    
+    def _merge_and_deduplicate_rooms(
+        self,
+        rooms: List[Dict[str, Any]],
+        copy_first: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Merge rooms that share a normalized name/grouping into one entry each
 
+        The first occurrence of each room is reused and updated in place, so the
+        input room dicts are consumed; pass copy_first=True to leave the top-level
+        room dicts untouched (nested lists are still shared).
+        """
+        _n = self._norm
         unique_rooms = {}
+        # room_key -> lookup tables over the merged room, built on its first duplicate
+        room_indexes = {}
         duplicate_count = 0
         
         for room in rooms:
             # 1. Normalize name and grouping for robust key generation
-            room_name = str(room.get("name", "Unknown")).strip().lower()
-            grouping = str(room.get("grouping", "")).strip().lower() if room.get("grouping") else ""
+            room_name = _n(room.get("name"))
+            grouping = _n(room.get("grouping"))
             
             if not room_name or room_name == "unknown":
                 room_name = f"unnamed_room_{len(unique_rooms)}"
@@ -312,19 +1049,22 @@ class OpenAIService:
             
             if room_key not in unique_rooms:
                 # First occurrence: ensure standard structure exists
-                unique_rooms[room_key] = room.copy()
-                if "line_items" not in unique_rooms[room_key]:
-                    unique_rooms[room_key]["line_items"] = []
-                if "sub_areas" not in unique_rooms[room_key]:
-                    unique_rooms[room_key]["sub_areas"] = []
-                if "rule_validations" not in unique_rooms[room_key]:
-                    unique_rooms[room_key]["rule_validations"] = []
+                if copy_first:
+                    room = room.copy()
+                room.setdefault("line_items", [])
+                room.setdefault("sub_areas", [])
+                room.setdefault("rule_validations", [])
+                unique_rooms[room_key] = room
             else:
                 duplicate_count += 1
                 existing_room = unique_rooms[room_key]
                 existing_room_name = existing_room.get("name", "Unknown")
                 logger.debug(f"Merging duplicate room: '{room.get('name', 'Unknown')}' (grouping: '{grouping}') with existing '{existing_room_name}'")
                 
+                index = room_indexes.get(room_key)
+                if index is None:
+                    index = room_indexes[room_key] = self._build_room_index(existing_room)
+                
                 # 2. Safety Fix for 'NoneType' Dimensions Error
                 new_dims = room.get("dimensions")
                 existing_dims = existing_room.get("dimensions")
@@ -339,60 +1079,129 @@ class OpenAIService:
 
                 # 3. Robust Merge for Line Items (Handles 'items' or 'line_items' keys)
                 new_items = room.get("line_items") or room.get("items") or []
-                existing_items = existing_room.get("line_items", [])
-                
-                existing_item_sigs = {
-                    (str(item.get("description", "")).strip().lower(), str(item.get("quantity", "")))
-                    for item in existing_items
-                }
+                existing_items = existing_room["line_items"]
+                existing_item_sigs = index["item_sigs"]
                 
                 for item in new_items:
-                    item_sig = (str(item.get("description", "")).strip().lower(), str(item.get("quantity", "")))
+                    item_sig = (_n(item.get("description")), str(item.get("quantity", "")))
                     if item_sig not in existing_item_sigs:
                         existing_items.append(item)
                         existing_item_sigs.add(item_sig)
-                
-                existing_room["line_items"] = existing_items
 
-                # 4. Deep Merge for Sub-Areas
+                # 4. Deep Merge for Sub-Areas (items and architectural_features in one pass)
                 # This ensures that if a Closet is found in two different chunks, its data merges
                 new_sub_areas = room.get("sub_areas", [])
-                existing_sub_areas = existing_room.get("sub_areas", [])
-                
-                existing_sub_names = {str(sa.get("name", "")).strip().lower() for sa in existing_sub_areas}
+                existing_sub_areas = existing_room["sub_areas"]
+                subs_by_name = index["subs"]
+                sub_item_sigs = index["sub_item_sigs"]
+                sub_feature_sigs = index["sub_feature_sigs"]
                 
                 for sub_area in new_sub_areas:
-                    sa_name = str(sub_area.get("name", "")).strip().lower()
-                    if sa_name and sa_name not in existing_sub_names:
+                    sa_name = _n(sub_area.get("name"))
+                    if sa_name and sa_name not in subs_by_name:
                         existing_sub_areas.append(sub_area)
-                        existing_sub_names.add(sa_name)
-                    elif sa_name in existing_sub_names:
-                        # Recursive logic: find the existing sub_area and merge its items/dims
-                        for target in existing_sub_areas:
-                            if str(target.get("name", "")).strip().lower() == sa_name:
-                                # Merge items within the sub_area
-                                t_items = target.setdefault("line_items", [])
-                                s_items = sub_area.get("line_items", []) or sub_area.get("items", [])
-                                t_items.extend([i for i in s_items if i not in t_items])
-                                break
-                
-                existing_room["sub_areas"] = existing_sub_areas
+                        subs_by_name[sa_name] = sub_area
+                    elif sa_name in subs_by_name:
+                        # Recursive logic: merge into the existing sub_area's items
+                        target = subs_by_name[sa_name]
+                        t_items = target.setdefault("line_items", [])
+                        s_items = sub_area.get("line_items", []) or sub_area.get("items", [])
+                        # Same description+quantity signature as the room-level line items,
+                        # built once per sub-area and kept up to date as items are appended
+                        t_sigs = sub_item_sigs.get(sa_name)
+                        if t_sigs is None:
+                            t_sigs = sub_item_sigs[sa_name] = {
+                                (_n(i.get("description")), str(i.get("quantity", "")))
+                                for i in t_items
+                            }
+                        for i in s_items:
+                            i_sig = (_n(i.get("description")), str(i.get("quantity", "")))
+                            if i_sig not in t_sigs:
+                                t_items.append(i)
+                                t_sigs.add(i_sig)
+                    
+                    if sa_name:
+                        target_sub_area = subs_by_name[sa_name]
+                        # Merge architectural_features in this sub_area (with fragmented feature handling)
+                        target_arch = target_sub_area.get("architectural_features", [])
+                        new_sub_arch = sub_area.get("architectural_features", [])
+                        
+                        if new_sub_arch:
+                            existing_sub_feature_sigs = sub_feature_sigs.get(sa_name)
+                            if existing_sub_feature_sigs is None:
+                                existing_sub_feature_sigs = sub_feature_sigs[sa_name] = self._feature_sigs(target_arch)
+                            for feature in new_sub_arch:
+                                f_type = _n(feature.get("feature_type"))
+                                f_dims = _n(feature.get("dimensions_raw"))
+                                f_action = str(feature.get("action_description", "")).strip()
+                                
+                                # Handle fragmented features: "Opens into..." as feature_type means it's actually an action_description
+                                if "opens into" in f_type:
+                                    # This is a mis-extracted feature - it's actually an action_description
+                                    merged = False
+                                    for existing in reversed(target_arch):
+                                        existing_dims = _n(existing.get("dimensions_raw"))
+                                        if existing_dims == "" or existing_dims == "none" or existing.get("action_description") is None:
+                                            if f_dims and f_dims != "none":
+                                                existing["dimensions_raw"] = feature.get("dimensions_raw")
+                                            if f_action or f_type:
+                                                existing["action_description"] = f_action if f_action else f_type
+                                            merged = True
+                                            break
+                                    
+                                    if merged:
+                                        existing_sub_feature_sigs = sub_feature_sigs[sa_name] = self._feature_sigs(target_arch)
+                                    else:
+                                        logger.debug(f"Skipping invalid sub-area architectural feature with type '{feature.get('feature_type')}' - appears to be action_description")
+                                    continue
+                                
+                                # Standard deduplication with fragment handling
+                                feature_sig = (f_type, f_dims)
+                                if feature_sig not in existing_sub_feature_sigs:
+                                    # Check for fragmented features across chunks
+                                    found_fragment = False
+                                    for existing in target_arch:
+                                        existing_type = _n(existing.get("feature_type"))
+                                        existing_dims = _n(existing.get("dimensions_raw"))
+                                        if existing_type == f_type and (existing_dims == "" or existing_dims == "none") and f_dims:
+                                            existing["dimensions_raw"] = feature.get("dimensions_raw")
+                                            if f_action:
+                                                existing["action_description"] = feature.get("action_description")
+                                            found_fragment = True
+                                            break
+                                        elif existing_type == f_type and existing_dims and (f_dims == "" or f_dims == "none") and f_action:
+                                            existing["action_description"] = feature.get("action_description")
+                                            found_fragment = True
+                                            break
+                                    
+                                    if found_fragment:
+                                        existing_sub_feature_sigs = sub_feature_sigs[sa_name] = self._feature_sigs(target_arch)
+                                    else:
+                                        target_arch.append(feature)
+                                        existing_sub_feature_sigs.add(feature_sig)
+                            
+                            target_sub_area["architectural_features"] = target_arch
                 
                 # 5. Merge architectural_features at room level (with fragmented feature handling)
                 new_arch_features = room.get("architectural_features", [])
-                existing_arch_features = existing_room.get("architectural_features", [])
                 
                 if new_arch_features:
+                    existing_arch_features = existing_room.setdefault("architectural_features", [])
+                    if index["feature_sigs"] is None:
+                        index["feature_sigs"] = self._feature_sigs(existing_arch_features)
+                        index["features_by_type"] = self._features_by_type(existing_arch_features)
+                    features_by_type = index["features_by_type"]
+                    
                     for feature in new_arch_features:
-                        f_type = str(feature.get("feature_type", "")).strip().lower()
-                        f_dims = str(feature.get("dimensions_raw", "")).strip().lower()
+                        f_type = _n(feature.get("feature_type"))
+                        f_dims = _n(feature.get("dimensions_raw"))
                         f_action = str(feature.get("action_description", "")).strip()
                         
                         # Handle fragmented features: "Opens into..." as feature_type means it's actually an action_description
                         if "opens into" in f_type:
                             merged = False
                             for existing in reversed(existing_arch_features):
-                                existing_dims = str(existing.get("dimensions_raw", "")).strip().lower()
+                                existing_dims = _n(existing.get("dimensions_raw"))
                                 # If existing feature has type but missing dimensions or action, merge this data
                                 if existing_dims == "" or existing_dims == "none" or existing.get("action_description") is None:
                                     if f_dims and f_dims != "none":
@@ -402,128 +1211,59 @@ class OpenAIService:
                                     merged = True
                                     break
                             
+                            if merged:
+                                index["feature_sigs"] = self._feature_sigs(existing_arch_features)
                             # If no match found, skip this invalid feature (it's likely a duplicate action_description)
                             if not merged:
                                 logger.debug(f"Skipping invalid architectural feature with type '{feature.get('feature_type')}' - appears to be action_description")
                             continue
                         
                         # Standard deduplication: Use feature_type + dimensions_raw as unique identifier
-                        existing_feature_sigs = {
-                            (str(f.get("feature_type", "")).strip().lower(), str(f.get("dimensions_raw", "")).strip().lower())
-                            for f in existing_arch_features
-                        }
-                        
                         feature_sig = (f_type, f_dims)
-                        if feature_sig not in existing_feature_sigs:
+                        if feature_sig not in index["feature_sigs"]:
                             # Also check if we have a feature with same type but missing dimensions (fragmented across chunks)
                             found_fragment = False
-                            for existing in existing_arch_features:
-                                existing_type = str(existing.get("feature_type", "")).strip().lower()
-                                existing_dims = str(existing.get("dimensions_raw", "")).strip().lower()
-                                if existing_type == f_type and (existing_dims == "" or existing_dims == "none") and f_dims:
+                            for existing in features_by_type.get(f_type, ()):
+                                existing_dims = _n(existing.get("dimensions_raw"))
+                                if (existing_dims == "" or existing_dims == "none") and f_dims:
                                     # Merge: existing has type but no dims, new has dims
                                     existing["dimensions_raw"] = feature.get("dimensions_raw")
                                     if f_action:
                                         existing["action_description"] = feature.get("action_description")
                                     found_fragment = True
                                     break
-                                elif existing_type == f_type and existing_dims and (f_dims == "" or f_dims == "none") and f_action:
+                                elif existing_dims and (f_dims == "" or f_dims == "none") and f_action:
                                     # Merge: existing has type and dims, new has action_description
                                     existing["action_description"] = feature.get("action_description")
                                     found_fragment = True
                                     break
                             
-                            if not found_fragment:
+                            if found_fragment:
+                                index["feature_sigs"] = self._feature_sigs(existing_arch_features)
+                            else:
                                 existing_arch_features.append(feature)
-                    
-                    existing_room["architectural_features"] = existing_arch_features
+                                index["feature_sigs"].add(feature_sig)
+                                features_by_type.setdefault(f_type, []).append(feature)
                 
-                # 6. Merge architectural_features within sub_areas
-                for sub_area in new_sub_areas:
-                    sa_name = str(sub_area.get("name", "")).strip().lower()
-                    if sa_name:
-                        for target_sub_area in existing_sub_areas:
-                            if str(target_sub_area.get("name", "")).strip().lower() == sa_name:
-                                # Merge architectural_features in this sub_area (with fragmented feature handling)
-                                target_arch = target_sub_area.get("architectural_features", [])
-                                new_sub_arch = sub_area.get("architectural_features", [])
-                                
-                                if new_sub_arch:
-                                    for feature in new_sub_arch:
-                                        f_type = str(feature.get("feature_type", "")).strip().lower()
-                                        f_dims = str(feature.get("dimensions_raw", "")).strip().lower()
-                                        f_action = str(feature.get("action_description", "")).strip()
-                                        
-                                        # Handle fragmented features: "Opens into..." as feature_type means it's actually an action_description
-                                        if "opens into" in f_type:
-                                            # This is a mis-extracted feature - it's actually an action_description
-                                            merged = False
-                                            for existing in reversed(target_arch):
-                                                existing_dims = str(existing.get("dimensions_raw", "")).strip().lower()
-                                                if existing_dims == "" or existing_dims == "none" or existing.get("action_description") is None:
-                                                    if f_dims and f_dims != "none":
-                                                        existing["dimensions_raw"] = feature.get("dimensions_raw")
-                                                    if f_action or f_type:
-                                                        existing["action_description"] = f_action if f_action else f_type
-                                                    merged = True
-                                                    break
-                                            
-                                            if not merged:
-                                                logger.debug(f"Skipping invalid sub-area architectural feature with type '{feature.get('feature_type')}' - appears to be action_description")
-                                            continue
-                                        
-                                        # Standard deduplication with fragment handling
-                                        existing_sub_feature_sigs = {
-                                            (str(f.get("feature_type", "")).strip().lower(), str(f.get("dimensions_raw", "")).strip().lower())
-                                            for f in target_arch
-                                        }
-                                        
-                                        feature_sig = (f_type, f_dims)
-                                        if feature_sig not in existing_sub_feature_sigs:
-                                            # Check for fragmented features across chunks
-                                            found_fragment = False
-                                            for existing in target_arch:
-                                                existing_type = str(existing.get("feature_type", "")).strip().lower()
-                                                existing_dims = str(existing.get("dimensions_raw", "")).strip().lower()
-                                                if existing_type == f_type and (existing_dims == "" or existing_dims == "none") and f_dims:
-                                                    existing["dimensions_raw"] = feature.get("dimensions_raw")
-                                                    if f_action:
-                                                        existing["action_description"] = feature.get("action_description")
-                                                    found_fragment = True
-                                                    break
-                                                elif existing_type == f_type and existing_dims and (f_dims == "" or f_dims == "none") and f_action:
-                                                    existing["action_description"] = feature.get("action_description")
-                                                    found_fragment = True
-                                                    break
-                                            
-                                            if not found_fragment:
-                                                target_arch.append(feature)
-                                    
-                                    target_sub_area["architectural_features"] = target_arch
-                                break
-                
-                # 7. Merge rule_validations (critical for split rooms across chunks)
+                # 6. Merge rule_validations (critical for split rooms across chunks)
                 new_validations = room.get("rule_validations", [])
                 existing_validations = existing_room.setdefault("rule_validations", [])
-                
                 # Deduplicate by rule name/id to avoid duplicates when same room appears in multiple chunks
-                existing_rule_ids = {str(v.get("rule", "")).strip() for v in existing_validations}
+                validations_by_rule = index["rules"]
                 
                 for val in new_validations:
-                    rule_id = str(val.get("rule", "")).strip()
-                    if rule_id and rule_id not in existing_rule_ids:
+                    rule_id = _n(val.get("rule"))
+                    if rule_id and rule_id not in validations_by_rule:
                         existing_validations.append(val)
-                        existing_rule_ids.add(rule_id)
-                    elif rule_id in existing_rule_ids:
+                        validations_by_rule[rule_id] = val
+                    elif rule_id in validations_by_rule:
                         # If same rule appears in both chunks, keep the one with FLAGGED status (more important)
-                        for existing_val in existing_validations:
-                            if str(existing_val.get("rule", "")).strip() == rule_id:
-                                if val.get("status") == "FLAGGED" and existing_val.get("status") == "PASSED":
-                                    # Replace PASSED with FLAGGED
-                                    existing_val["status"] = "FLAGGED"
-                                    existing_val["details"] = val.get("details", existing_val.get("details", ""))
-                                    existing_val["severity"] = val.get("severity", existing_val.get("severity"))
-                                break
+                        existing_val = validations_by_rule[rule_id]
+                        if val.get("status") == "FLAGGED" and existing_val.get("status") == "PASSED":
+                            # Replace PASSED with FLAGGED
+                            existing_val["status"] = "FLAGGED"
+                            existing_val["details"] = val.get("details", existing_val.get("details", ""))
+                            existing_val["severity"] = val.get("severity", existing_val.get("severity"))
         result = list(unique_rooms.values())
         if duplicate_count > 0:
             logger.info(f"Deduplication: {len(rooms)} rooms -> {len(result)} unique rooms (merged {duplicate_count} duplicates)")
@@ -531,6 +1271,56 @@ class OpenAIService:
             logger.info(f"Deduplication: {len(rooms)} rooms -> {len(result)} unique rooms (no duplicates found)")
         return result
 
+    def _build_room_index(self, room: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Lookup tables over a merged room's line items, sub-areas and rule validations,
+        kept for the rest of the merge so each duplicate is folded in with dict lookups
+        (feature tables and per-sub-area signature sets are filled in on first use)
+        """
+        _n = self._norm
+        subs_by_name = {}
+        for sub_area in room["sub_areas"]:
+            subs_by_name.setdefault(_n(sub_area.get("name")), sub_area)
+        validations_by_rule = {}
+        for val in room["rule_validations"]:
+            validations_by_rule.setdefault(_n(val.get("rule")), val)
+        
+        return {
+            "item_sigs": {
+                (_n(item.get("description")), str(item.get("quantity", "")))
+                for item in room["line_items"]
+            },
+            "subs": subs_by_name,
+            "rules": validations_by_rule,
+            "feature_sigs": None,
+            "features_by_type": None,
+            "sub_item_sigs": {},
+            "sub_feature_sigs": {}
+        }
+
+    @staticmethod
+    def _norm(value: Any) -> str:
+        """Normalize a name/description for dedup keys: collapse whitespace, trim, casefold"""
+        if isinstance(value, str):
+            return _normalize_key_text(value)
+        return _WHITESPACE_RE.sub(" ", str(value or "")).strip().casefold()
+
+    def _feature_sigs(self, features: List[Dict[str, Any]]) -> set:
+        """(feature_type, dimensions_raw) signatures used to deduplicate architectural features"""
+        _n = self._norm
+        return {
+            (_n(f.get("feature_type")), _n(f.get("dimensions_raw")))
+            for f in features
+        }
+
+    def _features_by_type(self, features: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Architectural features grouped by normalized feature_type, in list order"""
+        _n = self._norm
+        by_type = {}
+        for feature in features:
+            by_type.setdefault(_n(feature.get("feature_type")), []).append(feature)
+        return by_type
+
     def _create_prompts(
             self, 
             extracted_text: str, 
@@ -538,313 +1328,456 @@ class OpenAIService:
         file_name: str,
         is_chunk: bool = False,
         chunk_number: int = 1,
-        total_chunks: int = 1
+        total_chunks: int = 1,
+        preceding_header: str = "",
+        sections: Optional[List[Tuple[int, str, str]]] = None
         ) -> tuple:
+        """
+        Build the (system, user) prompts. sections, when given, packs several chunks
+        (chunk number, text, preceding header) into one request; extracted_text is then unused.
+        """
         
-        # --- 1. Build Schema Section ---
-        schema_section = ""
-        if self.json_schema:
-            schema_section = f"""
-    ### TARGET JSON STRUCTURE
-    You must output a single JSON object.
-    
-    **PRODUCTION RULES:**
-    1. **Use Exact Schema Keys:** You MUST use the exact keys defined in the schema (e.g., 'dimensions', 'line_items', 'sub_areas', 'architectural_features').
-    2. **Exclude Nulls:** OMIT any field that is `null`, `0`, or `0.00` to save space.
-    3. **No Markdown:** Output raw JSON only. Do not wrap in ```json ... ``` blocks.
-
-    {self.json_schema}
-    """
-
-        # --- 2. Build System Prompt ---
-        chunk_note = ""
-        if is_chunk:
-            chunk_note = f"""
-    ### CHUNKING MODE
-    You are processing **Chunk {chunk_number} of {total_chunks}** from a large document.
-    - Focus ONLY on the content provided in this chunk.
-    - Extract all rooms and line items you find in this text segment.
-    - {"Extract metadata from this chunk (first chunk only)." if chunk_number == 1 else ""}
-    - {"Extract totals and summaries from this chunk if present (not just last chunk)." if chunk_number == total_chunks else "Extract totals and summaries if present in this chunk."}
-    """
+        # Prompt caching: Azure OpenAI reuses the longest previously seen prompt prefix
+        # (from 1024 tokens) at a discount and lower latency. Keep everything that is the
+        # same for every chunk first and byte-identical - the system prompt (schema and
+        # protocols) is fully static and the user prompt opens with the rules - and put
+        # anything per-chunk (file name, chunk position, content) after it. Never add
+        # timestamps or other per-call values to that prefix.
         
-        system_prompt = f"""You are a Forensic Xactimate Auditor. Your goal is a **LOSSLESS** conversion of the estimate into JSON.
-    {chunk_note}
-    {schema_section}
-
-    ### 1. HIERARCHY & RECURSION PROTOCOLS (The "Tree" Structure)
-    
-    * **STRUCTURAL BUFFERING:** Xactimate documents often list several area headers (Main Room + Sub-rooms) before listing any items. 
-    
-    * **NESTING RULE:** If you see headers for sub-areas (e.g., "Closet", "Bath", "Subroom", "Alcove", "Stairs"), you MUST extract their `name`, `dimensions`, AND their specific `line_items` into the `sub_areas` array of the current Parent Room BEFORE you extract any parent room `line_items`.
-    
-    * **ANTI-FLATTENING:** Never place sub-room items in the parent room's `line_items` array. Keep them nested inside the sub-area's `line_items` array. Items belonging to a sub-room (e.g., a Closet) MUST be placed INSIDE that sub-room's `line_items` array, not the parent room's array.
-    
-    * **MAPPING:** Do not create a separate top-level room for a sub-area if it is visually nested under a parent; keep it in the `sub_areas` array.
-    
-    * **TYPE A: GROUPING (Parent)**
-        * **Detection:** Headers like "Main Level", "Dwelling", "Exterior" that have NO dimensions and NO line items directly under them.
-        * **Action:** Set `grouping` field. Rooms following this header should have this grouping value.
-    
-    * **TYPE B: STANDARD ROOM**
-        * **Detection:** Headers like "Kitchen", "Living Room" followed by dimensions (SF/LF).
-        * **Action:** Create a room entry. Extract `dimensions`. Then scan ahead for sub-rooms and populate the `sub_areas` array with each sub-area's `name`, `dimensions`, AND `line_items` BEFORE extracting the parent room's `line_items`.
-    
-    * **TYPE C: SUB-ROOM (Child)**
-        * **Detection:** Small headers (e.g., "Subroom: Closet", "Alcove", "Stairs", "Toilet Room") listed *inside* or *immediately after* a Main Room.
-        * **Action:** Extract the sub-area's `name`, `dimensions`, AND its specific `line_items` into the parent room's `sub_areas` array. **CRITICAL:** Do NOT create a separate top-level room entry. Items belonging to this sub-room MUST be placed in the sub-area's `line_items` array, NOT in the parent room's `line_items`. Do NOT extract parent room line items until all sub-areas (with their line_items) are identified and added to `sub_areas`.
-
-    * **TYPE D: ORPHAN ITEMS (Edge Case)**
-        * **Detection:** Line items found under headers like "Estimate: 007968", "Total: 007121", "Estimate ID: 007121", or at the start/end of the file (e.g., Permits, Debris Removal) that have NO room name associated with them.
-        * **Action:** Create a room entry named "General Items" to hold these items. **DO NOT SKIP THESE.** These are often high-value items that must be captured.
-
-    ### 2. DATA EXTRACTION PROTOCOLS
-    * **Metadata:** Deep scan the first 3 pages. Distinguish "Insured Mailing Address" vs "Property Address".
-    * **Line Items:** Extract **EVERY** single item.
-        * ** DYNAMIC SUBCATEGORY GROUPING: Scan for standalone, bold, or uppercase section headers (e.g., "FLOOR", "MITIGATION") and assign the exact text string to the subcategory_group field for all line items appearing directly beneath it until a new header is found.
-        * ** NULL ASSIGNMENT: If a line item is found without a preceding section header in the current area, or if the document layout is a flat list, you MUST set subcategory_group to null.
-        * **Depreciation:** Capture exactly as strings (e.g., "<50.00>", "(50.00)").
-        * **Pagination Check:** You must process the document sequentially page-by-page. Do not stop until you reach the end of the text.
-        * **ANTI-FLATTENING:** Do not list a Room's line items and then a Sub-room's details afterward. Group all structural definitions (Room -> Sub-rooms) together before the items.
-    
-    ### 3. ARCHITECTURAL FEATURE PROTOCOL
-    
-    **CRITICAL:** Xactimate PDFs represent architectural features as fragmented data. Labels (e.g., "Door", "Window", "Missing Wall") appear as standalone headers, with dimensions and action descriptions on subsequent lines.
-    
-    * **Header Matching:** If you see standalone labels like "Door", "Window", or "Missing Wall", these define the `feature_type`.
-    
-    * **Contextual Binding:** Any dimensions (e.g., "3' 6 1/2\" X 8'") and action descriptions (e.g., "Opens into Exterior") that follow a type label MUST be merged into that specific feature.
-    
-    * **Invalid Feature Names:** A `feature_type` should NEVER be "Opens into..." or start with "Opens into". If you find text starting with "Opens into", it is an `action_description` for the preceding feature, NOT a new feature type.
-    
-    * **Buffer Logic:** When you see a feature type label (e.g., "Door"), buffer it until you find the matching dimension line. Do not create a feature entry until you have both the type and dimensions.
-    
-    * **Feature Structure:** Each architectural feature must have:
-        - `feature_type`: Standard type (Door, Window, Missing Wall, etc.) - NEVER "Opens into..."
-        - `dimensions_raw`: Raw dimension string (e.g., "3' 6 1/2\" X 8'")
-        - `action_description`: Action text (e.g., "Opens into Exterior", "Opens into KITCHEN_AREA")
-
-    ### 4. CRITICAL INTEGRITY RULES for PRODUCTION
-    
-    1. VALIDATION STATUS INTEGRITY: If your internal calculation for a rule results in a "FLAGGED" conclusion in the details text, you MUST set the 'status' key to "FLAGGED". Never output "PASSED" if the logic indicates a failure.
-    
-    2. FEATURE TYPE NAMING: "Opens into..." is NEVER a feature_type. It is always an 'action_description'. If you see "Opens into", look at the preceding label (e.g., Door, Missing Wall) to determine the 'feature_type'.
-    
-    3. MANDATORY AUDIT: Every room object MUST contain a 'rule_validations' array. Do not skip auditing any area.
-
-    ### 5. VALIDATION PROTOCOLS (MANDATORY - Real-Time Check)
-    **CRITICAL:** You must run validations **FOR EVERY ROOM** immediately after extracting its line items. **VALIDATION IS NOT OPTIONAL.**
-    
-    * **Mandatory Requirement:** Every room in your output MUST have a `rule_validations` array. If a room has no validations, it means you failed to check it.
-    
-    * **Complete Rule Coverage (CRITICAL):** You MUST evaluate each room against **ALL applicable rules** from the rules list provided in STEP 1. Do NOT skip rules. Check:
-        - **ALL Quantity matching rules** (e.g., QUANTITYME_001: Paint SF vs Wall Area, QUANTITYME_003: Flooring SF vs Floor Area)
-        - **ALL Scope completeness rules** (e.g., SCOPECOMPL_007: Drywall replacement requires texture, Paint job requires primer/sealer)
-        - **ALL Pricing & Labor rules** (e.g., PRICINGLAB_012: Unit cost exceeds price-list threshold, Labor hours outside expected range)
-        - **ALL Material/Labor Pairing rules** (e.g., MATERIALLA_014: Paint requires prep/masking, Cabinet install requires hardware)
-        - **ALL Room Consistency rules** (e.g., Walls painted but ceiling never addressed)
-        - **ALL other applicable rules** from the complete ruleset
-    
-    * **Rule ID Consistency:** Use the exact `rule_id` from the validation rules provided (e.g., QUANTITYME_001, QUANTITYME_003, PRICINGLAB_012, MATERIALLA_014, SCOPECOMPL_007). This allows post-processing to track which rules were checked.
-    
-    * **INTEGRITY RULE (CRITICAL - NO EXCEPTIONS):** Your `status` field MUST match your calculation logic. If your math shows a rule has failed (e.g., "Paint SF (264.94) > Wall Area (205.35), FLAGGED"), you MUST set `status: "FLAGGED"`. **DO NOT default to "PASSED" when your own calculations show a failure.** If your details say "FLAGGED" or show a violation, the status MUST be "FLAGGED".
-    
-    * **Math Logic:** If `Rule: Paint > Walls`, calculate `Paint_Qty` vs `(Parent_Walls + Sum(Sub_Area_Walls))`. If Paint_Qty > Walls, status MUST be "FLAGGED".
-    * **Scope Logic:** Scan the current Room AND its Sub-areas for required items. If required items are missing, status MUST be "FLAGGED".
-    * **Evidence:** Populate `rule_validations[].details` with specific evidence (quantities, calculations, missing items, etc.). The details must clearly state whether the rule passed or failed.
-    * **Status Alignment:** The `status` field must accurately reflect what is stated in `details`. If details say "does not exceed" and shows correct math, use "PASSED". If details say "exceeds" or shows violation, use "FLAGGED".
-    * **Severity:** Include severity level if provided in the rule.
-
-    ### 6. UNMAPPED DATA
-    * Capture non-standard text in `unmapped`.
-    """
+        # --- 1-2. System Prompt (schema section and protocols, assembled once in __init__) ---
+        system_prompt = self._system_prompt
         
         # --- 3. Build User Prompt ---
-        rules_text = self._format_rules_for_prompt(rules)
+        rules_text = self._get_rules_text(rules)
         
-        # Add chunk context if processing a chunk
-        chunk_context = ""
-        if is_chunk:
-            if chunk_number == 1:
-                chunk_context = f"""
-    ### CHUNK CONTEXT (IMPORTANT)
-    This is **Chunk {chunk_number} of {total_chunks}** from a large document.
-    - **YOUR TASK:** Extract metadata and all rooms/areas found in this chunk.
-    - Extract totals and summaries if present in this chunk (they may span multiple chunks).
-    - **OVERLAP HANDLING:** If you see a room header at the start that seems incomplete, 
-      it may be continued from the previous chunk. Extract it normally.
-    """
-            elif chunk_number == total_chunks:
-                chunk_context = f"""
-    ### CHUNK CONTEXT (IMPORTANT)
-    This is **Chunk {chunk_number} of {total_chunks}** (FINAL CHUNK).
-    - **YOUR TASK:** Extract all rooms/areas AND the totals/summaries from this chunk.
-    - **CRITICAL:** Extract `grand_total_areas`, `summary_for_dwelling`, and all recap tables.
-    - **OVERLAP HANDLING:** The start of this chunk may overlap with previous chunk. 
-      Extract rooms normally, but avoid duplicating rooms already extracted.
-    """
-            else:
-                chunk_context = f"""
-    ### CHUNK CONTEXT (IMPORTANT)
-    This is **Chunk {chunk_number} of {total_chunks}** from a large document.
-    - **YOUR TASK:** Extract ONLY the rooms/areas found in this chunk.
-    - **DO NOT** extract metadata or totals (those come from first/last chunks).
-    - **OVERLAP HANDLING:** The start/end of this chunk overlaps with adjacent chunks.
-      Extract rooms normally - duplicates will be handled during merging.
+        # Per-chunk notes; a batch of sections gets one note per section instead
+        chunk_note, chunk_context = "", ""
+        if sections:
+            chunk_context = f"""
+    ### BATCHED SECTIONS (IMPORTANT)
+    The content below holds **{len(sections)} sections** of a large document, each marked `#### SECTION n`.
+    - Process every section independently, following the chunk context given at the top of that section.
+    - Return a single JSON object `{{"sections": [...]}}` with exactly {len(sections)} entries, in section order.
+      Entry n is the complete JSON object for SECTION n, in the output format above.
     """
+            extracted_text = "\n".join(
+                f"#### SECTION {index}\n" + "\n".join(self._chunk_notes(number, total_chunks, header)) + f"\n{text}"
+                for index, (number, text, header) in enumerate(sections, 1)
+            )
+        elif is_chunk:
+            chunk_note, chunk_context = self._chunk_notes(chunk_number, total_chunks, preceding_header)
         
         # Build user_prompt (always, regardless of chunking)
         user_prompt = f"""
-    ### CONTEXT
-    Source File: {file_name}
-    {chunk_context}
     ### STEP 1: VALIDATION RULES
     {rules_text}
 
+    ### CONTEXT
+    Source File: {file_name}
+    {chunk_note}
+    {chunk_context}
     ### STEP 2: RAW ESTIMATE CONTENT
     {extracted_text}
 
     ### INSTRUCTION
     Process the content in this **STRICT ORDER**:
-    {f'''
-    1.  **METADATA (FIRST CHUNK ONLY):** Extract Company, Adjuster, Insured.
-    2.  **AREA DEFINITION:** For each section, capture the Main Room AND all its Sub-areas first.
-        * Identify the Room/Area name and dimensions.
-        * **IMMEDIATELY scan for associated Sub-areas** (Closets, alcoves, toilet rooms, etc.).
-        * **CRITICAL:** Populate the `sub_areas` array with each sub-area's `name`, `dimensions`, AND its specific `line_items` array. Items that belong to a sub-room MUST be placed in that sub-room's `line_items`, NOT in the parent room's `line_items`.
-        * **STRUCTURAL BUFFERING:** Do not extract parent room `line_items` until the complete structural tree (Parent + Sub-areas with their own line_items) is defined.
-    3.  **LINE ITEMS:** Only after the structural tree (Parent + Sub-areas with their line_items) is defined, extract the parent room's `line_items`. **ENSURE:** Items belonging to a sub-room (e.g., a Closet) are placed INSIDE that sub-room's `line_items` array, not the parent room's array.
-    4.  **VALIDATION (MANDATORY AUDIT):** For EVERY room extracted, you MUST include the `rule_validations` array immediately after its `line_items`. You MUST evaluate the room against **ALL applicable rules** provided in STEP 1. Use the exact `rule_id` (e.g., QUANTITYME_001, QUANTITYME_003, PRICINGLAB_012, MATERIALLA_014, SCOPECOMPL_007) from the rules for each validation entry. If a rule is not applicable (e.g., a flooring rule for a room with no flooring items), you may omit it, but **ALL applicable rules must be checked**. 
-    
-    **INTEGRITY RULE:** If your calculation or logic shows a rule has failed (e.g., "Paint SF (264.94) > Wall Area (205.35)"), you MUST set `status: "FLAGGED"`. Do NOT default to "PASSED" when your own math shows a violation. The `status` field MUST match what is stated in the `details` field. If details say "FLAGGED" or show a violation, status MUST be "FLAGGED". **DO NOT SKIP VALIDATIONS FOR ANY ROOM.**
-    5.  **TOTALS:** Deep-scan the end of the text for the "Summary for Dwelling" and "Grand Total Areas" tables if present in this chunk.
-        * **Note:** These tables use dots (e.g., "Subtotal ........ 1,234.56"). You must map these values accurately to the schema keys.
-    ''' if is_chunk else '''
-    1.  **METADATA:** Extract Company, Adjuster, Insured.
-    2.  **AREA DEFINITION:** For each section, capture the Main Room AND all its Sub-areas first.
-        * Identify the Room/Area name and dimensions.
-        * **IMMEDIATELY scan for associated Sub-areas** (Closets, alcoves, toilet rooms, etc.).
-        * **CRITICAL:** Populate the `sub_areas` array with each sub-area's `name`, `dimensions`, AND its specific `line_items` array. Items that belong to a sub-room MUST be placed in that sub-room's `line_items`, NOT in the parent room's `line_items`.
-        * **STRUCTURAL BUFFERING:** Do not extract parent room `line_items` until the complete structural tree (Parent + Sub-areas with their own line_items) is defined.
-    3.  **LINE ITEMS:** Only after the structural tree (Parent + Sub-areas with their line_items) is defined, extract the parent room's `line_items`. **ENSURE:** Items belonging to a sub-room (e.g., a Closet) are placed INSIDE that sub-room's `line_items` array, not the parent room's array.
-        * **ANTI-LAZINESS RULE:** You are FORBIDDEN from generating the 'Totals' section until you have extracted the line items from the **LAST PAGE** of the text.
-        * If you see more pages of text, you MUST continue extracting items. Do not summarize.
-    4.  **VALIDATION (MANDATORY AUDIT):** For EVERY room extracted, you MUST include the `rule_validations` array immediately after its `line_items`. You MUST evaluate the room against **ALL applicable rules** provided in STEP 1. Use the exact `rule_id` (e.g., QUANTITYME_001, QUANTITYME_003, PRICINGLAB_012, MATERIALLA_014, SCOPECOMPL_007) from the rules for each validation entry. If a rule is not applicable (e.g., a flooring rule for a room with no flooring items), you may omit it, but **ALL applicable rules must be checked**. 
+    {CHUNK_INSTRUCTIONS if is_chunk else DOCUMENT_INSTRUCTIONS}
     
-    **INTEGRITY RULE:** If your calculation or logic shows a rule has failed (e.g., "Paint SF (264.94) > Wall Area (205.35)"), you MUST set `status: "FLAGGED"`. Do NOT default to "PASSED" when your own math shows a violation. The `status` field MUST match what is stated in the `details` field. If details say "FLAGGED" or show a violation, status MUST be "FLAGGED". **DO NOT SKIP VALIDATIONS FOR ANY ROOM.**
-    5.  **TOTALS:** Deep-scan the end of the text for the "Summary for Dwelling" and "Grand Total Areas" tables. Only AFTER you have processed the final page of text.
-        * **Note:** These tables use dots (e.g., "Subtotal ........ 1,234.56"). You must map these values accurately to the schema keys.
-    5.  **FINISH:** Ensure JSON is closed properly.
-    '''}
-    
-    **REMINDER:** Exclude all `null` fields to ensure the output fits.
+    {NULL_FIELDS_REMINDER if not self.structured_output else ""}
     """
         
         return system_prompt, user_prompt
     
-    def _call_openai(self, system_prompt: str, user_prompt: str) -> tuple[str, bool]:
-        """Call Azure OpenAI API and return response content and truncation status"""
+    def _chunk_notes(
+        self,
+        chunk_number: int,
+        total_chunks: int,
+        preceding_header: str = ""
+    ) -> Tuple[str, str]:
+        """(chunk_note, chunk_context) prompt blocks telling the model where a chunk sits in the document"""
+        is_first = chunk_number == 1
+        is_final = chunk_number == total_chunks
+        chunk_note = CHUNK_NOTE.format(
+            chunk_number=chunk_number,
+            total_chunks=total_chunks,
+            metadata_line=CHUNK_NOTE_METADATA if is_first else "",
+            totals_line=CHUNK_NOTE_FINAL_TOTALS if is_final else CHUNK_NOTE_TOTALS
+        )
+        
+        # Chunks don't overlap, so say which room a chunk starting mid-room continues
+        if preceding_header:
+            continuation_note = CHUNK_CONTINUATION_NOTE.format(preceding_header=preceding_header)
+        else:
+            continuation_note = CHUNK_BOUNDARY_NOTE
+        # The first chunk's context takes precedence when a document has only one chunk
+        context_template = CHUNK_CONTEXT_FIRST if is_first else CHUNK_CONTEXT_FINAL if is_final else CHUNK_CONTEXT_MIDDLE
+        chunk_context = context_template.format(
+            chunk_number=chunk_number,
+            total_chunks=total_chunks,
+            continuation_note=continuation_note
+        )
+        
+        return chunk_note, chunk_context
+    
+    def _call_openai(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        cache_user: Optional[str] = None
+    ) -> tuple[str, bool, Optional[Any]]:
+        """
+        Call Azure OpenAI API and return response content, truncation status, and
+        the parsed JSON when the reply was already validated (None otherwise)
+
+        cache_user is sent as the request's `user`; keeping it stable per document
+        routes a document's chunks to the same prompt-cache bucket.
+        """
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ]
         
-        max_tokens = 32000
+        max_tokens = self._completion_token_budget(user_prompt)
+        estimated_tokens = self._estimate_prompt_tokens(system_prompt, user_prompt)
         
-        try:
-            response = self.client.chat.completions.create(
+        response_content, finish_reason, json_mode = self._create_completion(messages, max_tokens, estimated_tokens, cache_user)
+        # finish_reason is reported on the final streamed chunk
+        is_truncated = finish_reason == "length"
+        parsed = None
+        
+        # In JSON mode a complete reply must parse; if it doesn't, show the model its error and ask once more
+        if json_mode and not is_truncated:
+            try:
+                parsed = orjson.loads(response_content)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Response was not valid JSON ({e}), retrying once with the error as feedback")
+                messages = self._json_feedback_messages(messages, response_content, e)
+                estimated_tokens += len(response_content) // 4
+                response_content, finish_reason, json_mode = self._create_completion(messages, max_tokens, estimated_tokens, cache_user)
+                is_truncated = finish_reason == "length"
+                if json_mode and not is_truncated:
+                    try:
+                        parsed = orjson.loads(response_content)
+                    except json.JSONDecodeError:
+                        # Left to the fallback strategies in _parse_json_response
+                        pass
+
+        if is_truncated:
+            logger.warning(f"Response appears truncated (finish_reason: {finish_reason}, length: {len(response_content)}) - will attempt to fix")
+        
+        return response_content, is_truncated, parsed
+    
+    def _estimate_prompt_tokens(self, system_prompt: str, user_prompt: str) -> int:
+        """
+        Prompt tokens for rate limiting: the shared system prompt's count was taken at init,
+        the user prompt is estimated at 4 chars per token rather than encoded on every call
+        """
+        if system_prompt is self._system_prompt:
+            system_tokens = self._system_prompt_tokens
+        else:
+            system_tokens = len(system_prompt) // 4
+        return system_tokens + len(user_prompt) // 4
+    
+    @staticmethod
+    def _completion_token_budget(user_prompt: str) -> int:
+        """
+        max_tokens for a request, sized to its input (~4 chars per token) instead of the
+        deployment maximum, so small chunks don't reserve a full-size completion slot
+        """
+        return min(
+            MAX_COMPLETION_TOKENS,
+            COMPLETION_TOKENS_PER_PROMPT_TOKEN * (len(user_prompt) // 4) + COMPLETION_TOKENS_OVERHEAD
+        )
+    
+    @_retry_rate_limited
+    def _create_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        estimated_tokens: int,
+        cache_user: Optional[str] = None
+    ) -> tuple[str, Optional[str], bool]:
+        """
+        Stream one chat completion within the concurrency and rate limits,
+        returning (content, finish_reason, whether JSON mode was used)
+        """
+        with self._request_semaphore:
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire(estimated_tokens)
+            extra_args = {"seed": COMPLETION_SEED}
+            if cache_user:
+                extra_args["user"] = cache_user
+            if self.stream_usage:
+                extra_args["stream_options"] = {"include_usage": True}
+            request_args = dict(
                 model=self.deployment_name,
                 messages=messages,
                 temperature=0.2,
                 max_tokens=max_tokens,
-                response_format={"type": "json_object"}
-            )
-        except Exception as e:
-            logger.warning(f"JSON response format not supported, using default: {str(e)}")
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
-                messages=messages,
-                temperature=0.2,
-                max_tokens=max_tokens
+                stream=True,
+                **extra_args
             )
-        
-        response_content = response.choices[0].message.content.strip()
+            json_mode = self._supports_json_mode
+            if json_mode:
+                try:
+                    stream = self.client.chat.completions.create(
+                        response_format=self._response_format,
+                        **request_args
+                    )
+                except RateLimitError:
+                    raise
+                except Exception as e:
+                    if self._is_response_format_error(e):
+                        logger.warning(f"JSON response format not supported, using default from now on: {str(e)}")
+                        self._supports_json_mode = False
+                    else:
+                        logger.warning(f"JSON mode request failed, retrying without it: {str(e)}")
+                    json_mode = False
+            if not json_mode:
+                request_args["messages"] = self._plain_messages(messages)
+                stream = self.client.chat.completions.create(**request_args)
+            
+            # Collect deltas while they arrive rather than waiting for one buffered body. They go
+            # into one byte buffer so a long reply isn't held as thousands of small strings.
+            buffer = bytearray()
+            finish_reason = None
+            for chunk in stream:
+                # The usage chunk (when requested) comes last, with no choices
+                if chunk.usage is not None:
+                    self._record_usage(chunk.usage)
+                # Azure sends content-filter chunks with no choices
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.delta and choice.delta.content:
+                    buffer += choice.delta.content.encode("utf-8")
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+            
+            return buffer.decode("utf-8").strip(), finish_reason, json_mode
     
-        # Check if response was truncated (finish_reason indicates truncation)
-        finish_reason = response.choices[0].finish_reason if hasattr(response.choices[0], 'finish_reason') else None
-        is_truncated = finish_reason == "length" or (len(response_content) > max_tokens * 3)  # Rough estimate: 3 chars per token
+    async def _call_openai_async(
+        self,
+        aclient: AsyncAzureOpenAI,
+        semaphore: asyncio.Semaphore,
+        system_prompt: str,
+        user_prompt: str,
+        cache_user: Optional[str] = None,
+        response_format: Optional[Dict[str, Any]] = None
+    ) -> tuple[str, bool, Optional[Any]]:
+        """
+        _call_openai() on the async client; semaphore bounds requests in flight and
+        response_format overrides the service's (used for batched chunks)
+        """
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        
+        max_tokens = self._completion_token_budget(user_prompt)
+        estimated_tokens = self._estimate_prompt_tokens(system_prompt, user_prompt)
+        
+        response_content, finish_reason, json_mode = await self._create_completion_async(
+            aclient, semaphore, messages, max_tokens, estimated_tokens, cache_user, response_format
+        )
+        is_truncated = finish_reason == "length"
+        parsed = None
         
+        # In JSON mode a complete reply must parse; if it doesn't, show the model its error and ask once more
+        if json_mode and not is_truncated:
+            try:
+                parsed = orjson.loads(response_content)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Response was not valid JSON ({e}), retrying once with the error as feedback")
+                messages = self._json_feedback_messages(messages, response_content, e)
+                estimated_tokens += len(response_content) // 4
+                response_content, finish_reason, json_mode = await self._create_completion_async(
+                    aclient, semaphore, messages, max_tokens, estimated_tokens, cache_user, response_format
+                )
+                is_truncated = finish_reason == "length"
+                if json_mode and not is_truncated:
+                    try:
+                        parsed = orjson.loads(response_content)
+                    except json.JSONDecodeError:
+                        # Left to the fallback strategies in _parse_json_response
+                        pass
+
         if is_truncated:
             logger.warning(f"Response appears truncated (finish_reason: {finish_reason}, length: {len(response_content)}) - will attempt to fix")
         
-        return response_content, is_truncated
+        return response_content, is_truncated, parsed
+    
+    @_retry_rate_limited
+    async def _create_completion_async(
+        self,
+        aclient: AsyncAzureOpenAI,
+        semaphore: asyncio.Semaphore,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        estimated_tokens: int,
+        cache_user: Optional[str] = None,
+        response_format: Optional[Dict[str, Any]] = None
+    ) -> tuple[str, Optional[str], bool]:
+        """_create_completion() on the async client"""
+        async with semaphore:
+            if self._rate_limiter is not None:
+                await self._rate_limiter.acquire_async(estimated_tokens)
+            extra_args = {"seed": COMPLETION_SEED}
+            if cache_user:
+                extra_args["user"] = cache_user
+            if self.stream_usage:
+                extra_args["stream_options"] = {"include_usage": True}
+            request_args = dict(
+                model=self.deployment_name,
+                messages=messages,
+                temperature=0.2,
+                max_tokens=max_tokens,
+                stream=True,
+                **extra_args
+            )
+            json_mode = self._supports_json_mode
+            if json_mode:
+                try:
+                    stream = await aclient.chat.completions.create(
+                        response_format=response_format or self._response_format,
+                        **request_args
+                    )
+                except RateLimitError:
+                    raise
+                except Exception as e:
+                    if self._is_response_format_error(e):
+                        logger.warning(f"JSON response format not supported, using default from now on: {str(e)}")
+                        self._supports_json_mode = False
+                    else:
+                        logger.warning(f"JSON mode request failed, retrying without it: {str(e)}")
+                    json_mode = False
+            if not json_mode:
+                request_args["messages"] = self._plain_messages(messages)
+                stream = await aclient.chat.completions.create(**request_args)
+            
+            buffer = bytearray()
+            finish_reason = None
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    self._record_usage(chunk.usage)
+                # Azure sends content-filter chunks with no choices
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.delta and choice.delta.content:
+                    buffer += choice.delta.content.encode("utf-8")
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+            
+            return buffer.decode("utf-8").strip(), finish_reason, json_mode
+    
+    def _record_usage(self, usage: Any) -> None:
+        """Add one response's reported token counts to the running totals"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        with self._usage_lock:
+            self._usage["requests"] += 1
+            self._usage["prompt_tokens"] += usage.prompt_tokens or 0
+            self._usage["completion_tokens"] += usage.completion_tokens or 0
+            self._usage["cached_tokens"] += cached_tokens
+        logger.debug(
+            "OpenAI usage: %s prompt tokens (%d cached), %s completion tokens",
+            usage.prompt_tokens,
+            cached_tokens,
+            usage.completion_tokens
+        )
+    
+    def get_usage(self) -> Dict[str, int]:
+        """
+        Token counts reported by the API since this service was created (requests,
+        prompt_tokens, completion_tokens, cached_tokens); zeros unless stream_usage is on
+        """
+        with self._usage_lock:
+            return dict(self._usage)
+    
+    @staticmethod
+    def _is_response_format_error(error: Exception) -> bool:
+        """
+        Whether a failed request was rejected for its response_format, rather than for
+        something else a 400 covers (context length, content filter, ...)
+        """
+        if not isinstance(error, BadRequestError):
+            return False
+        return getattr(error, "param", None) == "response_format" or "response_format" in str(error)
+    
+    def _plain_messages(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Messages for a request sent without response_format: the schema goes back into the system prompt"""
+        if messages and messages[0]["content"] is self._system_prompt and self.structured_output:
+            return [{"role": "system", "content": self._fallback_system_prompt}] + messages[1:]
+        return messages
+    
+    @staticmethod
+    def _json_feedback_messages(
+        messages: List[Dict[str, str]],
+        response_content: str,
+        error: Exception
+    ) -> List[Dict[str, str]]:
+        """Conversation that shows the model its invalid JSON reply and asks for a corrected one"""
+        return messages + [
+            {"role": "assistant", "content": response_content},
+            {"role": "user", "content": f"Your previous reply was not valid JSON: {error}. Respond again with the complete, corrected JSON object only."}
+        ]
     
     def _parse_json_response(self, response_content: str, extracted_text: str, file_name: str, is_truncated: bool = False) -> Dict[str, Any]:
         """Parse JSON response with multiple fallback strategies"""
-        # Strategy 1: Direct JSON parsing
-        try:
-            return json.loads(response_content)
-        except json.JSONDecodeError as e:
-            logger.debug(f"Direct JSON parsing failed: {str(e)[:200]}")
+        # A reply cut off at the token limit (finish_reason "length") can't parse as it stands,
+        # so it goes straight to the repair instead of failing the parses below first
+        if not is_truncated:
+            # Strategy 1: Direct JSON parsing
+            try:
+                return orjson.loads(response_content)
+            except json.JSONDecodeError as e:
+                logger.debug(f"Direct JSON parsing failed: {str(e)[:200]}")
+        
+        # Locate fences and the outermost braces once; every strategy below reuses them
+        start_idx = response_content.find('{')
+        end_idx = response_content.rfind('}')
+        # A fence that wraps the JSON opens before its first brace, so only that prefix is
+        # searched (nothing at all for the usual reply that starts with '{')
+        fence_start = response_content.find("```", 0, start_idx) if start_idx >= 0 else response_content.find("```")
         
         # Strategy 2: Extract from markdown code blocks
-        try:
-            if "```json" in response_content:
-                start = response_content.find("```json") + 7
-                end = response_content.find("```", start)
-                if end > start:
-                    return json.loads(response_content[start:end].strip())
-            elif "```" in response_content:
-                start = response_content.find("```") + 3
-                end = response_content.find("```", start)
-                if end > start:
-                    return json.loads(response_content[start:end].strip())
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.debug(f"Markdown extraction failed: {str(e)[:200]}")
+        if fence_start >= 0 and not is_truncated:
+            try:
+                json_fence = response_content.find("```json", fence_start)
+                if json_fence >= 0:
+                    start = json_fence + 7
+                    end = response_content.find("```", start)
+                    if end > start:
+                        return orjson.loads(response_content[start:end].strip())
+                else:
+                    start = fence_start + 3
+                    end = response_content.find("```", start)
+                    if end > start:
+                        return orjson.loads(response_content[start:end].strip())
+            except (json.JSONDecodeError, ValueError) as e:
+                logger.debug(f"Markdown extraction failed: {str(e)[:200]}")
         
         # Strategy 3: Find JSON object boundaries
-        try:
-            start_idx = response_content.find('{')
-            end_idx = response_content.rfind('}')
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = response_content[start_idx:end_idx+1]
-                return json.loads(json_str)
-        except json.JSONDecodeError as e:
-            logger.debug(f"Boundary extraction failed: {str(e)[:200]}")
-            # Strategy 3b: Try to fix malformed/truncated JSON
-            # Check if response looks truncated (ends with incomplete value)
-            looks_truncated = (
-                response_content.rstrip().endswith('.') or 
-                response_content.rstrip().endswith(',') or
-                not response_content.rstrip().endswith('}') or
-                response_content.count('{') != response_content.count('}')
-            )
-            
+        # (The old "clean and retry" pass re-parsed this same slice, so it is folded in here)
+        if start_idx >= 0:
             try:
-                start_idx = response_content.find('{')
-                if start_idx >= 0:
-                    # Try fixing the full response first (with truncation detection)
-                    fixed_json = self._try_fix_malformed_json(response_content[start_idx:], is_truncated=looks_truncated)
-                    if fixed_json:
-                        return json.loads(fixed_json)
-                    # If that fails, try fixing just up to the last complete }
-                    end_idx = response_content.rfind('}')
-                    if end_idx > start_idx:
-                        fixed_json = self._try_fix_malformed_json(response_content[start_idx:end_idx+1], is_truncated=looks_truncated)
-                        if fixed_json:
-                            return json.loads(fixed_json)
+                if end_idx > start_idx and not is_truncated:
+                    json_str = response_content[start_idx:end_idx+1]
+                    return orjson.loads(json_str)
+            except json.JSONDecodeError as e:
+                logger.debug(f"Boundary extraction failed: {str(e)[:200]}")
+            # Strategy 3b: Try to fix malformed/truncated JSON. One scan of the reply decides
+            # both the repair and whether it ran off the end (i.e. was cut short), so this also
+            # covers replies cut off before their first closing brace
+            try:
+                fixed_data = self._try_fix_malformed_json(response_content[start_idx:], is_truncated=is_truncated)
+                if fixed_data is not None:
+                    return fixed_data
             except Exception as fix_error:
                 logger.debug(f"JSON fix attempt failed: {str(fix_error)[:200]}")
                 pass
         
-        # Strategy 4: Clean and retry
-        try:
-            cleaned = response_content[response_content.find('{'):response_content.rfind('}')+1]
-            if cleaned:
-                return json.loads(cleaned)
-        except (json.JSONDecodeError, ValueError):
-            pass
-        
         # Log detailed error information (only if all parsing strategies failed)
         error_info = f"Response length: {len(response_content)}"
         if len(response_content) > 0:
@@ -868,93 +1801,43 @@ class OpenAIService:
             }
         }
     
-    def _try_fix_malformed_json(self, json_str: str, is_truncated: bool = False) -> Optional[str]:
-        """Try to fix malformed or truncated JSON with basic fixes"""
+    def _try_fix_malformed_json(self, json_str: str, is_truncated: bool = False) -> Optional[Any]:
+        """Try to fix malformed or truncated JSON with basic fixes, returning the parsed result"""
         if not json_str or not json_str.strip().startswith('{'):
             return None
         
-        fixed = json_str
-        
-        # Basic fix: Remove trailing commas before closing brackets/braces
-        fixed = re.sub(r',\s*}', '}', fixed)
-        fixed = re.sub(r',\s*]', ']', fixed)
-        
-        if is_truncated:
-            last_complete_pos = -1
-            
-            # Try to find last complete number (ends with , or } or ])
-            for match in re.finditer(r':\s*([+-]?\d*\.?\d+)\s*([,}\]])', fixed):
-                last_complete_pos = match.end()
-            
-            # If we found a complete value, truncate everything after it (except closing braces)
-            if last_complete_pos > 0:
-                prefix = fixed[:last_complete_pos]
-                if prefix.rstrip().endswith(','):
-                    prefix = prefix.rstrip()[:-1] 
-                fixed = prefix
-    
-        fixed = re.sub(r':\s*(\d+\.)\s*$', r': null', fixed, flags=re.MULTILINE)
-        fixed = re.sub(r':\s*(\d+)\s*$', r': null', fixed, flags=re.MULTILINE)
-        fixed = re.sub(r':\s*"([^"]*?)\s*$', r': null', fixed, flags=re.MULTILINE)
-        fixed = re.sub(r':\s*([+-]?\d*\.?\d*)\s*,\s*$', r': null', fixed, flags=re.MULTILINE)
-        
-        if is_truncated:
-            open_braces = fixed.count('{') - fixed.count('}')
-            open_brackets = fixed.count('[') - fixed.count(']')
-            if open_braces > 0 or open_brackets > 0:
-                # Remove any trailing incomplete content before closing
-                # Remove trailing commas
-                fixed = fixed.rstrip().rstrip(',')
-                fixed += ']' * max(0, open_brackets)
-                fixed += '}' * max(0, open_braces)
+        fixed = _repair_json(json_str, close_truncated=is_truncated)
+        if fixed is None:
+            return None
         
-        # Try parsing the fixed version
+        # Parse the fixed version once; the caller uses this result directly
         try:
-            json.loads(fixed)
+            fixed_data = orjson.loads(fixed)
             logger.info("Successfully fixed malformed JSON")
-            return fixed
-        except json.JSONDecodeError as e:
-            # If still failing, try one more aggressive fix: remove the last incomplete key-value pair
-            if is_truncated:
-                # Find the last complete object/array closing
-                last_brace = fixed.rfind('}')
-                last_bracket = fixed.rfind(']')
-                last_complete = max(last_brace, last_bracket)
-                
-                if last_complete > 0:
-                    # Try to find the start of the last incomplete key-value pair
-                    # Look backwards from last_complete for the last colon
-                    search_start = max(0, last_complete - 500)  # Search last 500 chars
-                    last_colon = fixed.rfind(':', search_start, last_complete)
-                    
-                    if last_colon > 0:
-                        # Find the start of this key (look for quote or word boundary before colon)
-                        key_start = fixed.rfind('"', search_start, last_colon)
-                        if key_start > 0:
-                            # Remove from key_start to end, then close properly
-                            prefix = fixed[:key_start].rstrip().rstrip(',')
-                            open_braces = prefix.count('{') - prefix.count('}')
-                            open_brackets = prefix.count('[') - prefix.count(']')
-                            prefix += ']' * max(0, open_brackets)
-                            prefix += '}' * max(0, open_braces)
-                            
-                            try:
-                                json.loads(prefix)
-                                logger.info("Successfully fixed malformed JSON by removing incomplete key-value pair")
-                                return prefix
-                            except json.JSONDecodeError:
-                                pass
-            
+            return fixed_data
+        except json.JSONDecodeError:
             return None
     
     def _post_process_response(
         self, 
         structured_data: Dict[str, Any], 
         extracted_text: str, 
-        file_name: str
+        file_name: str,
+        json_mode: bool = False
     ) -> Dict[str, Any]:
-        """Post-process response: parse nested JSON strings in the actual data"""
-        # Recursively parse any JSON strings in the response (useful for nested data)
+        """
+        Post-process response: parse nested JSON strings in the actual data
+
+        json_mode says whether this response was returned and parsed under the request's
+        response_format (False for text-fallback and merged chunk results)
+        """
+        # With the schema enforced by the API every field already has its declared type, so
+        # there are no stringified objects to expand and the walk is skipped. JSON mode only
+        # guarantees the top level parses, and the raw-text fallback still needs it.
+        if self.structured_output and json_mode and "structured_content" not in structured_data:
+            return structured_data
+        
+        # Parse any JSON strings in the response, at any depth (useful for nested data)
         # Skip structured_content/validation processing as they're removed in app.py
         structured_data = self._parse_nested_json_strings(structured_data)
         
@@ -962,20 +1845,53 @@ class OpenAIService:
     
     
     def _parse_nested_json_strings(self, obj: Any) -> Any:
-        """Recursively parse JSON strings in the response object"""
-        if isinstance(obj, str):
-            if obj.strip().startswith(('{', '[')):
-                try:
-                    return self._parse_nested_json_strings(json.loads(obj))
-                except (json.JSONDecodeError, ValueError):
-                    pass
-            return obj
-        elif isinstance(obj, dict):
-            return {key: self._parse_nested_json_strings(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [self._parse_nested_json_strings(item) for item in obj]
-        else:
-            return obj
+        """
+        Parse JSON strings in the response object, in place and without recursion
+        (containers are updated rather than rebuilt); returns the updated object
+        """
+        # Holding the root in a list lets a top-level JSON string be replaced like any other value
+        root = [obj]
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            for key, value in (node.items() if isinstance(node, dict) else enumerate(node)):
+                if isinstance(value, str):
+                    # Check the first character before paying for a stripped copy
+                    first = value[:1]
+                    if not first or (first not in '{[' and not (first.isspace() and value.lstrip()[:1] in ('{', '['))):
+                        continue
+                    try:
+                        value = orjson.loads(value)
+                    except (json.JSONDecodeError, ValueError):
+                        continue
+                    # Same key, so the dict being iterated doesn't change size
+                    node[key] = value
+                if isinstance(value, (dict, list)):
+                    stack.append(value)
+        return root[0]
+    
+    def _get_rules_text(self, rules: List[Dict[str, Any]]) -> str:
+        """Formatted rules for the prompt, reused while the same rules list is being processed"""
+        return self._get_rules_entry(rules)[1]
+    
+    def _get_rules_key(self, rules: List[Dict[str, Any]]) -> bytes:
+        """Canonical serialized rules for response cache keys, reused like _get_rules_text()"""
+        return self._get_rules_entry(rules)[2]
+    
+    def _get_rules_entry(self, rules: List[Dict[str, Any]]) -> tuple:
+        cached = self._rules_text_cache
+        # Identity check (not id()) so a recycled id can never return another list's text.
+        # RulesValidator replaces its list on reload rather than mutating it.
+        if cached is not None and cached[0] is rules:
+            return cached
+        
+        cached = (
+            rules,
+            self._format_rules_for_prompt(rules),
+            orjson.dumps(rules, option=orjson.OPT_SORT_KEYS, default=str)
+        )
+        self._rules_text_cache = cached
+        return cached
     
     def _format_rules_for_prompt(self, rules: List[Dict[str, Any]]) -> str:
         """Format rules for inclusion in the prompt"""
@@ -983,33 +1899,31 @@ class OpenAIService:
             return "No specific validation rules provided."
         
         # Group rules by check_group
-        grouped_rules = {}
+        grouped_rules = defaultdict(list)
         ungrouped_rules = []
         
         for rule in rules:
             check_group = rule.get("check_group", "")
             if check_group:
-                grouped_rules.setdefault(check_group, []).append(rule)
+                grouped_rules[check_group].append(rule)
             else:
                 ungrouped_rules.append(rule)
         
-        formatted_rules = []
-        
-        # Format grouped rules
-        for check_group in sorted(grouped_rules.keys()):
-            formatted_rules.append(f"\n### {check_group}")
-            formatted_rules.extend(self._format_rule_list(grouped_rules[check_group]))
+        # One piece per group, each already joined, so the final join is a single pass
+        sections = [
+            f"\n### {check_group}\n{self._format_rule_list(grouped_rules[check_group])}"
+            for check_group in sorted(grouped_rules)
+        ]
         
         # Format ungrouped rules
         if ungrouped_rules:
-            if formatted_rules:
-                formatted_rules.append("\n### Other Rules")
-            formatted_rules.extend(self._format_rule_list(ungrouped_rules))
+            other_rules = self._format_rule_list(ungrouped_rules)
+            sections.append(f"\n### Other Rules\n{other_rules}" if sections else other_rules)
         
-        return "\n".join(formatted_rules)
+        return "\n".join(sections)
     
-    def _format_rule_list(self, rules: List[Dict[str, Any]]) -> List[str]:
-        """Format a list of rules"""
+    def _format_rule_list(self, rules: List[Dict[str, Any]]) -> str:
+        """Format a list of rules as one newline-separated block"""
         formatted = []
         for rule in rules:
             rule_id = rule.get("rule_id", "")
@@ -1023,4 +1937,4 @@ class OpenAIService:
                 rule_text += f"\n  Logic: {criteria}"
             
             formatted.append(rule_text)
-        return formatted
+        return "\n".join(formatted)
@@ -0,0 +1,181 @@
+"""
+Static prompt text for Azure OpenAI estimate extraction
+
+Kept as plain constants so prompts are assembled by joining fixed pieces rather
+than re-rendering the full template on every call.
+"""
+
+# Opening of the system prompt; the schema section follows it
+SYSTEM_PROMPT_HEADER = """You are a Forensic Xactimate Auditor. Your goal is a **LOSSLESS** conversion of the estimate into JSON.
+    """
+
+# Extraction, feature and validation protocols closing the system prompt
+SYSTEM_PROMPT_PROTOCOLS = """
+
+    ### 1. HIERARCHY & RECURSION PROTOCOLS (The "Tree" Structure)
+    
+    * **STRUCTURAL BUFFERING:** Xactimate documents often list several area headers (Main Room + Sub-rooms) before listing any items. 
+    
+    * **NESTING RULE:** If you see headers for sub-areas (e.g., "Closet", "Bath", "Subroom", "Alcove", "Stairs"), you MUST extract their `name`, `dimensions`, AND their specific `line_items` into the `sub_areas` array of the current Parent Room BEFORE you extract any parent room `line_items`.
+    
+    * **ANTI-FLATTENING:** Never place sub-room items in the parent room's `line_items` array. Keep them nested inside the sub-area's `line_items` array. Items belonging to a sub-room (e.g., a Closet) MUST be placed INSIDE that sub-room's `line_items` array, not the parent room's array.
+    
+    * **MAPPING:** Do not create a separate top-level room for a sub-area if it is visually nested under a parent; keep it in the `sub_areas` array.
+    
+    * **TYPE A: GROUPING (Parent)**
+        * **Detection:** Headers like "Main Level", "Dwelling", "Exterior" that have NO dimensions and NO line items directly under them.
+        * **Action:** Set `grouping` field. Rooms following this header should have this grouping value.
+    
+    * **TYPE B: STANDARD ROOM**
+        * **Detection:** Headers like "Kitchen", "Living Room" followed by dimensions (SF/LF).
+        * **Action:** Create a room entry. Extract `dimensions`. Then scan ahead for sub-rooms and populate the `sub_areas` array with each sub-area's `name`, `dimensions`, AND `line_items` BEFORE extracting the parent room's `line_items`.
+    
+    * **TYPE C: SUB-ROOM (Child)**
+        * **Detection:** Small headers (e.g., "Subroom: Closet", "Alcove", "Stairs", "Toilet Room") listed *inside* or *immediately after* a Main Room.
+        * **Action:** Extract the sub-area's `name`, `dimensions`, AND its specific `line_items` into the parent room's `sub_areas` array. **CRITICAL:** Do NOT create a separate top-level room entry. Items belonging to this sub-room MUST be placed in the sub-area's `line_items` array, NOT in the parent room's `line_items`. Do NOT extract parent room line items until all sub-areas (with their line_items) are identified and added to `sub_areas`.
+
+    * **TYPE D: ORPHAN ITEMS (Edge Case)**
+        * **Detection:** Line items found under headers like "Estimate: 007968", "Total: 007121", "Estimate ID: 007121", or at the start/end of the file (e.g., Permits, Debris Removal) that have NO room name associated with them.
+        * **Action:** Create a room entry named "General Items" to hold these items. **DO NOT SKIP THESE.** These are often high-value items that must be captured.
+
+    ### 2. DATA EXTRACTION PROTOCOLS
+    * **Metadata:** Deep scan the first 3 pages. Distinguish "Insured Mailing Address" vs "Property Address".
+    * **Line Items:** Extract **EVERY** single item.
+        * ** DYNAMIC SUBCATEGORY GROUPING: Scan for standalone, bold, or uppercase section headers (e.g., "FLOOR", "MITIGATION") and assign the exact text string to the subcategory_group field for all line items appearing directly beneath it until a new header is found.
+        * ** NULL ASSIGNMENT: If a line item is found without a preceding section header in the current area, or if the document layout is a flat list, you MUST set subcategory_group to null.
+        * **Depreciation:** Capture exactly as strings (e.g., "<50.00>", "(50.00)").
+        * **Pagination Check:** You must process the document sequentially page-by-page. Do not stop until you reach the end of the text.
+        * **ANTI-FLATTENING:** Do not list a Room's line items and then a Sub-room's details afterward. Group all structural definitions (Room -> Sub-rooms) together before the items.
+    
+    ### 3. ARCHITECTURAL FEATURE PROTOCOL
+    
+    **CRITICAL:** Xactimate PDFs represent architectural features as fragmented data. Labels (e.g., "Door", "Window", "Missing Wall") appear as standalone headers, with dimensions and action descriptions on subsequent lines.
+    
+    * **Header Matching:** If you see standalone labels like "Door", "Window", or "Missing Wall", these define the `feature_type`.
+    
+    * **Contextual Binding:** Any dimensions (e.g., "3' 6 1/2\" X 8'") and action descriptions (e.g., "Opens into Exterior") that follow a type label MUST be merged into that specific feature.
+    
+    * **Invalid Feature Names:** A `feature_type` should NEVER be "Opens into..." or start with "Opens into". If you find text starting with "Opens into", it is an `action_description` for the preceding feature, NOT a new feature type.
+    
+    * **Buffer Logic:** When you see a feature type label (e.g., "Door"), buffer it until you find the matching dimension line. Do not create a feature entry until you have both the type and dimensions.
+    
+    * **Feature Structure:** Each architectural feature must have:
+        - `feature_type`: Standard type (Door, Window, Missing Wall, etc.) - NEVER "Opens into..."
+        - `dimensions_raw`: Raw dimension string (e.g., "3' 6 1/2\" X 8'")
+        - `action_description`: Action text (e.g., "Opens into Exterior", "Opens into KITCHEN_AREA")
+
+    ### 4. CRITICAL INTEGRITY RULES for PRODUCTION
+    
+    1. VALIDATION STATUS INTEGRITY: If your internal calculation for a rule results in a "FLAGGED" conclusion in the details text, you MUST set the 'status' key to "FLAGGED". Never output "PASSED" if the logic indicates a failure.
+    
+    2. FEATURE TYPE NAMING: "Opens into..." is NEVER a feature_type. It is always an 'action_description'. If you see "Opens into", look at the preceding label (e.g., Door, Missing Wall) to determine the 'feature_type'.
+    
+    3. MANDATORY AUDIT: Every room object MUST contain a 'rule_validations' array. Do not skip auditing any area.
+
+    ### 5. VALIDATION PROTOCOLS (MANDATORY - Real-Time Check)
+    **CRITICAL:** You must run validations **FOR EVERY ROOM** immediately after extracting its line items. **VALIDATION IS NOT OPTIONAL.**
+    
+    * **Mandatory Requirement:** Every room in your output MUST have a `rule_validations` array. If a room has no validations, it means you failed to check it.
+    
+    * **Complete Rule Coverage (CRITICAL):** You MUST evaluate each room against **ALL applicable rules** from the rules list provided in STEP 1. Do NOT skip rules. Check:
+        - **ALL Quantity matching rules** (e.g., QUANTITYME_001: Paint SF vs Wall Area, QUANTITYME_003: Flooring SF vs Floor Area)
+        - **ALL Scope completeness rules** (e.g., SCOPECOMPL_007: Drywall replacement requires texture, Paint job requires primer/sealer)
+        - **ALL Pricing & Labor rules** (e.g., PRICINGLAB_012: Unit cost exceeds price-list threshold, Labor hours outside expected range)
+        - **ALL Material/Labor Pairing rules** (e.g., MATERIALLA_014: Paint requires prep/masking, Cabinet install requires hardware)
+        - **ALL Room Consistency rules** (e.g., Walls painted but ceiling never addressed)
+        - **ALL other applicable rules** from the complete ruleset
+    
+    * **Rule ID Consistency:** Use the exact `rule_id` from the validation rules provided (e.g., QUANTITYME_001, QUANTITYME_003, PRICINGLAB_012, MATERIALLA_014, SCOPECOMPL_007). This allows post-processing to track which rules were checked.
+    
+    * **INTEGRITY RULE (CRITICAL - NO EXCEPTIONS):** Your `status` field MUST match your calculation logic. If your math shows a rule has failed (e.g., "Paint SF (264.94) > Wall Area (205.35), FLAGGED"), you MUST set `status: "FLAGGED"`. **DO NOT default to "PASSED" when your own calculations show a failure.** If your details say "FLAGGED" or show a violation, the status MUST be "FLAGGED".
+    
+    * **Math Logic:** If `Rule: Paint > Walls`, calculate `Paint_Qty` vs `(Parent_Walls + Sum(Sub_Area_Walls))`. If Paint_Qty > Walls, status MUST be "FLAGGED".
+    * **Scope Logic:** Scan the current Room AND its Sub-areas for required items. If required items are missing, status MUST be "FLAGGED".
+    * **Evidence:** Populate `rule_validations[].details` with specific evidence (quantities, calculations, missing items, etc.). The details must clearly state whether the rule passed or failed.
+    * **Status Alignment:** The `status` field must accurately reflect what is stated in `details`. If details say "does not exceed" and shows correct math, use "PASSED". If details say "exceeds" or shows violation, use "FLAGGED".
+    * **Severity:** Include severity level if provided in the rule.
+
+    ### 6. UNMAPPED DATA
+    * Capture non-standard text in `unmapped`.
+    """
+
+# INSTRUCTION block of the user prompt for one chunk of a large document
+CHUNK_INSTRUCTIONS = """
+    1.  **METADATA (FIRST CHUNK ONLY):** Extract Company, Adjuster, Insured.
+    2.  **AREA DEFINITION:** For each section, capture the Main Room AND all its Sub-areas first.
+        * Identify the Room/Area name and dimensions.
+        * **IMMEDIATELY scan for associated Sub-areas** (Closets, alcoves, toilet rooms, etc.).
+        * **CRITICAL:** Populate the `sub_areas` array with each sub-area's `name`, `dimensions`, AND its specific `line_items` array. Items that belong to a sub-room MUST be placed in that sub-room's `line_items`, NOT in the parent room's `line_items`.
+        * **STRUCTURAL BUFFERING:** Do not extract parent room `line_items` until the complete structural tree (Parent + Sub-areas with their own line_items) is defined.
+    3.  **LINE ITEMS:** Only after the structural tree (Parent + Sub-areas with their line_items) is defined, extract the parent room's `line_items`. **ENSURE:** Items belonging to a sub-room (e.g., a Closet) are placed INSIDE that sub-room's `line_items` array, not the parent room's array.
+    4.  **VALIDATION (MANDATORY AUDIT):** For EVERY room extracted, you MUST include the `rule_validations` array immediately after its `line_items`. You MUST evaluate the room against **ALL applicable rules** provided in STEP 1. Use the exact `rule_id` (e.g., QUANTITYME_001, QUANTITYME_003, PRICINGLAB_012, MATERIALLA_014, SCOPECOMPL_007) from the rules for each validation entry. If a rule is not applicable (e.g., a flooring rule for a room with no flooring items), you may omit it, but **ALL applicable rules must be checked**. 
+    
+    **INTEGRITY RULE:** If your calculation or logic shows a rule has failed (e.g., "Paint SF (264.94) > Wall Area (205.35)"), you MUST set `status: "FLAGGED"`. Do NOT default to "PASSED" when your own math shows a violation. The `status` field MUST match what is stated in the `details` field. If details say "FLAGGED" or show a violation, status MUST be "FLAGGED". **DO NOT SKIP VALIDATIONS FOR ANY ROOM.**
+    5.  **TOTALS:** Deep-scan the end of the text for the "Summary for Dwelling" and "Grand Total Areas" tables if present in this chunk.
+        * **Note:** These tables use dots (e.g., "Subtotal ........ 1,234.56"). You must map these values accurately to the schema keys.
+    """
+
+# INSTRUCTION block of the user prompt for a whole document
+DOCUMENT_INSTRUCTIONS = """
+    1.  **METADATA:** Extract Company, Adjuster, Insured.
+    2.  **AREA DEFINITION:** For each section, capture the Main Room AND all its Sub-areas first.
+        * Identify the Room/Area name and dimensions.
+        * **IMMEDIATELY scan for associated Sub-areas** (Closets, alcoves, toilet rooms, etc.).
+        * **CRITICAL:** Populate the `sub_areas` array with each sub-area's `name`, `dimensions`, AND its specific `line_items` array. Items that belong to a sub-room MUST be placed in that sub-room's `line_items`, NOT in the parent room's `line_items`.
+        * **STRUCTURAL BUFFERING:** Do not extract parent room `line_items` until the complete structural tree (Parent + Sub-areas with their own line_items) is defined.
+    3.  **LINE ITEMS:** Only after the structural tree (Parent + Sub-areas with their line_items) is defined, extract the parent room's `line_items`. **ENSURE:** Items belonging to a sub-room (e.g., a Closet) are placed INSIDE that sub-room's `line_items` array, not the parent room's array.
+        * **ANTI-LAZINESS RULE:** You are FORBIDDEN from generating the 'Totals' section until you have extracted the line items from the **LAST PAGE** of the text.
+        * If you see more pages of text, you MUST continue extracting items. Do not summarize.
+    4.  **VALIDATION (MANDATORY AUDIT):** For EVERY room extracted, you MUST include the `rule_validations` array immediately after its `line_items`. You MUST evaluate the room against **ALL applicable rules** provided in STEP 1. Use the exact `rule_id` (e.g., QUANTITYME_001, QUANTITYME_003, PRICINGLAB_012, MATERIALLA_014, SCOPECOMPL_007) from the rules for each validation entry. If a rule is not applicable (e.g., a flooring rule for a room with no flooring items), you may omit it, but **ALL applicable rules must be checked**. 
+    
+    **INTEGRITY RULE:** If your calculation or logic shows a rule has failed (e.g., "Paint SF (264.94) > Wall Area (205.35)"), you MUST set `status: "FLAGGED"`. Do NOT default to "PASSED" when your own math shows a violation. The `status` field MUST match what is stated in the `details` field. If details say "FLAGGED" or show a violation, status MUST be "FLAGGED". **DO NOT SKIP VALIDATIONS FOR ANY ROOM.**
+    5.  **TOTALS:** Deep-scan the end of the text for the "Summary for Dwelling" and "Grand Total Areas" tables. Only AFTER you have processed the final page of text.
+        * **Note:** These tables use dots (e.g., "Subtotal ........ 1,234.56"). You must map these values accurately to the schema keys.
+    5.  **FINISH:** Ensure JSON is closed properly.
+    """
+
+# Closing reminder of the user prompt; left out with strict structured output, where every field is required
+NULL_FIELDS_REMINDER = "**REMINDER:** Exclude all `null` fields to ensure the output fits."
+
+# CHUNKING MODE note for one chunk; the two bullet lines depend on the chunk's position
+CHUNK_NOTE = """
+    ### CHUNKING MODE
+    You are processing **Chunk {chunk_number} of {total_chunks}** from a large document.
+    - Focus ONLY on the content provided in this chunk.
+    - Extract all rooms and line items you find in this text segment.
+    - {metadata_line}
+    - {totals_line}
+    """
+CHUNK_NOTE_METADATA = "Extract metadata from this chunk (first chunk only)."
+CHUNK_NOTE_FINAL_TOTALS = "Extract totals and summaries from this chunk if present (not just last chunk)."
+CHUNK_NOTE_TOTALS = "Extract totals and summaries if present in this chunk."
+
+# Chunks don't overlap, so a chunk starting mid-room is told which room it continues
+CHUNK_CONTINUATION_NOTE = """- **CONTINUATION:** The previous chunk ended inside the section headed "{preceding_header}".
+      Any line items before this chunk's first header belong to that room - extract them under that room's name.
+      Do NOT re-emit anything from earlier chunks; rooms split across chunks are merged afterwards."""
+CHUNK_BOUNDARY_NOTE = """- **CHUNK BOUNDARY:** Chunks do not overlap. Rooms split across chunks are merged afterwards."""
+
+# CHUNK CONTEXT block for the first, final and any middle chunk
+CHUNK_CONTEXT_FIRST = """
+    ### CHUNK CONTEXT (IMPORTANT)
+    This is **Chunk {chunk_number} of {total_chunks}** from a large document.
+    - **YOUR TASK:** Extract metadata and all rooms/areas found in this chunk.
+    - Extract totals and summaries if present in this chunk (they may span multiple chunks).
+    - **CHUNK BOUNDARY:** Chunks do not overlap. If the text ends partway through a room,
+      extract what is present - the next chunk continues it and the rooms are merged.
+    """
+CHUNK_CONTEXT_FINAL = """
+    ### CHUNK CONTEXT (IMPORTANT)
+    This is **Chunk {chunk_number} of {total_chunks}** (FINAL CHUNK).
+    - **YOUR TASK:** Extract all rooms/areas AND the totals/summaries from this chunk.
+    - **CRITICAL:** Extract `grand_total_areas`, `summary_for_dwelling`, and all recap tables.
+    {continuation_note}
+    """
+CHUNK_CONTEXT_MIDDLE = """
+    ### CHUNK CONTEXT (IMPORTANT)
+    This is **Chunk {chunk_number} of {total_chunks}** from a large document.
+    - **YOUR TASK:** Extract ONLY the rooms/areas found in this chunk.
+    - **DO NOT** extract metadata or totals (those come from first/last chunks).
+    {continuation_note}
+    """
@@ -3,25 +3,79 @@ Rules validation module
 """
 import logging
 import io
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional
+import numpy as np
 import pandas as pd
 
+from utils.extraction_cache import ExtractionCache
+
 logger = logging.getLogger(__name__)
 
+# pandas reads .xlsx through the Rust-backed calamine engine when python-calamine is
+# installed (several times faster than openpyxl); openpyxl remains the fallback
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
+# Seconds cached rules are used before the blob's ETag is checked again
+RULES_REVALIDATE_SECONDS = 300
+
 
 class RulesValidator:
     """Service for loading and managing validation rules from blob storage"""
     
-    def __init__(self, blob_service, container_name: str, blob_name: str):
+    def __init__(
+        self,
+        blob_service,
+        container_name: str,
+        blob_name: str,
+        revalidate_after: float = RULES_REVALIDATE_SECONDS,
+        cache: Optional[ExtractionCache] = None
+    ):
+        """
+        Args:
+            blob_service: BlobStorageService the rules file is read from
+            container_name: Container holding the rules file
+            blob_name: Excel rules file name
+            revalidate_after: Seconds cached rules are used before the file's ETag is checked again
+            cache: Optional persistent cache of parsed rules keyed by the file's ETag,
+                shared by every worker pointed at the same path
+        """
         self.blob_service = blob_service
         self.container_name = container_name
         self.blob_name = blob_name
+        self.revalidate_after = revalidate_after
+        self.cache = cache
         self.rules = []
+        # Whether a load has succeeded; an empty rules file is still a loaded one
+        self._loaded = False
+        # ETag of the file the current rules were parsed from, and when it was last confirmed
+        self._etag = None
+        self._checked_at = 0.0
         self.load_rules()
     
     def load_rules(self) -> None:
         """Load rules from Excel file in blob storage"""
         try:
+            # Read before downloading: if the file changes in between, the stale ETag
+            # just triggers another reload on the next check
+            etag = self.blob_service.get_blob_etag(self.container_name, self.blob_name)
+            
+            # Another worker may already have parsed this version of the file
+            cached = self._get_cached(etag)
+            if cached is not None:
+                self._set_rules(cached["rules"], etag)
+                logger.info(
+                    "Loaded %d cached rules for %s/%s",
+                    len(self.rules),
+                    self.container_name,
+                    self.blob_name
+                )
+                return
+            
             logger.info(
                 "Downloading rules file from blob storage: %s/%s",
                 self.container_name,
@@ -31,28 +85,37 @@ class RulesValidator:
             excel_bytes = self.blob_service.download_blob(self.container_name, self.blob_name)
             
             excel_file = io.BytesIO(excel_bytes)
-            df = pd.read_excel(excel_file, engine='openpyxl', sheet_name=0)
+            df = pd.read_excel(excel_file, engine=EXCEL_ENGINE, sheet_name=0)
             
             if df.empty:
                 logger.warning("Excel file is empty")
-                self.rules = []
+                self._set_rules([], etag)
                 return
             
             # Map columns - Excel has: Check Group, Example Rule (Business), Example Logic (Pseudo / SQL-ish)
-            check_group_col = None
-            desc_col = None
-            criteria_col = None
+            # Headers are matched with string ops over the whole column index; each role takes
+            # the first matching column that an earlier role hasn't already claimed
+            names = df.columns.astype(str).str.strip().str.lower()
             
-            for col in df.columns:
-                col_str = str(col).strip()
-                col_lower = col_str.lower()
-                
-                if not check_group_col and ('check group' in col_lower or col_str == 'Check Group'):
-                    check_group_col = col
-                elif not desc_col and ('example rule' in col_lower and 'business' in col_lower):
-                    desc_col = col
-                elif not criteria_col and ('example logic' in col_lower or ('logic' in col_lower and 'pseudo' in col_lower)):
-                    criteria_col = col
+            def has(text: str) -> np.ndarray:
+                return np.asarray(names.str.contains(text, regex=False), dtype=bool)
+            
+            role_masks = [
+                has('check group'),
+                has('example rule') & has('business'),
+                has('example logic') | (has('logic') & has('pseudo'))
+            ]
+            claimed = np.zeros(len(names), dtype=bool)
+            matched_cols = []
+            for mask in role_masks:
+                candidates = mask & ~claimed
+                if candidates.any():
+                    position = int(candidates.argmax())
+                    claimed[position] = True
+                    matched_cols.append(df.columns[position])
+                else:
+                    matched_cols.append(None)
+            check_group_col, desc_col, criteria_col = matched_cols
             
             # Fallback to positional if not found
             if not check_group_col and len(df.columns) > 0:
@@ -71,37 +134,55 @@ class RulesValidator:
             )
 
             
-            # Convert to rules
+            # Convert to rules with column-wise string ops: each column is converted and
+            # stripped once, rows without criteria are filtered out, and rule ids are built
+            # for the remaining rows before any per-rule dicts are made
+            def clean_column(col) -> pd.Series:
+                if not col:
+                    return pd.Series(None, index=df.index, dtype=object)
+                values = df[col]
+                if pd.api.types.is_float_dtype(values.dtype):
+                    # Numbers in a column with gaps are read as floats; render whole ones as "3", not "3.0"
+                    values = values.map(lambda v: str(int(v)) if v.is_integer() else str(v), na_action="ignore")
+                # StringDtype carries missing cells through the strip as <NA> instead of "nan"
+                cleaned = values.astype("string").str.strip()
+                # Blank cells count as missing, as the calamine engine already reads them
+                return cleaned.astype(object).where(cleaned.fillna("") != "", None)
+            
+            groups = clean_column(check_group_col)
+            descriptions = clean_column(desc_col)
+            criteria = clean_column(criteria_col)
+            
+            # Only add rules that have validation criteria
+            keep = criteria.notna()
+            groups, descriptions, criteria = groups[keep], descriptions[keep], criteria[keep]
+            
+            # Generate rule ids: alphanumeric prefix of the check group, then the row number
+            prefixes = (
+                groups.fillna("RULE").astype(str).str.upper()
+                .str.replace(r"[^\w]", "", regex=True).str.slice(0, 10)
+            )
+            row_numbers = (pd.Series(df.index, index=df.index)[keep] + 1).astype(str).str.zfill(3)
+            rule_ids = prefixes + "_" + row_numbers
+            
             rules = []
-            for idx, row in df.iterrows():
+            for rule_id, group_val, desc_val, criteria_val in zip(
+                rule_ids.tolist(),
+                groups.tolist(),
+                descriptions.tolist(),
+                criteria.tolist()
+            ):
                 rule = {}
-                
-                if check_group_col:
-                    val = row[check_group_col]
-                    if pd.notna(val):
-                        rule['check_group'] = str(val).strip()
-                
-                if desc_col:
-                    val = row[desc_col]
-                    if pd.notna(val):
-                        rule['description'] = str(val).strip()
-                
-                if criteria_col:
-                    val = row[criteria_col]
-                    if pd.notna(val):
-                        rule['validation_criteria'] = str(val).strip()
-                
-                # Generate rule_id if missing
-                if not rule.get('rule_id'):
-                    prefix = rule.get('check_group', 'RULE')
-                    clean_prefix = ''.join(c for c in prefix.upper() if c.isalnum() or c == '_')[:10]
-                    rule['rule_id'] = f"{clean_prefix}_{idx + 1:03d}"
-                
-                # Only add if it has validation criteria
-                if rule.get('validation_criteria') and rule['validation_criteria'].strip():
-                    rules.append(rule)
+                if group_val is not None:
+                    rule['check_group'] = group_val
+                if desc_val is not None:
+                    rule['description'] = desc_val
+                rule['validation_criteria'] = criteria_val
+                rule['rule_id'] = rule_id
+                rules.append(rule)
             
-            self.rules = rules
+            self._set_rules(rules, etag)
+            self._put_cached(etag, rules)
             logger.info(
                 "Loaded %d rules from %s/%s",
                 len(self.rules),
@@ -111,21 +192,64 @@ class RulesValidator:
 
                 
         except Exception:
+            # A failed reload keeps the rules loaded before it (none on the first load)
             logger.error("Error loading rules", exc_info=True)
-            self.rules = []
+            self._checked_at = time.monotonic()
+    
+    def _cache_key(self, etag) -> Optional[str]:
+        """Cache key for one version of the rules file (None when the version is unknown)"""
+        if self.cache is None or not etag:
+            return None
+        return f"rules:{self.container_name}/{self.blob_name}:{etag}"
+    
+    def _get_cached(self, etag) -> Optional[Dict[str, Any]]:
+        """Return cached parsed rules for this ETag, if caching is enabled and the entry exists"""
+        key = self._cache_key(etag)
+        if key is None:
+            return None
+        return self.cache.get(key)
+    
+    def _put_cached(self, etag, rules: List[Dict[str, Any]]) -> None:
+        """Store parsed rules under this ETag, if caching is enabled"""
+        key = self._cache_key(etag)
+        if key is not None:
+            self.cache.put(key, {"rules": rules})
+    
+    def _set_rules(self, rules: List[Dict[str, Any]], etag) -> None:
+        """Record a successful load and the ETag it came from"""
+        self.rules = rules
+        self._etag = etag
+        self._checked_at = time.monotonic()
+        self._loaded = True
     
     def get_rules(self) -> List[Dict[str, Any]]:
-        """Get rules (cached - only reloads if rules list is empty)"""
-        # Only reload if rules are empty (initial load or if previous load failed)
-        if not self.rules:
-            logger.info("Rules list is empty, reloading from blob storage...")
+        """Get rules (cached - reloads if no load has succeeded yet or the rules file has changed)"""
+        # Reload if no load has succeeded yet (previous load failed); otherwise
+        # check the file's ETag once the revalidation interval has passed
+        if not self._loaded:
+            logger.info("Rules not loaded, reloading from blob storage...")
             self.load_rules()
-        else:
-            logger.debug(
-                "Using cached rules (%d rules)",
-                len(self.rules)
-            )
+        elif time.monotonic() - self._checked_at >= self.revalidate_after:
+            self._revalidate()
 
         return self.rules
     
+    def _revalidate(self) -> None:
+        """Reload the rules if the blob's ETag no longer matches the one they were parsed from"""
+        try:
+            etag = self.blob_service.get_blob_etag(self.container_name, self.blob_name)
+        except Exception:
+            # Keep serving the cached rules; try again after another interval
+            logger.warning("Could not check the rules file for changes, using cached rules", exc_info=True)
+            self._checked_at = time.monotonic()
+            return
+        
+        if etag == self._etag:
+            logger.debug("Rules file unchanged (ETag %s)", etag)
+            self._checked_at = time.monotonic()
+            return
+        
+        logger.info("Rules file changed (ETag %s -> %s), reloading", self._etag, etag)
+        self.load_rules()
+    
     # Removed unused methods: reload_rules() and add_rule() - not used in the application
@@ -0,0 +1,94 @@
+"""
+Persistent cache for Document Intelligence and OpenAI extraction results
+"""
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Any, Optional
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionCache:
+    """
+    Key/value store for analyzed documents, backed by a local SQLite file.
+
+    Values are pickled so the nested raw result survives without a JSON
+    round-trip. Entries older than max_age seconds (if set) are treated as misses.
+    """
+
+    def __init__(self, path: str, max_age: Optional[float] = None):
+        self.path = Path(path).expanduser()
+        self.max_age = max_age
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS extractions "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL)"
+            )
+            conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached value for key, or None on a miss"""
+        try:
+            with self._lock, closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM extractions WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error:
+            logger.warning("Extraction cache read failed (key=%s)", key, exc_info=True)
+            row = None
+
+        if row is not None and self.max_age is not None and row[1] is not None:
+            if time.time() - row[1] > self.max_age:
+                row = None
+
+        value = None
+        if row is not None:
+            try:
+                value = pickle.loads(row[0])
+            except Exception:
+                # Unreadable or written by an incompatible version: drop it and re-extract
+                logger.warning("Discarding unreadable extraction cache entry (key=%s)", key, exc_info=True)
+                self._delete(key)
+                row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return value
+
+    def _delete(self, key: str) -> None:
+        """Remove the entry stored under key, if any"""
+        try:
+            with self._lock, closing(self._connect()) as conn:
+                conn.execute("DELETE FROM extractions WHERE key = ?", (key,))
+                conn.commit()
+        except sqlite3.Error:
+            logger.warning("Extraction cache delete failed (key=%s)", key, exc_info=True)
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Store value under key, replacing any existing entry"""
+        try:
+            with self._lock, closing(self._connect()) as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO extractions (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time())
+                )
+                conn.commit()
+        except sqlite3.Error:
+            logger.warning("Extraction cache write failed (key=%s)", key, exc_info=True)
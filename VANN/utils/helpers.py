@@ -5,6 +5,7 @@ from datetime import datetime
 from pathlib import Path
 from typing import Dict
 import json
+import orjson
 
 
 def generate_output_path(original_file_name: str, output_prefix: str = "") -> str:
@@ -40,7 +41,11 @@ def format_json_output(data: Dict) -> str:
     Returns:
         Formatted JSON string
     """
-    return json.dumps(data, indent=2, ensure_ascii=False)
+    try:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    except orjson.JSONEncodeError:
+        # e.g. integers beyond 64 bits, which json writes without complaint
+        return json.dumps(data, indent=2, ensure_ascii=False)
 
 
 def get_file_extension(file_name: str) -> str: